@@ -0,0 +1,190 @@
+"""
+文件解析基准：按解析器、按格式统计耗时、峰值内存与输出大小，并与历史结果对比
+
+结果保存在 benchmarks/results/parsers/，以 parse_file_utils.py 源码哈希标记版本；
+默认与同一语料规模下、源码哈希不同的最近一次结果对比，输出速度与内存变化。
+计时前先按文件头识别每个语料文件，识别结果与扩展名不符时以非零退出码结束；
+旧版 ppt 的解析依赖 LibreOffice，未安装时只做识别、不计时。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.bench_parsers --scale 1.0 --repeat 3
+    python -m benchmarks.bench_parsers --scale 0.05 --only pdf,docx --no-save
+"""
+
+import argparse
+import gc
+import glob
+import hashlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from benchmarks.parser_corpus import ensure_corpus
+from src.config import settings
+from src.utils import file_sniff, parse_file_utils
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", "parsers")
+
+# 扩展名 -> (解析器名, 调用方式)，与 parse_file_content 的分派保持一致
+PARSERS: Dict[str, Tuple[str, Callable[[io.BytesIO], str]]] = {
+    "xlsx": ("_parse_excel", lambda f: parse_file_utils._parse_excel(f, "xlsx")),
+    "csv": ("_parse_excel", lambda f: parse_file_utils._parse_excel(f, "csv")),
+    "pdf": ("_parse_pdf", parse_file_utils._parse_pdf),
+    "docx": ("_parse_word", parse_file_utils._parse_word),
+    "pptx": ("_parse_pptx", parse_file_utils._parse_pptx),
+    "ppt": ("_parse_ppt", parse_file_utils._parse_ppt),
+}
+
+
+def _source_hash() -> str:
+    with open(parse_file_utils.__file__, "rb") as fh:
+        return hashlib.sha256(fh.read()).hexdigest()[:12]
+
+
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _measure(parse: Callable[[io.BytesIO], str], data: bytes, repeat: int) -> Dict[str, Any]:
+    timings = []
+    output = ""
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        output = parse(io.BytesIO(data))
+        timings.append(time.perf_counter() - start)
+
+    # 内存单独跑一轮：tracemalloc 会拖慢解析，不能与计时混在一起
+    gc.collect()
+    tracemalloc.start()
+    try:
+        parse(io.BytesIO(data))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "min_ms": round(min(timings) * 1000, 2),
+        "median_ms": round(statistics.median(timings) * 1000, 2),
+        "peak_mem_mb": round(peak / 1024 / 1024, 2),
+        "output_chars": len(output),
+        "output_bytes": len(output.encode("utf-8")),
+    }
+
+
+def _load_baseline(path: Optional[str], scale: float, source_hash: str) -> Optional[Dict[str, Any]]:
+    # 未指定时取同一规模下最近一次、且解析代码不同的结果
+    candidates = [path] if path else sorted(glob.glob(os.path.join(RESULTS_DIR, "*.json")), reverse=True)
+    for candidate in candidates:
+        with open(candidate, encoding="utf-8") as fh:
+            result = json.load(fh)
+        meta = result.get("meta", {})
+        if path or (meta.get("scale") == scale and meta.get("source_hash") != source_hash):
+            result["meta"]["path"] = candidate
+            return result
+    return None
+
+
+def _print_table(results: Dict[str, Any], baseline: Optional[Dict[str, Any]]) -> None:
+    base = (baseline or {}).get("results", {})
+    print(
+        f"\n{'file':<20}{'parser':<14}{'input MiB':>10}{'median ms':>12}{'Δ':>9}"
+        f"{'peak MiB':>10}{'Δ':>9}{'out KiB':>10}"
+    )
+    for name, r in results.items():
+        b = base.get(name, {})
+
+        def delta(key: str) -> str:
+            if not b.get(key):
+                return ""
+            return f"{(r[key] - b[key]) / b[key]:+.1%}"
+
+        print(
+            f"{name:<20}{r['parser']:<14}{r['input_bytes'] / 1024 / 1024:>10.2f}{r['median_ms']:>12.1f}"
+            f"{delta('median_ms'):>9}{r['peak_mem_mb']:>10.1f}{delta('peak_mem_mb'):>9}"
+            f"{r['output_bytes'] / 1024:>10.1f}"
+        )
+    if baseline:
+        meta = baseline.get("meta", {})
+        print(f"\nbaseline: {meta.get('path', '')} (git {meta.get('git_rev')}, source {meta.get('source_hash')})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="benchmark file parsers on a generated corpus")
+    parser.add_argument("--scale", type=float, default=1.0, help="语料缩放系数")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", default="", help="逗号分隔的扩展名过滤，如 pdf,docx")
+    parser.add_argument("--baseline", help="指定对比的结果文件，默认自动选择")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    only = {e.strip() for e in args.only.split(",") if e.strip()}
+    corpus = ensure_corpus(args.scale)
+    source_hash = _source_hash()
+    # 解析依赖是懒加载的，先导入，避免首轮计时包含模块导入耗时
+    parse_file_utils.prewarm_parsers()
+
+    results: Dict[str, Any] = {}
+    mismatched = []
+    for name, path in corpus.items():
+        ext = name.rsplit(".", 1)[-1]
+        if only and ext not in only:
+            continue
+        parser_name, parse = PARSERS[ext]
+        with open(path, "rb") as fh:
+            data = fh.read()
+        sniffed = file_sniff.extension_for(file_sniff.sniff_mime(data, ext))
+        if sniffed != ext:
+            mismatched.append(f"{name} sniffed as {sniffed}")
+            continue
+        if ext == "ppt" and shutil.which(settings.SOFFICE_PATH) is None:
+            print(f"skipping {name}: LibreOffice not installed", file=sys.stderr)
+            continue
+        print(f"parsing {name} ...", file=sys.stderr)
+        results[name] = {
+            "format": ext,
+            "parser": parser_name,
+            "input_bytes": len(data),
+            **_measure(parse, data, args.repeat),
+        }
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_rev": _git_rev(),
+            "source_hash": source_hash,
+            "scale": args.scale,
+            "repeat": args.repeat,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+    _print_table(results, _load_baseline(args.baseline, args.scale, source_hash))
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        out = os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{source_hash}.json")
+        with open(out, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=2)
+        print(f"\nresults written to {out}")
+    if mismatched:
+        print("\nFAIL: " + "; ".join(mismatched))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
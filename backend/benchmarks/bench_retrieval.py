@@ -0,0 +1,129 @@
+"""
+MOI 检索相关性基准：用标注集比较 like / vector / hybrid 三种检索方式的二采价格查询结果
+
+- 数据为 SQLite 替身中的合成 product_price，查询向量与数据向量使用同一哈希嵌入；
+- 标注集 benchmarks/retrieval_labels.json：每个查询列出相关的物料短描述，返回行的物料短描述在其中即为相关；
+- 指标：MRR、Hit@1、nDCG@10，以及每个查询执行的 SQL 条数（往返次数）；
+- hybrid 的 MRR 或 nDCG@10 低于另两种方式，或每个查询超过一条 SQL 时以非零退出码结束。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.bench_retrieval
+    python -m benchmarks.bench_retrieval --max-distance 0.9 --keyword-weight 0.5 --verbose
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import tempfile
+from typing import Dict, List, Sequence
+
+LABELS_PATH = os.path.join(os.path.dirname(__file__), "retrieval_labels.json")
+MODES = ("like", "vector", "hybrid")
+TOP_K = 10
+
+
+def reciprocal_rank(flags: Sequence[bool]) -> float:
+    return next((1.0 / (i + 1) for i, hit in enumerate(flags) if hit), 0.0)
+
+
+def ndcg(flags: Sequence[bool], relevant: int, k: int = TOP_K) -> float:
+    dcg = sum(1.0 / math.log2(i + 2) for i, hit in enumerate(flags[:k]) if hit)
+    ideal = sum(1.0 / math.log2(i + 2) for i in range(min(relevant, k)))
+    return dcg / ideal if ideal else 0.0
+
+
+async def run(cases: List[Dict], dim: int, verbose: bool) -> Dict[str, Dict[str, float]]:
+    from sqlalchemy import event
+
+    from benchmarks.loadtest.standin import hash_embed
+    from src.config import settings
+    from src.db.session import engine
+    from src.services import moi_queries
+
+    statements: List[str] = []
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    summary: Dict[str, Dict[str, float]] = {}
+    for mode in MODES:
+        settings.MOI_RETRIEVAL_MODE = "hybrid" if mode == "hybrid" else "vector"
+        totals = {"mrr": 0.0, "hit@1": 0.0, "ndcg@10": 0.0, "statements": 0.0}
+        for case in cases:
+            embedding = None if mode == "like" else hash_embed(case["query"], dim)
+            statements.clear()
+            result = await moi_queries.query_secondary_price(case["query"], embedding)
+            relevant = set(case["relevant"])
+            # 同一物料在不同项目下多次出现时只按首次出现计，避免重复行抬高指标
+            seen: List[str] = []
+            for row in result.get("rows", []):
+                if row["物料短描述"] not in seen:
+                    seen.append(row["物料短描述"])
+            flags = [name in relevant for name in seen]
+            totals["mrr"] += reciprocal_rank(flags)
+            totals["hit@1"] += 1.0 if flags[:1] == [True] else 0.0
+            totals["ndcg@10"] += ndcg(flags, len(relevant))
+            totals["statements"] += len(statements)
+            if verbose:
+                print(f"  [{mode}] {case['query']}: {seen[:5]}")
+        summary[mode] = {name: value / len(cases) for name, value in totals.items()}
+    await engine.dispose()
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="compare MOI retrieval relevance on a labelled set")
+    parser.add_argument("--price-rows", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--max-distance", type=float, help="覆盖 MOI_HYBRID_MAX_DISTANCE")
+    parser.add_argument("--keyword-weight", type=float, help="覆盖 MOI_HYBRID_KEYWORD_WEIGHT")
+    parser.add_argument("--verbose", action="store_true", help="打印每个查询的前 5 个物料")
+    args = parser.parse_args()
+
+    with open(LABELS_PATH, encoding="utf-8") as f:
+        cases = json.load(f)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(tmp, 'app.db')}"
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+        if args.max_distance is not None:
+            os.environ["MOI_HYBRID_MAX_DISTANCE"] = str(args.max_distance)
+        if args.keyword_weight is not None:
+            os.environ["MOI_HYBRID_KEYWORD_WEIGHT"] = str(args.keyword_weight)
+
+        from benchmarks.loadtest.standin import install_sqlite_hooks, prepare_moi_db
+
+        moi_db = os.path.join(tmp, "moi.db")
+        prepare_moi_db(moi_db, bidding_rows=0, price_rows=args.price_rows, dim=args.dim)
+
+        from src.db.session import engine
+
+        install_sqlite_hooks(engine, moi_db)
+        summary = asyncio.run(run(cases, args.dim, args.verbose))
+
+    print(f"{len(cases)} labelled queries, {args.price_rows} price rows")
+    print(f"{'mode':<8}{'MRR':>8}{'Hit@1':>8}{'nDCG@10':>9}{'SQL/query':>11}")
+    for mode, metrics in summary.items():
+        print(
+            f"{mode:<8}{metrics['mrr']:>8.3f}{metrics['hit@1']:>8.3f}{metrics['ndcg@10']:>9.3f}"
+            f"{metrics['statements']:>11.2f}"
+        )
+
+    hybrid = summary["hybrid"]
+    failures = [
+        f"hybrid {name} {hybrid[name]:.3f} < {mode} {summary[mode][name]:.3f}"
+        for mode in ("like", "vector")
+        for name in ("mrr", "ndcg@10")
+        if hybrid[name] < summary[mode][name]
+    ]
+    if hybrid["statements"] > 1:
+        failures.append(f"hybrid runs {hybrid['statements']:.2f} statements per query")
+    if failures:
+        print("\nFAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+SQL 语句数守护：统计会话相关请求每次执行的 SQL 条数，超出预算时以非零退出码结束
+
+- 使用 SQLite 替身（临时文件）建表后，通过 httpx.ASGITransport 直接调用应用，不启动 uvicorn；
+- 在引擎上挂 before_cursor_execute 事件计数，executemany 记为一条；
+- 每个场景重复 --runs 次取最大值，防止缓存预热等偶然因素掩盖回退。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.bench_sql_statements --runs 3
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Tuple
+
+# 场景 -> 语句数预算
+BUDGETS: Dict[str, int] = {
+    "sync_new_conversation": 2,      # INSERT 会话 + INSERT 消息
+    "sync_existing_conversation": 3,  # 读取会话名称 + 刷新 updated_at + INSERT 消息
+    "list_messages": 2,              # 版本聚合 + 消息列表
+    "list_messages_not_modified": 1,  # 版本聚合后直接 304
+    "build_chat_messages": 2,        # 会话文件 + 版本聚合（历史命中缓存）
+    "delete_conversation": 3,        # 消息、文件、会话各一条 DELETE
+}
+
+
+class StatementCounter:
+    def __init__(self) -> None:
+        self.statements: List[str] = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        self.statements.append(" ".join(statement.split())[:120])
+
+    def reset(self) -> None:
+        self.statements = []
+
+
+async def run(runs: int) -> Dict[str, Tuple[int, List[str]]]:
+    import httpx
+    from sqlalchemy import event
+
+    from src.db.session import AsyncSessionLocal, engine
+    from src.main import app
+    from src.services.context_builder import build_chat_messages
+
+    counter = StatementCounter()
+    event.listen(engine.sync_engine, "before_cursor_execute", counter)
+    results: Dict[str, Tuple[int, List[str]]] = {}
+
+    async def measure(name: str, action: Callable):
+        counter.reset()
+        value = await action()
+        count, statements = results.get(name, (0, []))
+        if len(counter.statements) >= count:
+            results[name] = (len(counter.statements), list(counter.statements))
+        return value
+
+    def sync_body(conversation_id=None, role="user"):
+        now = int(time.time() * 1000)
+        return {
+            "id": conversation_id,
+            "title": "语句数守护",
+            "updated_at": now,
+            "message": {"role": role, "content": f"{role} message {now}", "timestamp": now},
+        }
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(runs):
+            resp = await measure(
+                "sync_new_conversation", lambda: client.post("/api/conversations/sync", json=sync_body())
+            )
+            resp.raise_for_status()
+            conv_id = resp.json()["id"]
+            resp = await measure(
+                "sync_existing_conversation",
+                lambda: client.post("/api/conversations/sync", json=sync_body(conv_id, "assistant")),
+            )
+            resp.raise_for_status()
+
+            url = f"/api/conversations/{conv_id}/messages"
+            resp = await measure("list_messages", lambda: client.get(url))
+            resp.raise_for_status()
+            etag = resp.headers["etag"]
+            resp = await measure(
+                "list_messages_not_modified", lambda: client.get(url, headers={"If-None-Match": etag})
+            )
+            assert resp.status_code == 304, resp.status_code
+
+            async def prompt():
+                async with AsyncSessionLocal() as db:
+                    return await build_chat_messages(db, conversation_id=conv_id, message="下一轮提问")
+
+            messages = await measure("build_chat_messages", prompt)
+            assert len(messages) == 4, messages
+
+            resp = await measure("delete_conversation", lambda: client.delete(f"/api/conversations/{conv_id}"))
+            resp.raise_for_status()
+    await engine.dispose()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="count SQL statements per conversation request")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--verbose", action="store_true", help="打印每个场景执行的语句")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "statements.db")
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{db_path}"
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+        os.environ.setdefault("DB_WRITE_BEHIND", "false")
+
+        from sqlalchemy import create_engine
+
+        from src.db.models import Base
+
+        sync_engine = create_engine(f"sqlite:///{db_path}")
+        Base.metadata.create_all(sync_engine)
+        sync_engine.dispose()
+
+        results = asyncio.run(run(args.runs))
+
+    failures = []
+    print(f"{'scenario':<32}{'statements':>12}{'budget':>8}")
+    for name, budget in BUDGETS.items():
+        count, statements = results[name]
+        print(f"{name:<32}{count:>12}{budget:>8}")
+        if args.verbose or count > budget:
+            for statement in statements:
+                print(f"    {statement}")
+        if count > budget:
+            failures.append(f"{name}: {count} > {budget}")
+
+    if failures:
+        print("\nFAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
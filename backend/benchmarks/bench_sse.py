@@ -0,0 +1,101 @@
+"""
+SSE 编码基准：对比旧版逐 chunk 构造 dict + json.dumps 与新编码器的单核吞吐
+
+用法（在 backend 目录下）：
+    python -m benchmarks.bench_sse --chunks 200000 --coalesce-ms 30
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+from typing import Any, AsyncGenerator, Dict, List
+
+from src.utils.sse import encode_chat_stream
+
+_TOKENS = ["根据", "您上传的", "采购方案", "，", "报价", "为", "12.5", "万元", "。", "\n"]
+
+
+def _make_chunks(n: int, reasoning_every: int) -> List[Any]:
+    chunks = []
+    for i in range(n):
+        text = _TOKENS[i % len(_TOKENS)]
+        if reasoning_every and i % reasoning_every == 0:
+            delta = SimpleNamespace(content=None, reasoning_content=text)
+        else:
+            delta = SimpleNamespace(content=text, reasoning_content=None)
+        chunks.append(SimpleNamespace(choices=[SimpleNamespace(delta=delta)]))
+    return chunks
+
+
+async def _replay(chunks: List[Any], tick_every: int) -> AsyncGenerator[Any, None]:
+    for i, chunk in enumerate(chunks):
+        # 周期性让出事件循环，模拟上游按网络包到达，使时间窗合帧能够生效
+        if tick_every and i % tick_every == 0:
+            await asyncio.sleep(0.001)
+        yield chunk
+
+
+async def _legacy(chunks: AsyncGenerator[Any, None]) -> AsyncGenerator[str, None]:
+    async for chunk in chunks:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta
+        delta_payload: Dict[str, Any] = {}
+        content = getattr(delta, "content", None)
+        if content:
+            delta_payload["content"] = content
+        reasoning = getattr(delta, "reasoning_content", None)
+        if reasoning:
+            delta_payload["reasoning_content"] = reasoning
+        payload = {"choices": [{"delta": delta_payload, "finish_reason": None}]}
+        yield f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+async def _drain(gen: AsyncGenerator[str, None]) -> Dict[str, int]:
+    frames = 0
+    size = 0
+    async for frame in gen:
+        frames += 1
+        size += len(frame.encode("utf-8"))
+    return {"frames": frames, "bytes": size}
+
+
+async def _run(args: argparse.Namespace) -> None:
+    chunks = _make_chunks(args.chunks, args.reasoning_every)
+    variants = {
+        "legacy": lambda: _legacy(_replay(chunks, args.tick_every)),
+        "fast": lambda: encode_chat_stream(_replay(chunks, args.tick_every)),
+        "fast+heartbeat": lambda: encode_chat_stream(
+            _replay(chunks, args.tick_every), heartbeat_seconds=15
+        ),
+        "coalesced": lambda: encode_chat_stream(
+            _replay(chunks, args.tick_every),
+            coalesce_ms=args.coalesce_ms,
+            coalesce_bytes=args.coalesce_bytes,
+            heartbeat_seconds=15,
+        ),
+    }
+    print(f"{'variant':<16}{'events/s':>14}{'frames':>10}{'bytes':>12}")
+    for name, factory in variants.items():
+        start = time.process_time()
+        stats = await _drain(factory())
+        cpu = time.process_time() - start
+        rate = args.chunks / cpu if cpu else float("inf")
+        print(f"{name:<16}{rate:>14,.0f}{stats['frames']:>10}{stats['bytes']:>12}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SSE encoder events/sec per core")
+    parser.add_argument("--chunks", type=int, default=200_000)
+    parser.add_argument("--reasoning-every", type=int, default=0)
+    parser.add_argument("--tick-every", type=int, default=50)
+    parser.add_argument("--coalesce-ms", type=int, default=30)
+    parser.add_argument("--coalesce-bytes", type=int, default=4096)
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+冷启动基准：`python -X importtime` 统计导入耗时，并测量 uvicorn 从启动到 /health 可用的时间
+
+- 每轮都在新的子进程中测量，取中位数；
+- 列出累计耗时最高的顶层包，并检查重依赖（pandas/pypdf/docx/pptx/openai）是否在启动阶段被导入；
+- 超出预算或重依赖被提前导入时以非零退出码结束，可用于 CI 守护。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.bench_startup --runs 5 --import-budget-ms 1500 --ready-budget-ms 3000
+"""
+
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import Dict, List, Optional, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 这些模块应在首次使用（或就绪后的后台预热）时才导入
+LAZY_MODULES = ("pandas", "pypdf", "docx", "pptx", "openai")
+
+_IMPORTTIME = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s*(\S+)$")
+
+
+def _env(db_path: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    # SQLite 替身即可：引擎创建时不建立连接，只是避免依赖外部数据库配置
+    env.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{db_path}")
+    env["LOG_LEVEL"] = "WARNING"
+    env["PREWARM_DELAY_SECONDS"] = "-1"
+    return env
+
+
+def measure_imports(env: Dict[str, str]) -> Tuple[float, Dict[str, float], List[str]]:
+    """返回 (src.main 累计导入毫秒, 各顶层包自身导入毫秒之和, 启动阶段被导入的重依赖)。"""
+    check = f"import sys, src.main; print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", check],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    total_us = 0
+    packages: Dict[str, float] = {}
+    for line in proc.stderr.splitlines():
+        match = _IMPORTTIME.match(line)
+        if not match:
+            continue
+        self_us, cumulative, name = int(match.group(1)), int(match.group(2)), match.group(3)
+        if name == "src.main":
+            total_us = cumulative
+        # 按 self 时间归并到顶层包：各行 self 时间互不重叠，求和不会重复计数
+        top = name.split(".")[0]
+        packages[top] = packages.get(top, 0) + self_us / 1000
+    eager = [m for m in proc.stdout.strip().split(",") if m]
+    return total_us / 1000, packages, eager
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_ready(env: Dict[str, str], timeout: float = 60) -> Optional[float]:
+    """uvicorn 进程启动到 /health 首次返回 200 的毫秒数。"""
+    port = _free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=tempfile.gettempdir(), env={**env, "PYTHONPATH": BACKEND_DIR},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as resp:
+                    if resp.status == 200:
+                        return (time.perf_counter() - start) * 1000
+            except OSError:
+                time.sleep(0.02)
+        return None
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="cold-start import and readiness benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget-ms", type=float, default=1500)
+    parser.add_argument("--ready-budget-ms", type=float, default=3000)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--output", help="结果 JSON 输出路径")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = _env(os.path.join(tmp, "startup.db"))
+        imports, ready, eager = [], [], set()
+        packages: Dict[str, List[float]] = {}
+        for i in range(args.runs):
+            total, pkgs, loaded = measure_imports(env)
+            imports.append(total)
+            eager.update(loaded)
+            for name, ms in pkgs.items():
+                packages.setdefault(name, []).append(ms)
+            ready_ms = measure_ready(env)
+            if ready_ms is not None:
+                ready.append(ready_ms)
+            print(f"run {i + 1}: import {total:.0f}ms, ready {ready_ms if ready_ms is None else f'{ready_ms:.0f}ms'}")
+
+    import_ms = statistics.median(imports)
+    ready_ms = statistics.median(ready) if ready else None
+    top = sorted(((statistics.median(v), k) for k, v in packages.items()), reverse=True)[: args.top]
+
+    print(f"\n{'package':<24}{'self ms':>14}")
+    for ms, name in top:
+        print(f"{name:<24}{ms:>14.1f}")
+    print(f"\nimport src.main: {import_ms:.0f}ms (budget {args.import_budget_ms:.0f}ms)")
+    print(f"ready (/health): {'n/a' if ready_ms is None else f'{ready_ms:.0f}ms'} (budget {args.ready_budget_ms:.0f}ms)")
+
+    failures = []
+    if import_ms > args.import_budget_ms:
+        failures.append("import budget exceeded")
+    if ready_ms is None or ready_ms > args.ready_budget_ms:
+        failures.append("readiness budget exceeded")
+    if eager:
+        failures.append(f"heavy modules imported at startup: {sorted(eager)}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(
+                {
+                    "import_ms": round(import_ms, 1),
+                    "ready_ms": None if ready_ms is None else round(ready_ms, 1),
+                    "packages": {name: round(ms, 1) for ms, name in top},
+                    "eager_modules": sorted(eager),
+                    "failures": failures,
+                },
+                fh, ensure_ascii=False, indent=2,
+            )
+
+    if failures:
+        print("\nFAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
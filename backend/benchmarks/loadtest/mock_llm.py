@@ -0,0 +1,102 @@
+"""
+OpenAI 兼容的模拟大模型服务
+支持流式/非流式 chat.completions 与 embeddings，首 token 时延与生成速率可配置。
+
+    MOCK_LLM_TTFT_MS=300 MOCK_LLM_TOKENS_PER_SEC=50 MOCK_LLM_TOKENS=200 \
+    uvicorn benchmarks.loadtest.mock_llm:app --port 9100
+"""
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from typing import Any, AsyncGenerator, Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from benchmarks.loadtest.standin import hash_embed
+
+TTFT_MS = float(os.getenv("MOCK_LLM_TTFT_MS", "300"))
+TOKENS_PER_SEC = float(os.getenv("MOCK_LLM_TOKENS_PER_SEC", "50"))
+TOKENS = int(os.getenv("MOCK_LLM_TOKENS", "200"))
+REASONING_TOKENS = int(os.getenv("MOCK_LLM_REASONING_TOKENS", "0"))
+EMBEDDING_DIM = int(os.getenv("MOCK_LLM_EMBEDDING_DIM", "64"))
+
+_WORDS = ["根据", "采购", "方案", "，", "供应商", "A", "报价", "12.5", "万元", "。", "\n"]
+
+app = FastAPI(title="mock-llm")
+
+
+def _chunk(completion_id: str, model: str, delta: Dict[str, Any], finish: Any = None) -> str:
+    payload = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+    }
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+async def _stream(model: str) -> AsyncGenerator[str, None]:
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    await asyncio.sleep(TTFT_MS / 1000)
+    interval = 1 / TOKENS_PER_SEC if TOKENS_PER_SEC > 0 else 0
+    yield _chunk(completion_id, model, {"role": "assistant", "content": ""})
+    for i in range(REASONING_TOKENS):
+        yield _chunk(completion_id, model, {"reasoning_content": _WORDS[i % len(_WORDS)]})
+        if interval:
+            await asyncio.sleep(interval)
+    for i in range(TOKENS):
+        yield _chunk(completion_id, model, {"content": _WORDS[i % len(_WORDS)]})
+        if interval:
+            await asyncio.sleep(interval)
+    yield _chunk(completion_id, model, {}, finish="stop")
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "mock")
+    if body.get("stream"):
+        return StreamingResponse(_stream(model), media_type="text/event-stream")
+
+    await asyncio.sleep(TTFT_MS / 1000 + (TOKENS / TOKENS_PER_SEC if TOKENS_PER_SEC else 0))
+    content = "".join(_WORDS[i % len(_WORDS)] for i in range(TOKENS))
+    if "JSON 数组" in json.dumps(body.get("messages", []), ensure_ascii=False):
+        content = json.dumps([{"name": "华为 S5735 交换机", "quantity": 10}], ensure_ascii=False)
+    return JSONResponse(
+        {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {"prompt_tokens": 0, "completion_tokens": TOKENS, "total_tokens": TOKENS},
+        }
+    )
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    inputs: List[str] = body["input"] if isinstance(body["input"], list) else [body["input"]]
+    return JSONResponse(
+        {
+            "object": "list",
+            "model": body.get("model", "mock-embedding"),
+            "data": [
+                {"object": "embedding", "index": i, "embedding": hash_embed(text, EMBEDDING_DIM)}
+                for i, text in enumerate(inputs)
+            ],
+        }
+    )
@@ -0,0 +1,388 @@
+"""
+端到端压测：拉起模拟大模型与 SQLite 替身后端，按并发度驱动核心接口，
+输出吞吐、p50/p99 延迟与后端进程 RSS，结果写成 JSON 供回归对比。
+
+    python -m benchmarks.loadtest.run --concurrency 32 --duration 20
+    python -m benchmarks.loadtest.run --baseline benchmarks/results/loadtest-baseline.json
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from benchmarks.loadtest.standin import (
+    hash_embed,
+    prepare_app_db,
+    prepare_moi_db,
+    sample_items,
+)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+SCENARIOS = ("chat", "sync", "parse", "moi")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[idx]
+
+
+def _rss_mb(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/status", encoding="utf-8") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+async def _wait_ready(url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url)).status_code < 500:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"service not ready: {url}")
+
+
+def _csv_payload(rows: int) -> bytes:
+    lines = ["序号,物料名称,规格型号,数量,单价（元）,合计（万元）"]
+    for i in range(rows):
+        lines.append(f"{i + 1},交换机,华为 S5735-L48T4X,{i % 7 + 1},{12000 + i},{(12000 + i) * (i % 7 + 1) / 10000:.2f}")
+    return "\n".join(lines).encode("utf-8")
+
+
+def _docx_payload(rows: int) -> bytes:
+    import docx
+
+    document = docx.Document()
+    document.add_paragraph("某省公司 2025 年网络设备集中采购项目立项书")
+    table = document.add_table(rows=rows + 1, cols=4)
+    for col, title in enumerate(["物料名称", "规格型号", "数量", "预算单价（万元）"]):
+        table.cell(0, col).text = title
+    for i in range(rows):
+        for col, value in enumerate(["服务器", "浪潮 NF5280M6", str(i % 5 + 1), f"{8 + i % 3}.5"]):
+            table.cell(i + 1, col).text = value
+    buf = io.BytesIO()
+    document.save(buf)
+    return buf.getvalue()
+
+
+class LoadContext:
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        self.conversation_ids: List[int] = []
+        self.items = sample_items(200)
+        self.csv = _csv_payload(args.parse_rows)
+        self.docx = _docx_payload(max(args.parse_rows // 10, 10))
+
+
+async def _seed(client: httpx.AsyncClient, ctx: LoadContext) -> None:
+    now = int(time.time() * 1000)
+    for c in range(ctx.args.seed_conversations):
+        conv_id = None
+        for m in range(ctx.args.seed_messages):
+            resp = await client.post(
+                "/api/conversations/sync",
+                json={
+                    "id": conv_id,
+                    "title": f"压测会话 {c}",
+                    "message": {
+                        "role": "user" if m % 2 == 0 else "assistant",
+                        "content": f"第 {m} 条消息：请对比华为 S5735 交换机的报价。" * 5,
+                        "timestamp": now + m,
+                    },
+                },
+            )
+            resp.raise_for_status()
+            conv_id = resp.json()["id"]
+        ctx.conversation_ids.append(conv_id)
+
+
+async def _chat(client: httpx.AsyncClient, rnd: random.Random, ctx: LoadContext) -> Dict[str, float]:
+    start = time.perf_counter()
+    ttfb = None
+    async with client.stream(
+        "POST",
+        "/api/chat/completions",
+        json={"message": "请给出比价结论", "conversation_id": rnd.choice(ctx.conversation_ids)},
+    ) as resp:
+        resp.raise_for_status()
+        async for line in resp.aiter_lines():
+            if ttfb is None and line.startswith("data: "):
+                ttfb = time.perf_counter() - start
+    return {"latency": time.perf_counter() - start, "ttfb": ttfb or 0.0}
+
+
+async def _sync(client: httpx.AsyncClient, rnd: random.Random, ctx: LoadContext) -> Dict[str, float]:
+    start = time.perf_counter()
+    resp = await client.post(
+        "/api/conversations/sync",
+        json={
+            "id": rnd.choice(ctx.conversation_ids),
+            "title": "压测会话",
+            "message": {
+                "role": "assistant",
+                "content": "根据报价对比，推荐供应商 A。" * 20,
+                "timestamp": int(time.time() * 1000),
+            },
+        },
+    )
+    resp.raise_for_status()
+    return {"latency": time.perf_counter() - start}
+
+
+async def _parse(client: httpx.AsyncClient, rnd: random.Random, ctx: LoadContext) -> Dict[str, float]:
+    start = time.perf_counter()
+    resp = await client.post(
+        "/api/files/parse",
+        files=[
+            ("files", ("报价单.csv", ctx.csv, "text/csv")),
+            (
+                "files",
+                (
+                    "立项书.docx",
+                    ctx.docx,
+                    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+                ),
+            ),
+        ],
+    )
+    resp.raise_for_status()
+    return {"latency": time.perf_counter() - start}
+
+
+async def _moi(client: httpx.AsyncClient, rnd: random.Random, ctx: LoadContext) -> Dict[str, float]:
+    item = rnd.choice(ctx.items)
+    path, body = rnd.choice(
+        [
+            ("/api/moi/query/procurement-projects", {"item_name": item}),
+            (
+                "/api/moi/query/historical-performance",
+                {"item_name": item, "embedding": hash_embed(item, ctx.args.embedding_dim)},
+            ),
+            (
+                "/api/moi/query/secondary-price",
+                {"item_name": item, "embedding": hash_embed(item, ctx.args.embedding_dim)},
+            ),
+        ]
+    )
+    start = time.perf_counter()
+    resp = await client.post(path, json=body)
+    resp.raise_for_status()
+    return {"latency": time.perf_counter() - start}
+
+
+SCENARIO_FUNCS: Dict[str, Callable[..., Awaitable[Dict[str, float]]]] = {
+    "chat": _chat,
+    "sync": _sync,
+    "parse": _parse,
+    "moi": _moi,
+}
+
+
+async def _run_scenario(
+    name: str, base_url: str, ctx: LoadContext, app_pid: int
+) -> Dict[str, Any]:
+    args = ctx.args
+    func = SCENARIO_FUNCS[name]
+    samples: List[Dict[str, float]] = []
+    errors = 0
+    rss: List[float] = []
+    deadline = time.monotonic() + args.duration
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+
+        async def worker(seed: int) -> None:
+            nonlocal errors
+            rnd = random.Random(seed)
+            while time.monotonic() < deadline:
+                try:
+                    samples.append(await func(client, rnd, ctx))
+                except Exception:  # noqa: BLE001
+                    errors += 1
+
+        async def sample_rss() -> None:
+            while time.monotonic() < deadline:
+                value = _rss_mb(app_pid)
+                if value is not None:
+                    rss.append(value)
+                await asyncio.sleep(0.5)
+
+        started = time.monotonic()
+        await asyncio.gather(sample_rss(), *(worker(i) for i in range(args.concurrency)))
+        elapsed = time.monotonic() - started
+
+    latencies = [s["latency"] * 1000 for s in samples]
+    result: Dict[str, Any] = {
+        "requests": len(samples),
+        "errors": errors,
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else 0,
+        "p50_ms": round(_percentile(latencies, 50), 2),
+        "p99_ms": round(_percentile(latencies, 99), 2),
+        "mean_ms": round(sum(latencies) / len(latencies), 2) if latencies else 0,
+        "rss_peak_mb": round(max(rss), 1) if rss else None,
+    }
+    ttfb = [s["ttfb"] * 1000 for s in samples if s.get("ttfb")]
+    if ttfb:
+        result["ttfb_p50_ms"] = round(_percentile(ttfb, 50), 2)
+        result["ttfb_p99_ms"] = round(_percentile(ttfb, 99), 2)
+    return result
+
+
+def _compare(current: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> bool:
+    """打印与基线的差异，p99 或吞吐退化超过阈值时返回 False。"""
+    ok = True
+    print(f"\n{'scenario':<10}{'metric':<16}{'baseline':>12}{'current':>12}{'delta':>10}")
+    for name, cur in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        for metric, higher_is_better in (
+            ("throughput_rps", True),
+            ("p50_ms", False),
+            ("p99_ms", False),
+            ("rss_peak_mb", False),
+        ):
+            b, c = base.get(metric), cur.get(metric)
+            if not b or c is None:
+                continue
+            delta = (c - b) / b
+            regressed = -delta > max_regression if higher_is_better else delta > max_regression
+            mark = "  !" if regressed and metric != "rss_peak_mb" else ""
+            ok = ok and not (regressed and metric in ("throughput_rps", "p99_ms"))
+            print(f"{name:<10}{metric:<16}{b:>12}{c:>12}{delta:>+10.1%}{mark}")
+    return ok
+
+
+async def _main(args: argparse.Namespace) -> int:
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    workdir = tempfile.mkdtemp(prefix="sca-loadtest-")
+    app_db = os.path.join(workdir, "app.db")
+    moi_db = os.path.join(workdir, "moi.db")
+    print(f"preparing stand-ins in {workdir} ...")
+    prepare_app_db(app_db)
+    prepare_moi_db(moi_db, args.bidding_rows, args.price_rows, args.embedding_dim)
+
+    llm_port, app_port = _free_port(), _free_port()
+    env = dict(os.environ)
+    env.update(
+        {
+            "MOCK_LLM_TTFT_MS": str(args.llm_ttft_ms),
+            "MOCK_LLM_TOKENS_PER_SEC": str(args.llm_tokens_per_sec),
+            "MOCK_LLM_TOKENS": str(args.llm_tokens),
+            "MOCK_LLM_EMBEDDING_DIM": str(args.embedding_dim),
+            "DATABASE_URL": f"sqlite+aiosqlite:///{app_db}",
+            "LLM_BASE_URL": f"http://127.0.0.1:{llm_port}/v1",
+            "LLM_API_KEY": "mock",
+            "LOG_LEVEL": "WARNING",
+        }
+    )
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "benchmarks.loadtest.mock_llm:app",
+             "--port", str(llm_port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=env,
+        ),
+        subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.loadtest.serve_app",
+             "--port", str(app_port), "--moi-db", moi_db],
+            cwd=workdir, env={**env, "PYTHONPATH": BACKEND_DIR},
+        ),
+    ]
+    app_proc = procs[1]
+    base_url = f"http://127.0.0.1:{app_port}"
+    try:
+        await _wait_ready(f"http://127.0.0.1:{llm_port}/docs")
+        await _wait_ready(f"{base_url}/health")
+        ctx = LoadContext(args)
+        async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+            await _seed(client, ctx)
+
+        report: Dict[str, Any] = {
+            "meta": {
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "config": {k: v for k, v in vars(args).items() if k not in ("baseline", "output")},
+            },
+            "rss_idle_mb": _rss_mb(app_proc.pid),
+            "scenarios": {},
+        }
+        for name in scenarios:
+            print(f"running {name} (concurrency={args.concurrency}, {args.duration}s) ...")
+            report["scenarios"][name] = await _run_scenario(name, base_url, ctx, app_proc.pid)
+            print(f"  {json.dumps(report['scenarios'][name], ensure_ascii=False)}")
+        report["rss_end_mb"] = _rss_mb(app_proc.pid)
+    finally:
+        for proc in procs:
+            proc.terminate()
+        for proc in procs:
+            proc.wait(timeout=10)
+
+    output = args.output or os.path.join(RESULTS_DIR, "loadtest-latest.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, ensure_ascii=False, indent=2)
+    print(f"\nresults written to {output}")
+
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        if not _compare(report, baseline, args.max_regression):
+            print(f"\nregression beyond {args.max_regression:.0%} detected")
+            return 1
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="end-to-end load test with local stand-ins")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds per scenario")
+    parser.add_argument("--llm-ttft-ms", type=float, default=300)
+    parser.add_argument("--llm-tokens-per-sec", type=float, default=100)
+    parser.add_argument("--llm-tokens", type=int, default=200)
+    parser.add_argument("--bidding-rows", type=int, default=5000)
+    parser.add_argument("--price-rows", type=int, default=2000)
+    parser.add_argument("--embedding-dim", type=int, default=64)
+    parser.add_argument("--seed-conversations", type=int, default=20)
+    parser.add_argument("--seed-messages", type=int, default=20)
+    parser.add_argument("--parse-rows", type=int, default=500)
+    parser.add_argument("--output", help="result JSON path (default benchmarks/results/loadtest-latest.json)")
+    parser.add_argument("--baseline", help="baseline JSON to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    sys.exit(asyncio.run(_main(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""
+使用 SQLite 替身启动后端（由 run.py 以子进程方式拉起，DATABASE_URL 等通过环境变量传入）
+
+    DATABASE_URL=sqlite+aiosqlite:////tmp/app.db \
+    python -m benchmarks.loadtest.serve_app --port 8100 --moi-db /tmp/moi.db
+"""
+
+import argparse
+
+import uvicorn
+
+from benchmarks.loadtest.standin import install_sqlite_hooks
+from src.db.session import engine
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="serve backend against SQLite stand-ins")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--moi-db", required=True)
+    args = parser.parse_args()
+
+    install_sqlite_hooks(engine, args.moi_db)
+
+    from src.main import app
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+本地数据库替身与合成数据集
+- 会话库：SQLite 文件，表结构直接由 src.db.models 生成；
+- MOI 库：另一个 SQLite 文件，以 xunyuan_agent 名称 ATTACH，包含合成的
+  bidding_records_1 / product_price 及向量列，并注册 l2_distance 函数，使路由中的 SQL 原样可用；
+  供应商聚合表只建表，由 src.db.refresh_supplier_stats 刷新。
+"""
+
+import hashlib
+import json
+import math
+import random
+import sqlite3
+from functools import lru_cache
+from typing import List, Sequence
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.db.models import Base
+
+MOI_SCHEMA = "xunyuan_agent"
+
+_CATEGORIES = {
+    "交换机": ["华为 S5735", "华为 S6730", "H3C S5130", "锐捷 RG-S5750", "中兴 ZXR10 5960"],
+    "服务器": ["浪潮 NF5280M6", "华为 FusionServer 2288H", "新华三 R4900 G5", "联想 SR650"],
+    "光模块": ["10G SFP+ 多模", "25G SFP28 单模", "100G QSFP28 LR4", "400G QSFP-DD"],
+    "存储": ["华为 OceanStor 5310", "浪潮 AS5300G5", "新华三 UniStor X10000"],
+    "UPS电源": ["华为 UPS5000-E", "科华 KR33", "山特 3C3 Pro"],
+    "光缆": ["GYTA-24B1", "GYTS-48B1", "ADSS-96B1"],
+}
+_UNITS = ["中国移动北京公司", "中国移动广东公司", "中国移动浙江公司", "中国移动江苏公司", "中国移动四川公司"]
+_SUPPLIERS = [f"供应商{chr(0x41 + i // 26)}{chr(0x41 + i % 26)}科技有限公司" for i in range(120)]
+_STATUSES = ["中标", "入围", "落标"]
+
+
+def hash_embed(text: str, dim: int = 64) -> List[float]:
+    """字符二元组哈希向量：确定性、无外部依赖，语义相近的文本距离更近。"""
+    vec = [0.0] * dim
+    chars = text.replace(" ", "")
+    grams = [chars[i : i + 2] for i in range(max(len(chars) - 1, 1))]
+    for gram in grams:
+        digest = hashlib.md5(gram.encode("utf-8")).digest()
+        idx = int.from_bytes(digest[:4], "little") % dim
+        vec[idx] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+    return [round(v / norm, 6) for v in vec]
+
+
+def _vec_literal(vec: Sequence[float]) -> str:
+    return "[" + ",".join(map(str, vec)) + "]"
+
+
+@lru_cache(maxsize=200_000)
+def _parse_vec(literal: str) -> tuple:
+    return tuple(json.loads(literal))
+
+
+def l2_distance(a, b) -> float:
+    if a is None or b is None:
+        return float("inf")
+    va, vb = _parse_vec(a), _parse_vec(b)
+    if len(va) != len(vb):
+        return float("inf")
+    return math.sqrt(sum((x - y) ** 2 for x, y in zip(va, vb)))
+
+
+def prepare_app_db(path: str) -> None:
+    """按 ORM 模型建表，得到与线上同构的会话/消息库。"""
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+
+def prepare_moi_db(path: str, bidding_rows: int, price_rows: int, dim: int, seed: int = 7) -> None:
+    rnd = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        DROP TABLE IF EXISTS bidding_records_1;
+        DROP TABLE IF EXISTS product_price;
+        DROP TABLE IF EXISTS supplier_product_stats;
+        DROP TABLE IF EXISTS supplier_project_stats;
+        DROP TABLE IF EXISTS supplier_stats_state;
+        CREATE TABLE bidding_records_1 (
+          `id` INTEGER PRIMARY KEY AUTOINCREMENT,
+          `细化产品` TEXT, `单位` TEXT, `项目名称` TEXT, `供应商名称` TEXT,
+          `参与状态` TEXT, `是否参股企业` TEXT, `中标金额_万元` DECIMAL(18, 2),
+          `供应商联系人` TEXT, `电话号码` TEXT, `电子邮件` TEXT,
+          `project_name_embedding` TEXT, `product_embedding` TEXT
+        );
+        CREATE TABLE product_price (
+          `项目名称` TEXT, `单位` TEXT, `物料编码` TEXT, `物料短描述` TEXT, `物料单位` TEXT,
+          `平均单价（元）` TEXT, `最高价（元）` TEXT, `最低价（元）` TEXT,
+          `project_name_embedding` TEXT, `product_embedding` TEXT
+        );
+        CREATE INDEX idx_bidding_records_project ON bidding_records_1 (`项目名称`);
+        CREATE INDEX idx_product_price_project ON product_price (`项目名称`);
+        CREATE TABLE supplier_product_stats (
+          `供应商名称` TEXT NOT NULL, `细化产品` TEXT NOT NULL,
+          `投标次数` INTEGER NOT NULL DEFAULT 0, `中标次数` INTEGER NOT NULL DEFAULT 0,
+          `合计中标金额_万元` DECIMAL(18, 2) NOT NULL DEFAULT 0,
+          PRIMARY KEY (`供应商名称`, `细化产品`)
+        );
+        CREATE TABLE supplier_project_stats (
+          `供应商名称` TEXT NOT NULL, `项目分组` TEXT NOT NULL,
+          `投标次数` INTEGER NOT NULL DEFAULT 0, `中标次数` INTEGER NOT NULL DEFAULT 0,
+          `合计中标金额_万元` DECIMAL(18, 2) NOT NULL DEFAULT 0,
+          PRIMARY KEY (`供应商名称`, `项目分组`)
+        );
+        CREATE TABLE supplier_stats_state (
+          `name` TEXT PRIMARY KEY, `last_record_id` INTEGER NOT NULL DEFAULT 0, `refreshed_at` TIMESTAMP
+        );
+        """
+    )
+
+    categories = list(_CATEGORIES.items())
+    bidding = []
+    for i in range(bidding_rows):
+        category, models = categories[i % len(categories)]
+        product = f"{rnd.choice(models)} {category}"
+        unit = rnd.choice(_UNITS)
+        project = f"{unit}{2021 + i % 4}年{category}集中采购项目（第{i % 9 + 1}批）"
+        bidding.append(
+            (
+                product,
+                unit,
+                project,
+                rnd.choice(_SUPPLIERS),
+                rnd.choices(_STATUSES, weights=(3, 2, 5))[0],
+                rnd.choice(["是", "否"]),
+                round(rnd.uniform(5, 3000), 2),
+                "张工",
+                "010-00000000",
+                "bid@example.com",
+                _vec_literal(hash_embed(project, dim)),
+                _vec_literal(hash_embed(product, dim)),
+            )
+        )
+    conn.executemany(
+        "INSERT INTO bidding_records_1 (`细化产品`, `单位`, `项目名称`, `供应商名称`, `参与状态`,"
+        " `是否参股企业`, `中标金额_万元`, `供应商联系人`, `电话号码`, `电子邮件`,"
+        " `project_name_embedding`, `product_embedding`) VALUES (?,?,?,?,?,?,?,?,?,?,?,?)",
+        bidding,
+    )
+
+    prices = []
+    for i in range(price_rows):
+        category, models = categories[i % len(categories)]
+        desc = f"{rnd.choice(models)} {category}"
+        project = f"{rnd.choice(_UNITS)}{category}二次采购"
+        avg = rnd.uniform(100, 200_000)
+        prices.append(
+            (
+                project,
+                rnd.choice(_UNITS),
+                f"M{100000 + i}",
+                desc,
+                rnd.choice(["台", "套", "个", "米"]),
+                f"{avg:,.2f}",
+                f"{avg * 1.2:,.2f}",
+                f"{avg * 0.8:,.2f}",
+                _vec_literal(hash_embed(project, dim)),
+                _vec_literal(hash_embed(desc, dim)),
+            )
+        )
+    conn.executemany(
+        "INSERT INTO product_price VALUES (?,?,?,?,?,?,?,?,?,?)",
+        prices,
+    )
+    conn.commit()
+    conn.close()
+
+
+def install_sqlite_hooks(engine: AsyncEngine, moi_db_path: str) -> None:
+    """为 aiosqlite 连接挂载 MOI 库并注册 l2_distance，须在建立首个连接前调用。"""
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _attach(dbapi_connection, connection_record):  # pragma: no cover - 连接钩子
+        dbapi_connection.create_function("l2_distance", 2, l2_distance, deterministic=True)
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"ATTACH DATABASE '{moi_db_path}' AS {MOI_SCHEMA}")
+        cursor.close()
+
+
+def sample_items(n: int, seed: int = 11) -> List[str]:
+    """从合成数据的产品目录中抽取查询用的标的物名称。"""
+    rnd = random.Random(seed)
+    pool = [f"{m} {c}" for c, models in _CATEGORIES.items() for m in models]
+    pool += [m for models in _CATEGORIES.values() for m in models]
+    return [rnd.choice(pool) for _ in range(n)]
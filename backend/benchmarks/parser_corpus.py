@@ -0,0 +1,299 @@
+"""
+文件解析基准语料生成器
+按固定随机种子生成代表性文档（多 sheet 大表 xlsx、大 csv、200 页 PDF、大表格 docx、
+图片为主的 pptx、正文含 “MacBook” 的旧版 ppt），写入 benchmarks/corpus/ 并记录 manifest，参数不变时复用已有文件。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.parser_corpus --scale 1.0
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import shutil
+import struct
+import time
+from typing import Any, Callable, Dict, List
+
+from src.config import settings
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+# 生成逻辑变化时递增，使旧语料失效
+CORPUS_VERSION = 2
+
+_PRODUCTS = ["华为 S5735 交换机", "浪潮 NF5280M6 服务器", "100G QSFP28 光模块", "OceanStor 5310 存储", "UPS5000-E 电源"]
+_UNITS = ["台", "套", "个", "米"]
+
+
+def _rows(rnd: random.Random, n: int) -> List[List[Any]]:
+    rows = []
+    for i in range(n):
+        qty = rnd.randint(1, 200)
+        price = round(rnd.uniform(100, 200_000), 2)
+        rows.append(
+            [i + 1, rnd.choice(_PRODUCTS), f"M{100000 + i}", rnd.choice(_UNITS), qty, price, round(qty * price / 10000, 4)]
+        )
+    return rows
+
+
+_HEADER = ["序号", "物料名称", "物料编码", "单位", "数量", "单价（元）", "合计（万元）"]
+
+
+def gen_xlsx(path: str, rnd: random.Random, scale: float) -> None:
+    """多 sheet 工作簿：主表 10 万行，另有两个较小的明细表。"""
+    import openpyxl
+
+    wb = openpyxl.Workbook(write_only=True)
+    for title, n in (("报价明细", 100_000), ("备件清单", 20_000), ("服务费用", 2_000)):
+        ws = wb.create_sheet(title)
+        ws.append(_HEADER)
+        for row in _rows(rnd, max(int(n * scale), 10)):
+            ws.append(row)
+    wb.save(path)
+
+
+def gen_csv(path: str, rnd: random.Random, scale: float) -> None:
+    import csv
+
+    with open(path, "w", encoding="utf-8", newline="") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(_HEADER)
+        writer.writerows(_rows(rnd, max(int(100_000 * scale), 10)))
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def gen_pdf(path: str, rnd: random.Random, scale: float) -> None:
+    """直接写出 PDF 对象与 xref，不依赖额外库；正文为 Helvetica 英文文本（每页约 45 行）。"""
+    pages = max(int(200 * scale), 2)
+    objects: List[bytes] = []  # 对象号 = 下标 + 1
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    objects.append(b"")  # Pages，最后回填 Kids
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    kids = []
+    for p in range(pages):
+        lines = [f"Procurement specification - page {p + 1}"]
+        for row in _rows(rnd, 44):
+            lines.append(
+                f"{row[0]:>3}  item M{100000 + p * 44 + row[0]}  qty {row[4]:>4}  unit price {row[5]:>12,.2f} CNY  total {row[6]:.4f} wan"
+            )
+        ops = ["BT", "/F1 9 Tf", "11 TL", "40 800 Td"]
+        ops += [f"({_pdf_escape(line)}) Tj T*" for line in lines]
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_ref = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids),
+        pages,
+    )
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (i + 1, body))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for off in offsets:
+        out.write(b"%010d 00000 n \n" % off)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    with open(path, "wb") as fh:
+        fh.write(out.getvalue())
+
+
+def gen_docx(path: str, rnd: random.Random, scale: float) -> None:
+    """立项书样式：若干段落加两张大表（合计约 3000 行 × 7 列）。"""
+    import docx
+
+    document = docx.Document()
+    document.add_heading("2025 年网络设备集中采购项目立项书", level=1)
+    for i in range(max(int(60 * scale), 5)):
+        document.add_paragraph(f"第 {i + 1} 条：供应商须按附表提供设备及三年原厂维保服务，交付期不超过 30 日。")
+    for n in (2_500, 500):
+        rows = _rows(rnd, max(int(n * scale), 10))
+        table = document.add_table(rows=len(rows) + 1, cols=len(_HEADER))
+        # 按行取 cells，避免 table.cell() 每次重算整表网格，只影响语料生成速度
+        for row, values in zip(table.rows, [_HEADER] + rows):
+            cells = row.cells
+            for c, value in enumerate(values):
+                cells[c].text = str(value)
+    document.save(path)
+
+
+def _png(rnd: random.Random, size: int) -> bytes:
+    from PIL import Image
+
+    img = Image.new("RGB", (size, size))
+    # 随机噪声图，避免被 PNG 压缩成极小文件
+    img.frombytes(rnd.randbytes(size * size * 3))
+    buf = io.BytesIO()
+    img.save(buf, format="PNG", compress_level=1)
+    return buf.getvalue()
+
+
+def gen_pptx(path: str, rnd: random.Random, scale: float) -> None:
+    """汇报材料样式：每页一张标题加 2 张大图，文字很少。"""
+    import pptx
+    from pptx.util import Inches
+
+    prs = pptx.Presentation()
+    images = [_png(rnd, 512) for _ in range(8)]
+    layout = prs.slide_layouts[5]  # 仅标题
+    for i in range(max(int(60 * scale), 3)):
+        slide = prs.slides.add_slide(layout)
+        slide.shapes.title.text = f"供应商现场考察 {i + 1}"
+        for j in range(2):
+            slide.shapes.add_picture(
+                io.BytesIO(images[(i * 2 + j) % len(images)]),
+                Inches(0.5 + j * 4.6),
+                Inches(1.8),
+                width=Inches(4.4),
+            )
+    prs.save(path)
+
+
+_PPT_LINES = ["笔记本电脑采购报价", "MacBook Pro 笔记本电脑 报价", "ThinkPad X1 Carbon 笔记本电脑 报价"]
+
+_OLE_FREE, _OLE_END, _OLE_FAT, _OLE_NONE = 0xFFFFFFFF, 0xFFFFFFFE, 0xFFFFFFFD, 0xFFFFFFFF
+
+
+def _ole_dir_entry(name: str, kind: int, color: int, left: int, right: int, child: int, start: int, size: int) -> bytes:
+    encoded = (name + "\0").encode("utf-16-le") if name else b""
+    return struct.pack(
+        "<64sHBBIII16sIQQIQ",
+        encoded, len(encoded), kind, color, left, right, child, b"", 0, 0, 0, start, size,
+    )
+
+
+def _ole_file(streams: List[tuple]) -> bytes:
+    """最小的 v3 复合文档（512 字节扇区）：流都小于 4096 字节，放在 mini stream 中。
+
+    streams 为 [(名称, 内容)]，最多两个，按名称排序（长度优先、再按大写比较）后挂成右兄弟链。
+    """
+    mini = b""
+    minifat: List[int] = []
+    starts = []
+    for _, body in streams:
+        count = max((len(body) + 63) // 64, 1)
+        starts.append(len(minifat))
+        minifat += list(range(len(minifat) + 1, len(minifat) + count)) + [_OLE_END]
+        mini += body.ljust(count * 64, b"\0")
+    mini_sectors = (len(mini) + 511) // 512
+    # 扇区布局：0 FAT、1 目录、2 mini FAT、3.. mini stream
+    fat = [_OLE_FAT, _OLE_END, _OLE_END] + list(range(4, 3 + mini_sectors)) + [_OLE_END]
+    order = sorted(range(len(streams)), key=lambda i: (len(streams[i][0]), streams[i][0].upper()))
+    entries = [_ole_dir_entry("Root Entry", 5, 1, _OLE_NONE, _OLE_NONE, 1, 3, len(mini))]
+    for pos, i in enumerate(order):
+        right = pos + 2 if pos + 1 < len(order) else _OLE_NONE
+        # 首个节点为黑、第二个为红，满足红黑树的黑高约束
+        name, body = streams[i]
+        entries.append(_ole_dir_entry(name, 2, 1 if pos == 0 else 0, _OLE_NONE, right, _OLE_NONE, starts[i], len(body)))
+    while len(entries) % 4:
+        entries.append(_ole_dir_entry("", 0, 0, _OLE_NONE, _OLE_NONE, _OLE_NONE, 0, 0))
+
+    header = struct.pack(
+        "<8s16sHHHHH6sIIIIIIIII",
+        b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", b"", 0x3E, 3, 0xFFFE, 9, 6, b"",
+        0, 1, 1, 0, 4096, 2, 1, _OLE_END, 0,
+    ) + struct.pack("<109I", 0, *([_OLE_FREE] * 108))
+    return b"".join([
+        header,
+        struct.pack("<128I", *(fat + [_OLE_FREE] * (128 - len(fat)))),
+        b"".join(entries).ljust(512, b"\0"),
+        struct.pack("<128I", *(minifat + [_OLE_FREE] * (128 - len(minifat)))),
+        mini.ljust(mini_sectors * 512, b"\0"),
+    ])
+
+
+def _ppt_record(rec_type: int, body: bytes, ver_instance: int = 0) -> bytes:
+    return struct.pack("<HHI", ver_instance, rec_type, len(body)) + body
+
+
+def gen_ppt(path: str, rnd: random.Random, scale: float) -> None:
+    """旧版 ppt：正文含中文时按 UTF-16 存储，“MacBook” 中带有 Excel 的流名 “Book”，用于核对类型识别。
+
+    本机有 LibreOffice 时由 pptx 转换得到完整文件，可以计时解析；否则手写只含文本原子的最小复合文档，仅用于识别。
+    """
+    import pptx
+
+    if shutil.which(settings.SOFFICE_PATH):
+        from src.utils.parse_file_utils import _convert_office
+
+        prs = pptx.Presentation()
+        for line in _PPT_LINES:
+            slide = prs.slides.add_slide(prs.slide_layouts[1])
+            slide.shapes.title.text = line
+            slide.placeholders[1].text = "\n".join(f"{row[1]} × {row[4]}" for row in _rows(rnd, 10))
+        buf = io.BytesIO()
+        prs.save(buf)
+        data = _convert_office(buf.getvalue(), "pptx", "ppt")
+    else:
+        # TextCharsAtom（0x0FA0）保存 UTF-16 文本；CurrentUserAtom（0x0FF6）的 headerToken 标识未加密文件
+        document = b"".join(_ppt_record(0x0FA0, line.encode("utf-16-le")) for line in _PPT_LINES)
+        current_user = _ppt_record(0x0FF6, struct.pack("<IIIHHHBBH", 0x14, 0xE391C05F, 0, 0, 0x03F4, 3, 0, 0, 0))
+        data = _ole_file([("PowerPoint Document", document), ("Current User", current_user)])
+    with open(path, "wb") as fh:
+        fh.write(data)
+
+
+GENERATORS: Dict[str, Callable[[str, random.Random, float], None]] = {
+    "sheets_100k.xlsx": gen_xlsx,
+    "rows_100k.csv": gen_csv,
+    "spec_200p.pdf": gen_pdf,
+    "tables_large.docx": gen_docx,
+    "images_heavy.pptx": gen_pptx,
+    "macbook_quote.ppt": gen_ppt,
+}
+
+
+def ensure_corpus(scale: float = 1.0, seed: int = 20250101, force: bool = False) -> Dict[str, str]:
+    """生成（或复用）语料，返回 文件名 -> 绝对路径。"""
+    corpus_dir = os.path.join(CORPUS_DIR, f"scale-{scale:g}")
+    manifest_path = os.path.join(corpus_dir, "manifest.json")
+    expected = {"version": CORPUS_VERSION, "scale": scale, "seed": seed}
+    paths = {name: os.path.join(corpus_dir, name) for name in GENERATORS}
+
+    if not force and os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as fh:
+            manifest = json.load(fh)
+        if all(manifest.get(k) == v for k, v in expected.items()) and all(
+            os.path.exists(p) for p in paths.values()
+        ):
+            return paths
+
+    os.makedirs(corpus_dir, exist_ok=True)
+    files = {}
+    for name, gen in GENERATORS.items():
+        start = time.perf_counter()
+        # 每个文件独立种子，增删某个生成器不影响其它文件内容
+        gen(paths[name], random.Random(f"{seed}:{name}"), scale)
+        files[name] = os.path.getsize(paths[name])
+        print(f"generated {name:<20} {files[name] / 1024 / 1024:8.2f} MiB in {time.perf_counter() - start:.1f}s")
+    with open(manifest_path, "w", encoding="utf-8") as fh:
+        json.dump({**expected, "files": files}, fh, ensure_ascii=False, indent=2)
+    return paths
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="generate parser benchmark corpus")
+    parser.add_argument("--scale", type=float, default=1.0, help="行数/页数缩放系数，冒烟测试可用 0.05")
+    parser.add_argument("--seed", type=int, default=20250101)
+    parser.add_argument("--force", action="store_true")
+    args = parser.parse_args()
+    for name, path in ensure_corpus(args.scale, args.seed, args.force).items():
+        print(f"{name:<20} {path}")
+
+
+if __name__ == "__main__":
+    main()
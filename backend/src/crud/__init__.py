@@ -1,2 +1,3 @@
 from .crud_conversations import crud_conversations  # noqa: F401
 from .crud_messages import crud_messages  # noqa: F401
+from .crud_conversation_files import crud_conversation_files  # noqa: F401
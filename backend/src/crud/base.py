@@ -1,37 +1,63 @@
-from typing import Any, Dict, Generic, Optional, Type, TypeVar
+from typing import Any, Dict, Generic, Optional, Sequence, Type, TypeVar
 
-from sqlalchemy import delete, update
+from sqlalchemy import delete, insert, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.db.models import Base
+from src.utils.tracing import span
 
 ModelType = TypeVar("ModelType", bound=Base)
 
 
 class CRUDBase(Generic[ModelType]):
-    """通用 CRUD 基类，提供基础的 get/create/update 能力。"""
+    """通用 CRUD 基类，提供基础的 get/create/update 能力。
+
+    insert / update_by_id / delete_by_ids 均为单条 SQL，不经过 ORM 会话的 flush 与 refresh；
+    自增 id 取自驱动返回的 lastrowid，不依赖 RETURNING（MySQL / MatrixOne 不支持）。
+    """
 
     def __init__(self, model: Type[ModelType]) -> None:
         self.model = model
+        # span 名称前缀，如 crud.messages
+        self.span_prefix = f"crud.{model.__tablename__}"
 
     async def get(self, db: AsyncSession, obj_id: int) -> Optional[ModelType]:
-        return await db.get(self.model, obj_id)
+        with span(f"{self.span_prefix}.get"):
+            return await db.get(self.model, obj_id)
 
     async def create(
         self, db: AsyncSession, *, obj_in: Dict[str, Any]
     ) -> ModelType:
-        db_obj = self.model(**obj_in)
-        db.add(db_obj)
-        await db.flush()
-        return db_obj
+        with span(f"{self.span_prefix}.create"):
+            db_obj = self.model(**obj_in)
+            db.add(db_obj)
+            await db.flush()
+            return db_obj
+
+    async def insert(self, db: AsyncSession, *, values: Dict[str, Any]) -> int:
+        """单条 INSERT，返回自增 id。"""
+        with span(f"{self.span_prefix}.insert"):
+            result = await db.execute(insert(self.model).values(**values))
+            return result.inserted_primary_key[0]
 
     async def update_by_id(
         self, db: AsyncSession, obj_id: int, values: Dict[str, Any]
-    ) -> None:
-        await db.execute(
-            update(self.model).where(self.model.id == obj_id).values(**values)
-        )
-
-    async def delete_by_id(self, db: AsyncSession, obj_id: int) -> None:
-        await db.execute(delete(self.model).where(self.model.id == obj_id))
+    ) -> int:
+        """按 id 更新，返回影响行数（0 表示记录不存在）。"""
+        with span(f"{self.span_prefix}.update_by_id"):
+            result = await db.execute(
+                update(self.model).where(self.model.id == obj_id).values(**values)
+            )
+            return result.rowcount
+
+    async def delete_by_id(self, db: AsyncSession, obj_id: int) -> int:
+        return await self.delete_by_ids(db, [obj_id])
+
+    async def delete_by_ids(self, db: AsyncSession, obj_ids: Sequence[int]) -> int:
+        """按 id 批量删除，返回删除行数。"""
+        if not obj_ids:
+            return 0
+        with span(f"{self.span_prefix}.delete_by_ids"):
+            result = await db.execute(delete(self.model).where(self.model.id.in_(list(obj_ids))))
+            return result.rowcount
 
@@ -0,0 +1,123 @@
+import hashlib
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer
+
+from src.crud.base import CRUDBase
+from src.db.models import ConversationFile, now_shanghai
+from src.utils.compression import compress, decompress
+from src.utils.tracing import traced
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def read_content(obj: ConversationFile) -> str:
+    """解压文件正文（需已加载 content 列）。"""
+    return decompress(obj.codec, obj.content).decode("utf-8")
+
+
+class CRUDConversationFiles(CRUDBase[ConversationFile]):
+    @traced("crud.conversation_files.get_by_hash")
+    async def get_by_hash(
+        self, db: AsyncSession, *, conversation_id: int, digest: str, locking: bool = False
+    ) -> Optional[ConversationFile]:
+        """locking 为真时使用加锁读，能读到本事务快照之后其他事务提交的记录。"""
+        stmt = select(ConversationFile).where(
+            ConversationFile.conversation_id == conversation_id,
+            ConversationFile.content_hash == digest,
+        )
+        if locking:
+            stmt = stmt.with_for_update()
+        result = await db.execute(stmt)
+        return result.scalars().first()
+
+    async def store(
+        self,
+        db: AsyncSession,
+        *,
+        conversation_id: int,
+        name: str,
+        file_type: str,
+        content: str,
+        price_summary: Optional[str] = None,
+    ) -> Tuple[ConversationFile, bool]:
+        """压缩保存解析后的正文，返回 (记录, 是否新建)；同一会话内正文相同则复用已有记录。
+
+        并发上传同一文件时两边都可能通过哈希检查：后插入的一方触发唯一键冲突，改为读取先提交的记录。
+        插入为单条 INSERT（不经 ORM flush），冲突只影响该语句，会话中此前的写入不受影响。
+        """
+        digest = content_hash(content)
+        existing = await self.get_by_hash(db, conversation_id=conversation_id, digest=digest)
+        if existing is not None:
+            return existing, False
+        codec, blob = compress(content.encode("utf-8"))
+        now = now_shanghai()
+        values = {
+            "conversation_id": conversation_id,
+            "name": name[:255],
+            "file_type": file_type[:20],
+            "content_hash": digest,
+            "codec": codec,
+            "content": blob,
+            "content_chars": len(content),
+            "stored_bytes": len(blob),
+            "price_summary": price_summary or None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        try:
+            obj_id = await self.insert(db, values=values)
+        except IntegrityError:
+            existing = await self.get_by_hash(db, conversation_id=conversation_id, digest=digest, locking=True)
+            if existing is None:
+                raise
+            return existing, False
+        return ConversationFile(id=obj_id, **values), True
+
+    @traced("crud.conversation_files.list_by_conversation")
+    async def list_by_conversation(
+        self, db: AsyncSession, *, conversation_id: int
+    ) -> List[ConversationFile]:
+        """列出会话文件元数据（不加载压缩正文）。"""
+        result = await db.execute(
+            select(ConversationFile)
+            .where(ConversationFile.conversation_id == conversation_id)
+            .order_by(ConversationFile.id)
+        )
+        return list(result.scalars().all())
+
+    @traced("crud.conversation_files.get_many")
+    async def get_many(
+        self,
+        db: AsyncSession,
+        *,
+        conversation_id: int,
+        ids: Sequence[int],
+        with_content: bool = False,
+    ) -> List[ConversationFile]:
+        if not ids:
+            return []
+        stmt = select(ConversationFile).where(
+            ConversationFile.conversation_id == conversation_id,
+            ConversationFile.id.in_(list(ids)),
+        )
+        if with_content:
+            stmt = stmt.options(undefer(ConversationFile.content))
+        result = await db.execute(stmt.order_by(ConversationFile.id))
+        return list(result.scalars().all())
+
+    @traced("crud.conversation_files.delete_by_conversation")
+    async def delete_by_conversation(
+        self, db: AsyncSession, conversation_id: int
+    ) -> None:
+        await db.execute(
+            delete(ConversationFile).where(ConversationFile.conversation_id == conversation_id)
+        )
+
+
+crud_conversation_files = CRUDConversationFiles(ConversationFile)
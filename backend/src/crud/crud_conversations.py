@@ -1,14 +1,16 @@
-from typing import List, Optional
+from typing import List, Optional, Sequence, Tuple
 
-from sqlalchemy import select
+from sqlalchemy import delete, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.crud.base import CRUDBase
-from src.db.models import Conversation
+from src.db.models import Conversation, ConversationFile, Message
+from src.utils.tracing import traced
 from datetime import datetime
 
 
 class CRUDConversations(CRUDBase[Conversation]):
+    @traced("crud.conversations.list_conversations")
     async def list_conversations(
         self, db: AsyncSession, limit: int = 50, offset: int = 0
     ) -> List[Conversation]:
@@ -20,6 +22,34 @@ class CRUDConversations(CRUDBase[Conversation]):
         )
         return list(result.scalars().all())
 
+    @traced("crud.conversations.list_version")
+    async def list_version(self, db: AsyncSession) -> Tuple:
+        """会话列表的版本信息（行数、最大 id、最新更新时间、置顶数），用于计算 ETag。"""
+        result = await db.execute(
+            select(
+                func.count(Conversation.id),
+                func.max(Conversation.id),
+                func.max(Conversation.updated_at),
+                func.sum(Conversation.pinned),
+            )
+        )
+        return tuple(result.one())
+
+    @traced("crud.conversations.messages_version")
+    async def messages_version(self, db: AsyncSession, conversation_id: int) -> Optional[Tuple]:
+        """会话消息的版本信息（会话更新时间、消息数、最大消息 id）；会话不存在时返回 None。
+
+        消息只追加不修改，新增消息同时会刷新会话 updated_at。
+        """
+        result = await db.execute(
+            select(Conversation.updated_at, func.count(Message.id), func.max(Message.id))
+            .outerjoin(Message, Message.conversation_id == Conversation.id)
+            .where(Conversation.id == conversation_id)
+            .group_by(Conversation.id, Conversation.updated_at)
+        )
+        row = result.first()
+        return tuple(row) if row is not None else None
+
     async def update_name(
         self, db: AsyncSession, conversation_id: int, name: str
     ) -> None:
@@ -39,6 +69,50 @@ class CRUDConversations(CRUDBase[Conversation]):
     async def delete_conversation(self, db: AsyncSession, conversation_id: int) -> None:
         await self.delete_by_id(db, conversation_id)
 
+    @traced("crud.conversations.touch_or_create")
+    async def touch_or_create(
+        self,
+        db: AsyncSession,
+        *,
+        conversation_id: Optional[int],
+        name: str,
+        first_user_message: str,
+        created_at: datetime,
+        updated_at: datetime,
+    ) -> Tuple[int, str, datetime, bool]:
+        """同步会话：带 id 且会话存在时只读取名称与创建时间并刷新 updated_at；否则插入新会话。
+
+        新会话的 id 始终由数据库分配，客户端传入的未知 id 不会被用作主键（避免与之后的自增 id 冲突）。
+        返回 (会话 id, 已保存的名称, 创建时间, 是否新建)。
+        """
+        if conversation_id is not None:
+            row = (
+                await db.execute(
+                    select(Conversation.name, Conversation.created_at).where(Conversation.id == conversation_id)
+                )
+            ).first()
+            if row is not None:
+                await self.update_by_id(db, conversation_id, {"updated_at": updated_at})
+                return conversation_id, row.name, row.created_at, False
+        values = {
+            "name": name,
+            "first_user_message": first_user_message,
+            "status": "active",
+            "created_at": created_at,
+            "updated_at": updated_at,
+        }
+        return await self.insert(db, values=values), name, created_at, True
+
+    @traced("crud.conversations.delete_cascade")
+    async def delete_cascade(self, db: AsyncSession, conversation_ids: Sequence[int]) -> int:
+        """批量删除会话及其消息、文件：子表、主表各一条 DELETE，返回删除的会话数。"""
+        ids = list(conversation_ids)
+        if not ids:
+            return 0
+        await db.execute(delete(Message).where(Message.conversation_id.in_(ids)))
+        await db.execute(delete(ConversationFile).where(ConversationFile.conversation_id.in_(ids)))
+        return await self.delete_by_ids(db, ids)
+
 
 crud_conversations = CRUDConversations(Conversation)
 
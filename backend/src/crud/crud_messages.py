@@ -2,9 +2,11 @@ from typing import List, Optional
 
 from sqlalchemy import delete, select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer
 
 from src.crud.base import CRUDBase
 from src.db.models import Message
+from src.utils.tracing import traced
 
 
 class CRUDMessages(CRUDBase[Message]):
@@ -29,6 +31,7 @@ class CRUDMessages(CRUDBase[Message]):
             },
         )
 
+    @traced("crud.messages.list_messages")
     async def list_messages(
         self,
         db: AsyncSession,
@@ -36,16 +39,22 @@ class CRUDMessages(CRUDBase[Message]):
         conversation_id: int,
         limit: int = 50,
         offset: int = 0,
+        with_deep_thinking: bool = False,
     ) -> List[Message]:
-        result = await db.execute(
+        """按时间顺序列出消息；deep_thinking 为延迟加载列，需要时传 with_deep_thinking=True。"""
+        stmt = (
             select(Message)
             .where(Message.conversation_id == conversation_id)
             .order_by(Message.created_at)
             .offset(offset)
             .limit(limit)
         )
+        if with_deep_thinking:
+            stmt = stmt.options(undefer(Message.deep_thinking))
+        result = await db.execute(stmt)
         return list(result.scalars().all())
 
+    @traced("crud.messages.list_recent_for_context")
     async def list_recent_for_context(
         self, db: AsyncSession, *, conversation_id: int, limit: int = 10
     ) -> List[Message]:
@@ -57,6 +66,7 @@ class CRUDMessages(CRUDBase[Message]):
         )
         return list(result.scalars().all())[::-1]
 
+    @traced("crud.messages.delete_by_conversation")
     async def delete_by_conversation(
         self, db: AsyncSession, conversation_id: int
     ) -> None:
@@ -0,0 +1,88 @@
+"""
+存量消息压缩迁移：把 messages 表中超过 TEXT_COMPRESSION_MIN_BYTES 的 content / deep_thinking 改写为压缩格式
+
+- 按主键分批读取原始列值（不经过 CompressedText 解码），每批单独提交，可中断后重跑；
+- 已压缩或压缩后不更短的值保持不变；
+- --revert 把压缩值还原为原文（回滚版本前使用）。
+
+用法（在 backend 目录下）：
+    python -m src.db.compress_messages --dry-run
+    python -m src.db.compress_messages --batch-size 500
+    python -m src.db.compress_messages --revert
+"""
+
+import argparse
+import asyncio
+from typing import Dict, Optional
+
+from sqlalchemy import text
+
+from src.db.session import AsyncSessionLocal, engine
+from src.db.types import decode_text, encode_text
+
+COLUMNS = ("content", "deep_thinking")
+
+
+def _size(value: Optional[str]) -> int:
+    return len(value.encode("utf-8")) if value else 0
+
+
+async def migrate(batch_size: int, revert: bool, dry_run: bool) -> Dict[str, int]:
+    stats = {"rows": 0, "updated": 0, "bytes_before": 0, "bytes_after": 0}
+    convert = decode_text if revert else encode_text
+    last_id = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            rows = (
+                await db.execute(
+                    text(
+                        "SELECT id, content, deep_thinking FROM messages "
+                        "WHERE id > :last_id ORDER BY id LIMIT :limit"
+                    ),
+                    {"last_id": last_id, "limit": batch_size},
+                )
+            ).all()
+            if not rows:
+                break
+            for row in rows:
+                stats["rows"] += 1
+                values = {}
+                for column in COLUMNS:
+                    old = getattr(row, column)
+                    new = convert(old)
+                    stats["bytes_before"] += _size(old)
+                    stats["bytes_after"] += _size(new)
+                    if new != old:
+                        values[column] = new
+                if values and not dry_run:
+                    assignments = ", ".join(f"{column} = :{column}" for column in values)
+                    await db.execute(
+                        text(f"UPDATE messages SET {assignments} WHERE id = :id"), {**values, "id": row.id}
+                    )
+                stats["updated"] += bool(values)
+            last_id = rows[-1].id
+            if not dry_run:
+                await db.commit()
+        print(f"processed up to id={last_id}: rows={stats['rows']} updated={stats['updated']}")
+    await engine.dispose()
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="compress (or restore) large message text columns in place")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--revert", action="store_true", help="restore compressed values to plain text")
+    parser.add_argument("--dry-run", action="store_true", help="report sizes without writing")
+    args = parser.parse_args()
+
+    stats = asyncio.run(migrate(args.batch_size, args.revert, args.dry_run))
+    before, after = stats["bytes_before"], stats["bytes_after"]
+    ratio = after / before if before else 1.0
+    print(
+        f"{'[dry-run] ' if args.dry_run else ''}rows={stats['rows']} updated={stats['updated']} "
+        f"bytes {before} -> {after} ({ratio:.1%})"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+MOI 业务数据导入：把 CSV / XLSX 导出文件导入 bidding_records_1 / product_price，并生成向量列
+
+- 按自然键去重，重复导入同一文件不会产生重复记录；
+- 每批提交后把已处理行数写入断点文件（默认 <文件>.ingest.json），中断后重跑从断点继续，
+  文件大小或修改时间变化时断点失效；导入完成后删除断点文件；
+- --backfill 为表中向量为空的存量记录补齐向量；
+- 导入 bidding_records_1 且开启 MOI_SUPPLIER_STATS 时，导入完成后刷新供应商聚合表。
+
+用法（在 backend 目录下）：
+    python -m src.db.ingest_moi bidding_records_1 bidding.xlsx
+    python -m src.db.ingest_moi product_price price.csv --embedder none --chunk-rows 1000
+    python -m src.db.ingest_moi product_price --backfill
+"""
+
+import argparse
+import asyncio
+import json
+import os
+from typing import Any, Dict, Optional
+
+from src.config import settings
+from src.db.session import engine
+from src.services import moi_ingest, supplier_stats
+
+
+def _signature(path: str) -> Dict[str, Any]:
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime": int(st.st_mtime)}
+
+
+def _load_checkpoint(checkpoint: str, table: str, path: str) -> int:
+    try:
+        with open(checkpoint, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return 0
+    if data.get("table") != table or {k: data.get(k) for k in ("size", "mtime")} != _signature(path):
+        return 0
+    return int(data.get("rows", 0))
+
+
+def _save_checkpoint(checkpoint: str, table: str, path: str, rows: int) -> None:
+    tmp = f"{checkpoint}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"table": table, **_signature(path), "rows": rows}, f)
+    os.replace(tmp, checkpoint)
+
+
+async def run(
+    table: str, path: Optional[str], embedder_kind: Optional[str], chunk_rows: Optional[int],
+    checkpoint: Optional[str], restart: bool, backfill: bool,
+) -> None:
+    embedder = moi_ingest.get_ingest_embedder(embedder_kind)
+    try:
+        if backfill:
+            if embedder is None:
+                raise SystemExit("--backfill 需要可用的向量化方式（--embedder openai/hash）")
+            stats = await moi_ingest.backfill_embeddings(table, embedder)
+            print(f"[backfill] table={table} texts={stats['texts']} rows={stats['rows']}")
+            return
+
+        checkpoint = checkpoint or f"{path}.ingest.json"
+        skip_rows = 0 if restart else _load_checkpoint(checkpoint, table, path)
+        if skip_rows:
+            print(f"resuming from data row {skip_rows + 1} ({checkpoint})")
+        progress: Dict[str, Any] = {}
+        async for progress in moi_ingest.ingest(
+            path,
+            table,
+            embedder=embedder,
+            chunk_rows=chunk_rows,
+            skip_rows=skip_rows,
+            on_chunk=lambda rows: _save_checkpoint(checkpoint, table, path, rows),
+        ):
+            print(
+                f"rows={progress['rows']} inserted={progress['inserted']} skipped={progress['skipped']} "
+                f"invalid={progress['invalid']} {progress['rows_per_sec']} rows/s"
+            )
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        print(f"done in {progress['elapsed_s']}s ({progress['rows_per_sec']} rows/s)")
+
+        if table == "bidding_records_1" and settings.MOI_SUPPLIER_STATS and progress["inserted"]:
+            stats = await supplier_stats.refresh()
+            print(f"supplier stats refreshed: records={stats['records']} last_record_id={stats['last_record_id']}")
+    finally:
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="bulk-load CSV/XLSX exports into MOI tables with embeddings")
+    parser.add_argument("table", choices=sorted(moi_ingest.TABLES))
+    parser.add_argument("file", nargs="?", help="CSV/XLSX export (omit with --backfill)")
+    parser.add_argument("--embedder", choices=("openai", "hash", "none"), help="default: MOI_INGEST_EMBEDDER")
+    parser.add_argument("--chunk-rows", type=int, help="default: MOI_INGEST_CHUNK_ROWS")
+    parser.add_argument("--checkpoint", help="default: <file>.ingest.json")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and read from the first row")
+    parser.add_argument("--backfill", action="store_true", help="embed existing rows whose vectors are NULL")
+    args = parser.parse_args()
+    if not args.backfill and not args.file:
+        parser.error("file is required unless --backfill is given")
+
+    try:
+        asyncio.run(
+            run(args.table, args.file, args.embedder, args.chunk_rows, args.checkpoint, args.restart, args.backfill)
+        )
+    except moi_ingest.IngestError as exc:
+        raise SystemExit(f"error: {exc}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+存量库结构升级：补齐新版本依赖、但 init 脚本中 CREATE TABLE IF NOT EXISTS 不会给已有库加上的表与列
+
+- conversations 已存在而 conversation_files 不存在时，按模型建表（MySQL 中 content 为 MEDIUMBLOB）；
+- messages 缺少 attachment_ids 列时执行 ALTER TABLE messages ADD COLUMN attachment_ids ...；
+- 先检查再变更，可重复执行；多个进程同时执行时，加列冲突的一方重新检查后跳过；
+- 应用启动时自动执行（DB_AUTO_MIGRATE=false 关闭，改为发布前手动执行）。
+
+用法（在 backend 目录下）：
+    python -m src.db.migrate_schema --dry-run
+    python -m src.db.migrate_schema
+"""
+
+import argparse
+import asyncio
+import logging
+from typing import List, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import DBAPIError
+
+from src.db.models import Base, ConversationFile
+from src.db.session import engine
+
+logger = logging.getLogger(__name__)
+
+# (表, 列, 列定义, MySQL 列注释)
+ADDED_COLUMNS: Tuple[Tuple[str, str, str, str], ...] = (
+    ("messages", "attachment_ids", "VARCHAR(255) NULL", "引用的会话文件 id，逗号分隔"),
+)
+
+
+def _has_column(sync_conn, table: str, column: str) -> bool:
+    return any(c["name"] == column for c in inspect(sync_conn).get_columns(table))
+
+
+def _pending(sync_conn) -> List[str]:
+    tables = set(inspect(sync_conn).get_table_names())
+    steps: List[str] = []
+    if "conversations" in tables and ConversationFile.__tablename__ not in tables:
+        steps.append(f"CREATE TABLE {ConversationFile.__tablename__}")
+    for table, column, ddl, comment in ADDED_COLUMNS:
+        if table in tables and not _has_column(sync_conn, table, column):
+            if sync_conn.dialect.name == "mysql":
+                ddl += f" COMMENT '{comment}'"
+            steps.append(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+    return steps
+
+
+async def upgrade(dry_run: bool = False) -> List[str]:
+    """执行（dry_run 时只列出）缺失的建表 / 加列语句，返回这些语句。"""
+    async with engine.begin() as conn:
+        steps = await conn.run_sync(_pending)
+    if dry_run:
+        return steps
+    for step in steps:
+        async with engine.begin() as conn:
+            if step.startswith("CREATE TABLE"):
+                await conn.run_sync(
+                    lambda c: Base.metadata.create_all(c, tables=[ConversationFile.__table__], checkfirst=True)
+                )
+                continue
+            try:
+                await conn.execute(text(step))
+            except DBAPIError:
+                # 另一个进程已加上该列
+                if step not in await conn.run_sync(_pending):
+                    continue
+                raise
+        logger.info(f"Schema upgraded: {step}")
+    return steps
+
+
+async def run(dry_run: bool) -> List[str]:
+    try:
+        return await upgrade(dry_run)
+    finally:
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="add tables and columns missing from an existing database")
+    parser.add_argument("--dry-run", action="store_true", help="list the statements without running them")
+    args = parser.parse_args()
+
+    steps = asyncio.run(run(args.dry_run))
+    for step in steps:
+        print(f"{'[dry-run] ' if args.dry_run else ''}{step}")
+    if not steps:
+        print("schema is up to date")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,12 @@
 from datetime import datetime, timedelta, timezone
 from typing import List, Optional
 
-from sqlalchemy import Boolean, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import Boolean, DateTime, ForeignKey, Integer, LargeBinary, String, Text, UniqueConstraint
+from sqlalchemy.dialects.mysql import MEDIUMBLOB
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
+from src.db.types import CompressedText
+
 
 SHANGHAI_TZ = timezone(timedelta(hours=8))
 
@@ -39,6 +42,10 @@ class Conversation(Base):
         back_populates="conversation",
         cascade="all, delete-orphan",
     )
+    files: Mapped[List["ConversationFile"]] = relationship(
+        back_populates="conversation",
+        cascade="all, delete-orphan",
+    )
 
 
 class Message(Base):
@@ -50,8 +57,36 @@ class Message(Base):
         ForeignKey("conversations.id"), index=True
     )
     role: Mapped[str] = mapped_column(String(20))  # user / assistant / system
-    content: Mapped[str] = mapped_column(Text)
-    deep_thinking: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    # 大字段超过 TEXT_COMPRESSION_MIN_BYTES 时压缩存储；deep_thinking 默认不随消息加载
+    content: Mapped[str] = mapped_column(CompressedText)
+    deep_thinking: Mapped[Optional[str]] = mapped_column(CompressedText, nullable=True, deferred=True)
     model: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
+    # 引用的文件附件 id（conversation_files.id），逗号分隔；文件正文不再写入 content
+    attachment_ids: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
 
     conversation: Mapped[Conversation] = relationship(back_populates="messages")
+
+
+class ConversationFile(Base):
+    """会话文件表：解析后的文件正文压缩保存一次，同一会话内按正文哈希去重。"""
+
+    __tablename__ = "conversation_files"
+    __table_args__ = (UniqueConstraint("conversation_id", "content_hash", name="uk_conversation_files_hash"),)
+
+    conversation_id: Mapped[int] = mapped_column(
+        ForeignKey("conversations.id"), index=True
+    )
+    name: Mapped[str] = mapped_column(String(255))
+    file_type: Mapped[str] = mapped_column(String(20), default="")
+    # 解析后正文的 sha256
+    content_hash: Mapped[str] = mapped_column(String(64))
+    codec: Mapped[str] = mapped_column(String(10))  # zstd / gzip / none
+    # 压缩后的正文；MySQL / MatrixOne 中为 MEDIUMBLOB（与 deploy/script 下两个初始化脚本一致）
+    content: Mapped[bytes] = mapped_column(LargeBinary().with_variant(MEDIUMBLOB(), "mysql"), deferred=True)
+    # 正文字符数、压缩后字节数
+    content_chars: Mapped[int] = mapped_column(Integer, default=0)
+    stored_bytes: Mapped[int] = mapped_column(Integer, default=0)
+    # 抽取出的表格价格汇总（无金额列时为空）
+    price_summary: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
+    conversation: Mapped[Conversation] = relationship(back_populates="files")
@@ -0,0 +1,43 @@
+"""
+供应商历史表现聚合表刷新：把 bidding_records_1 中新导入的记录累加到 supplier_product_stats /
+supplier_project_stats，可由定时任务（如每小时）或数据导入后调用
+
+- 按主键水位增量处理，每批单独提交，可中断后重跑；
+- --rebuild 清空聚合表后全量重建（原始记录被修改或删除后使用，重建期间查询结果不完整）。
+
+用法（在 backend 目录下）：
+    python -m src.db.refresh_supplier_stats
+    python -m src.db.refresh_supplier_stats --batch-size 10000
+    python -m src.db.refresh_supplier_stats --rebuild
+"""
+
+import argparse
+import asyncio
+from typing import Dict
+
+from src.db.session import engine
+from src.services.supplier_stats import refresh
+
+
+async def run(batch_size: int, rebuild: bool) -> Dict[str, int]:
+    try:
+        return await refresh(batch_size=batch_size, rebuild=rebuild)
+    finally:
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="incrementally refresh supplier performance aggregates")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--rebuild", action="store_true", help="clear the aggregates and rebuild from scratch")
+    args = parser.parse_args()
+
+    stats = asyncio.run(run(args.batch_size, args.rebuild))
+    print(
+        f"{'[rebuild] ' if args.rebuild else ''}records={stats['records']} batches={stats['batches']} "
+        f"last_record_id={stats['last_record_id']}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,48 @@
+import time
+
 from sqlalchemy import event
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
 )
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from src.config import settings
+from src.utils import metrics
+from src.utils.runtime import per_worker
+
+POOL_CHECKOUT_WAIT_SECONDS = metrics.histogram(
+    "db_pool_checkout_wait_seconds",
+    "从连接池获取连接的等待耗时",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0, 65.0),
+)
+POOL_CONNECTIONS = metrics.gauge(
+    "db_pool_connections", "连接池连接数", ("state",)
+)
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """记录连接获取等待时间的连接池。"""
 
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_CHECKOUT_WAIT_SECONDS.observe(time.perf_counter() - start)
+
+
+# 多 worker 时每个进程只分得总预算的一份，避免连接数随 worker 数成倍增长
+_workers = settings.WEB_CONCURRENCY or 1
 
 engine = create_async_engine(
     settings.DATABASE_URL,
     echo=settings.DEBUG,
     future=True,
-    pool_size=200,
-    max_overflow=100,
+    poolclass=InstrumentedQueuePool,
+    pool_size=per_worker(settings.DB_POOL_SIZE, _workers, minimum=5),
+    max_overflow=per_worker(settings.DB_MAX_OVERFLOW, _workers, minimum=0),
     pool_timeout=65,
     pool_recycle=3600 * 4,
 )
@@ -22,9 +51,25 @@ engine = create_async_engine(
 # 确保 MySQL 连接使用上海时区（UTC+8）
 @event.listens_for(engine.sync_engine, "connect")
 def _set_timezone(dbapi_connection, connection_record):  # pragma: no cover - 连接钩子
+    if engine.dialect.name != "mysql":
+        # 基准测试使用的 SQLite 替身不支持该语句
+        return
     with dbapi_connection.cursor() as cursor:
         cursor.execute("SET time_zone = '+08:00'")
 
+
+def _pool_connections() -> dict:
+    pool = engine.pool
+    return {
+        ("in_use",): pool.checkedout(),
+        ("idle",): pool.checkedin(),
+        ("overflow",): max(pool.overflow(), 0),
+        ("size",): pool.size(),
+    }
+
+
+POOL_CONNECTIONS.set_function(_pool_connections)
+
 AsyncSessionLocal = async_sessionmaker(
     engine,
     expire_on_commit=False,
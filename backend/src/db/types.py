@@ -0,0 +1,59 @@
+"""
+自定义列类型
+"""
+
+import base64
+from typing import Optional
+
+from sqlalchemy import Text
+from sqlalchemy.types import TypeDecorator
+
+from src.config import settings
+from src.utils.compression import CODEC_NONE, compress, decompress
+
+# 压缩值的前缀：COMPRESSED_PREFIX + codec + ":" + base64(压缩数据)
+COMPRESSED_PREFIX = "@cz1:"
+
+
+def encode_text(value: Optional[str], min_bytes: Optional[int] = None) -> Optional[str]:
+    """超过阈值且压缩后更短时返回带前缀的压缩值，否则原样返回。"""
+    if value is None:
+        return None
+    min_bytes = settings.TEXT_COMPRESSION_MIN_BYTES if min_bytes is None else min_bytes
+    raw = value.encode("utf-8")
+    if min_bytes <= 0 or len(raw) < min_bytes or value.startswith(COMPRESSED_PREFIX):
+        return value
+    codec, blob = compress(raw)
+    if codec == CODEC_NONE:
+        return value
+    encoded = f"{COMPRESSED_PREFIX}{codec}:{base64.b64encode(blob).decode('ascii')}"
+    return encoded if len(encoded) < len(raw) else value
+
+
+def decode_text(value: Optional[str]) -> Optional[str]:
+    if value is None or not value.startswith(COMPRESSED_PREFIX):
+        return value
+    codec, sep, payload = value[len(COMPRESSED_PREFIX):].partition(":")
+    if not sep:
+        return value
+    try:
+        return decompress(codec, base64.b64decode(payload, validate=True)).decode("utf-8")
+    except Exception:  # noqa: BLE001
+        # 恰好以前缀开头的普通文本
+        return value
+
+
+class CompressedText(TypeDecorator):
+    """透明压缩的文本列：超过 TEXT_COMPRESSION_MIN_BYTES 的值压缩后以 base64 存入 Text 列。
+
+    未压缩的旧数据按原文读取，不需要改表；存量数据可用 `python -m src.db.compress_messages` 迁移。
+    """
+
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return encode_text(value)
+
+    def process_result_value(self, value, dialect):
+        return decode_text(value)
@@ -1,24 +1,60 @@
+import asyncio
+import importlib
 import logging
 import os
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 
 from src.config import settings
-from src.routers import ai, moi
-from src.utils.logger import setup_logging
+from src.db import migrate_schema
+from src.routers import ai, moi, sourcing
+from src.services.chat_streams import get_stream_registry
+from src.services.moi_prefetch import get_moi_prefetcher
+from src.services.web_search import get_web_search_client
+from src.services.write_behind import get_write_queue
+from src.utils import metrics, tracing
+from src.utils.logger import setup_logging, shutdown_logging
+from src.utils.parse_file_utils import prewarm_parsers, shutdown_parsers
+from src.utils.response_compression import CompressionMiddleware
 
 # 初始化日志系统
 setup_logging()
+tracing.setup_tracing()
 logger = logging.getLogger(__name__)
 
+async def _prewarm(delay: float) -> None:
+    """就绪后在后台线程导入重依赖，避免首个解析/对话请求承担导入耗时。"""
+    await asyncio.sleep(delay)
+    await asyncio.to_thread(prewarm_parsers)
+    await asyncio.to_thread(importlib.import_module, "openai")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Application starting up...")
+    if settings.DB_AUTO_MIGRATE:
+        try:
+            await migrate_schema.upgrade()
+        except Exception as exc:  # noqa: BLE001
+            logger.exception(f"Schema upgrade failed, run python -m src.db.migrate_schema manually: {exc}")
+    prewarm_task = None
+    if settings.PREWARM_DELAY_SECONDS >= 0:
+        prewarm_task = asyncio.create_task(_prewarm(settings.PREWARM_DELAY_SECONDS))
     yield
     logger.info("Application shutting down...")
+    if prewarm_task is not None:
+        prewarm_task.cancel()
+    await get_stream_registry().shutdown(timeout=5)
+    # 写完排队中的消息后再退出
+    await get_write_queue().shutdown(timeout=settings.SHUTDOWN_GRACE_SECONDS)
+    await get_moi_prefetcher().shutdown()
+    await get_web_search_client().close()
+    shutdown_parsers()
+    tracing.shutdown_tracing()
+    shutdown_logging()
 
 tags_metadata = [
     {
@@ -62,7 +98,14 @@ app.add_middleware(
     allow_credentials=not wildcard,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Stream-Id", "X-Trace-Id", "Server-Timing", "ETag"],
 )
+if settings.RESPONSE_COMPRESSION:
+    app.add_middleware(CompressionMiddleware, minimum_size=settings.RESPONSE_COMPRESSION_MIN_BYTES)
+app.add_middleware(metrics.MetricsMiddleware)
+if settings.TRACING_ENABLED:
+    # 最后添加的中间件位于最外层，使根 span 覆盖包括指标统计在内的完整请求耗时
+    app.add_middleware(tracing.TracingMiddleware)
 
 
 @app.get("/health", tags=["system"])
@@ -70,8 +113,15 @@ async def health_check() -> dict:
     return {"status": "ok"}
 
 
+@app.get("/metrics", tags=["system"], include_in_schema=False)
+async def metrics_endpoint() -> Response:
+    """Prometheus 抓取接口：请求/数据库/大模型/文件解析等热点路径指标。"""
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+
 app.include_router(ai.router, tags=["ai"])
 app.include_router(moi.router, tags=["moi"])
+app.include_router(sourcing.router, tags=["sourcing"])
 
 
 @app.exception_handler(HTTPException)
@@ -106,15 +156,48 @@ async def unhandled_exception_handler(
 
 
 def main() -> None:
-    """命令行入口：使用 uvicorn 启动 FastAPI 应用。"""
+    """命令行入口：使用 uvicorn 启动 FastAPI 应用。
+
+    SERVER_MODE=production 时按 WEB_CONCURRENCY 启动 worker（默认 1 个，0 表示按容器 CPU 配额推导；
+    多个 worker 共享监听端口，由 uvicorn 主进程监管），
+    选用 uvloop/httptools，并在退出时给进行中的 SSE 流留出 SHUTDOWN_GRACE_SECONDS 的收尾时间。
+    """
     import uvicorn
 
+    from src.utils import runtime
+
     port = int(os.getenv("PORT", "8000"))
+    if settings.SERVER_MODE != "production":
+        uvicorn.run(
+            "src.main:app",
+            host="0.0.0.0",
+            port=port,
+            reload=settings.DEBUG,
+        )
+        return
+
+    workers = runtime.resolve_workers(settings.WEB_CONCURRENCY)
+    # worker 进程重新导入配置，通过环境变量告知 worker 数，用于均分连接池
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    loop, http = runtime.pick_loop(), runtime.pick_http()
+    logger.info(
+        f"Starting production server: workers={workers}, cpus={runtime.available_cpus():g}, "
+        f"loop={loop}, http={http}, grace={settings.SHUTDOWN_GRACE_SECONDS}s"
+    )
     uvicorn.run(
         "src.main:app",
         host="0.0.0.0",
         port=port,
-        reload=settings.DEBUG,
+        workers=workers,
+        loop=loop,
+        http=http,
+        proxy_headers=True,
+        forwarded_allow_ips="*",
+        timeout_graceful_shutdown=int(settings.SHUTDOWN_GRACE_SECONDS),
+        # 1 核配额下多个 worker 同时导入 pandas 等依赖或解析大文件时，健康检查应答可能超过默认 5s，
+        # 被主进程误判为卡死而反复重启
+        timeout_worker_healthcheck=30,
+        limit_max_requests=settings.WEB_MAX_REQUESTS or None,
     )
 
 
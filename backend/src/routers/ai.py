@@ -1,35 +1,69 @@
-import json
+import asyncio
 import logging
-from typing import Any, AsyncGenerator, Dict, List, Optional
+import time
+from typing import Any, Dict, List, Optional
 
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, Request, UploadFile
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 
 from src.config import settings
-from src.prompt import SYSTEM_PROMPT
-from src.services.llm_client import _get_client
+from src.services.chat_streams import (
+    OUTCOME_CANCELLED,
+    OUTCOME_COMPLETED,
+    OUTCOME_FAILED,
+    ChatStream,
+    ReplayGapError,
+    get_stream_registry,
+)
+from src.services.context_builder import build_chat_messages, format_attachment_ids, parse_attachment_ids
+from src.services.file_tables import get_file_table_store
+from src.services.history_cache import HistoryRecord, get_history_cache, load_history
+from src.services.moi_prefetch import get_moi_prefetcher, item_names_from_tables, parse_extracted_items
+from src.services.retrieval import get_retrieval_index
+from src.services.write_behind import get_write_queue
+from src.services.llm_client import (
+    LLM_ERRORS_TOTAL,
+    LLM_REQUEST_SECONDS,
+    _get_client,
+    record_stream_metrics,
+)
 from src.db.session import get_db
+from src.crud.crud_conversation_files import crud_conversation_files, read_content
 from src.crud.crud_conversations import crud_conversations
 from src.crud.crud_messages import crud_messages
-from src.db.models import Conversation, Message
+from src.db.models import Conversation, ConversationFile, Message
 from src.schemas.ai import (
     ChatCompletionRequest,
+    ConversationFileOut,
+    ConversationMessageIn,
     ConversationOut,
     ConversationSyncRequest,
     ExtractRequest,
     MessageOut,
 )
+from src.utils.http_cache import is_not_modified, make_etag, not_modified_response, set_etag
 from src.utils.parse_file_utils import parse_file_content
+from src.utils.sse import StreamStats, encode_chat_stream, encode_error
+from src.utils.tracing import record_span, span
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api")
 
 
+def _inlines_partially(content: str, indexed: bool) -> bool:
+    """_format_parsed_files 是否只内联了该文件的一部分（与其截断条件保持一致）。"""
+    return (indexed and 0 < settings.RAG_INLINE_CHARS < len(content)) or len(content) > 15000
+
+
 def _format_parsed_files(parsed: List[Dict[str, str]]) -> str:
-    """仿前端 formatParsedFilesForPrompt 的格式化输出。"""
+    """仿前端 formatParsedFilesForPrompt 的格式化输出；抽取到金额列的文件附带价格汇总。
+
+    检索索引与会话关联只保存在当前进程内，默认仍内联全文（最多 15000 字）；
+    RAG_INLINE_CHARS>0 时已建索引的长文件只内联开头部分，其余内容在对话时按问题检索相关片段。
+    """
     if not parsed:
         return ""
 
@@ -37,8 +71,17 @@ def _format_parsed_files(parsed: List[Dict[str, str]]) -> str:
     for idx, pf in enumerate(parsed, start=1):
         header = f"=== 文件 {idx}: {pf.get('name', 'file')} ==="
         content = pf.get("content", "") or "[解析为空]"
-        if len(content) > 15000:
-            content = content[:15000] + "\n...[内容过长，已截断]"
+        indexed = bool(pf.get("indexed_chunks"))
+        if indexed and 0 < settings.RAG_INLINE_CHARS < len(content):
+            content = (
+                content[: settings.RAG_INLINE_CHARS]
+                + f"\n...[全文共 {len(content)} 字，已建立检索索引，提问时将自动引用相关片段]"
+            )
+        elif len(content) > 15000:
+            note = "，已建立检索索引，提问时将自动引用相关片段" if indexed else ""
+            content = content[:15000] + f"\n...[内容过长，已截断{note}]"
+        if pf.get("price_summary"):
+            content += f"\n\n【价格汇总（金额已统一为元）】\n{pf['price_summary']}"
         parts.append(f"{header}\n{content}")
 
     return (
@@ -48,9 +91,19 @@ def _format_parsed_files(parsed: List[Dict[str, str]]) -> str:
 
 
 @router.post("/files/parse")
-async def parse_files(files: List[UploadFile] = File(...)) -> Dict[str, Any]:
-    """解析上传文件并返回拼接后的上下文文本。"""
-    parsed_files: List[Dict[str, str]] = []
+async def parse_files(
+    files: List[UploadFile] = File(...), conversation_id: Optional[int] = Form(None)
+) -> Dict[str, Any]:
+    """解析上传文件并返回拼接后的上下文文本。
+
+    抽取出的表格按 file_id 保存，可经 /files/{file_id}/tables 查询；正文分块建立检索索引，
+    传入 conversation_id 时，拼接文本中被截断的文件关联到该会话，之后的对话按问题自动检索相关片段；
+    全文已内联的文件不关联，避免每轮对话再附上同一文件的片段。
+    """
+    parsed_files: List[Dict[str, Any]] = []
+    store = get_file_table_store()
+    index = get_retrieval_index()
+    item_names: List[str] = []
     
     logger.info(f"Parsing {len(files)} files")
 
@@ -60,49 +113,137 @@ async def parse_files(files: List[UploadFile] = File(...)) -> Dict[str, Any]:
             logger.info(f"Processing file: {name}")
             # 使用解析服务对文件进行解析，支持多种文件格式，并返回解析后的文本
             result = await parse_file_content(file)
-            parsed_files.append({"name": result["name"], "content": result["content"]})
+            entry = {"name": result["name"], "content": result["content"], "file_id": result["file_id"]}
+            if result["tables"]:
+                tables = store.put(result["file_id"], result["name"], result["tables"])
+                entry["tables"] = [
+                    {"name": t.name, "columns": [c.name for c in t.columns], "rows": t.total_rows}
+                    for t in tables.tables
+                ]
+                entry["price_summary"] = tables.price_summary()
+                item_names.extend(item_names_from_tables(tables.tables, settings.MOI_PREFETCH_MAX_ITEMS))
+            if settings.RAG_ENABLED and not result["error"] and result["content"]:
+                entry["indexed_chunks"] = await index.add_file(
+                    result["file_id"], result["name"], result["content"]
+                )
+                if conversation_id and _inlines_partially(result["content"], bool(entry["indexed_chunks"])):
+                    index.attach(conversation_id, [result["file_id"]])
+            parsed_files.append(entry)
         except Exception as exc:  # noqa: BLE001
             logger.error(f"Failed to parse file {name}: {exc}", exc_info=True)
             parsed_files.append(
                 {"name": name, "content": f"[解析失败: {exc}]"}
             )
 
+    # 表格中的标的物预取 MOI 数据，随后的比价查询直接命中缓存
+    get_moi_prefetcher().schedule(item_names, conversation_id)
     formatted = _format_parsed_files(parsed_files)
     return {"parsed_files": parsed_files, "formatted": formatted}
 
 
-async def _stream_chat(params: Dict[str, Any]) -> AsyncGenerator[str, None]:
-    client = _get_client()
-    try:
-        stream = await client.chat.completions.create(stream=True, **params)
-    except Exception as exc:  # noqa: BLE001
-        # 将错误作为 SSE 事件返回，避免已开始的响应再次抛异常
-        err_payload = {"error": str(exc)}
-        yield f"data: {json.dumps(err_payload, ensure_ascii=False)}\n\n"
-        return
-
-    async for chunk in stream:
-        if not chunk.choices:
-            continue
-        delta = chunk.choices[0].delta
-        delta_payload: Dict[str, Any] = {}
-        content = getattr(delta, "content", None)
-        if content:
-            delta_payload["content"] = content
-        reasoning = getattr(delta, "reasoning_content", None)
-        if reasoning:
-            delta_payload["reasoning_content"] = reasoning
-
-        payload = {"choices": [{"delta": delta_payload, "finish_reason": None}]}
-        yield f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
-
-    # 结束标记
-    yield "data: [DONE]\n\n"
+@router.get("/files/{file_id}/tables")
+async def get_file_tables(
+    file_id: str,
+    format: str = Query("json", pattern="^(json|csv|markdown|summary)$"),
+    max_rows: Optional[int] = Query(None, ge=1),
+):
+    """查询已解析文件的结构化表格：json（带类型）、csv/markdown（紧凑文本）或 summary（价格汇总）。"""
+    entry = get_file_table_store().get(file_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="未找到该文件的表格，请重新上传解析")
+    if format == "json":
+        tables = [t.to_dict() for t in entry.tables]
+        if max_rows is not None:
+            for t in tables:
+                t["rows"] = t["rows"][:max_rows]
+        return {"file_id": entry.file_id, "name": entry.name, "tables": tables}
+    if format == "summary":
+        return PlainTextResponse(entry.price_summary())
+    render = (lambda t: t.to_csv(max_rows)) if format == "csv" else (lambda t: t.to_markdown(max_rows))
+    return PlainTextResponse("\n\n".join(f"## {t.name}\n{render(t)}" for t in entry.tables))
+
+
+async def _run_chat_stream(params: Dict[str, Any], chat_stream: ChatStream) -> None:
+    """后台生成任务：调用上游并把 SSE 帧写入回放缓冲，不依赖任何 HTTP 连接。"""
+    registry = get_stream_registry()
+    model = params["model"]
+    stats = StreamStats()
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    started_ns = time.time_ns()
+    stream = None
+    outcome = OUTCOME_FAILED
+    with span("llm.stream", model=model) as stream_span:
+        try:
+            client = _get_client()
+            try:
+                with span("llm.connect"):
+                    stream = await client.chat.completions.create(stream=True, **params)
+            except Exception as exc:  # noqa: BLE001
+                LLM_ERRORS_TOTAL.inc(model=model, mode="stream")
+                # 将错误作为 SSE 事件返回，避免已开始的响应再次抛异常
+                chat_stream.publish(encode_error(str(exc)))
+                return
+
+            # 心跳由各订阅者自行发送，不写入回放缓冲
+            async for frame in encode_chat_stream(
+                stream,
+                coalesce_ms=settings.SSE_COALESCE_MS,
+                coalesce_bytes=settings.SSE_COALESCE_BYTES,
+                cancel=chat_stream.cancel_event,
+                stats=stats,
+            ):
+                chat_stream.publish(frame)
+            outcome = chat_stream.cancel_reason or OUTCOME_COMPLETED
+        except asyncio.CancelledError:
+            outcome = chat_stream.cancel_reason or OUTCOME_CANCELLED
+            raise
+        except Exception as exc:  # noqa: BLE001
+            LLM_ERRORS_TOTAL.inc(model=model, mode="stream")
+            logger.error(f"Chat stream {chat_stream.id} failed: {exc}", exc_info=True)
+            chat_stream.publish(encode_error(str(exc)))
+        finally:
+            record_stream_metrics(model, started, loop.time(), stats)
+            if stream_span is not None:
+                stream_span.set_attribute("stream.id", chat_stream.id)
+                stream_span.set_attribute("stream.outcome", outcome)
+                stream_span.set_attribute("stream.deltas", stats.deltas)
+                if stats.first_delta_at is not None:
+                    # 首 token 等待单独成段，便于区分上游排队与生成耗时
+                    first_ns = started_ns + int((stats.first_delta_at - started) * 1e9)
+                    record_span("llm.ttft", started_ns, first_ns)
+            if stream is not None:
+                # 关闭上游 HTTP 连接，停止继续消耗 token
+                try:
+                    await stream.close()
+                except Exception as exc:  # noqa: BLE001
+                    logger.warning(f"Failed to close upstream stream {chat_stream.id}: {exc}")
+            registry.finish(chat_stream, outcome)
+
+
+def _sse_response(
+    request: Request, chat_stream: ChatStream, last_seq: int = 0
+) -> StreamingResponse:
+    generator = get_stream_registry().subscribe(
+        chat_stream,
+        request,
+        last_seq=last_seq,
+        heartbeat_seconds=settings.SSE_HEARTBEAT_SECONDS,
+    )
+    return StreamingResponse(
+        generator,
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            "X-Stream-Id": chat_stream.id,
+        },
+    )
 
 
 @router.post("/chat/completions")
 async def chat_completions(
-    req: ChatCompletionRequest, db: AsyncSession = Depends(get_db)
+    req: ChatCompletionRequest, request: Request, db: AsyncSession = Depends(get_db)
 ):
     """代理 LLM 聊天，支持流式返回，SSE 兼容前端解码。"""
     model_name = req.model or settings.LLM_DEFAULT_MODEL
@@ -115,34 +256,33 @@ async def chat_completions(
         "model": model_name,
     }
     # 构造历史 + 当前消息：后端从 DB 取
-    history: List[Dict[str, str]] = [{"role": "system", "content": SYSTEM_PROMPT}]
-
-    if req.conversation_id:
-        history_msgs = await crud_messages.list_messages(
-            db=db, conversation_id=req.conversation_id, limit=200
+    with span("chat.build_prompt") as prompt_span:
+        # 历史消息中的附件只保留占位，本轮附件与检索片段由上下文组装决定内联多少
+        history = await build_chat_messages(
+            db,
+            conversation_id=req.conversation_id,
+            message=req.message,
+            attachment_ids=req.attachment_ids,
+            file_ids=req.file_ids,
         )
-        for m in history_msgs:
-            history.append({"role": m.role, "content": m.content})
-
-    # 追加本次传入的消息（通常只有当前 user 消息）
-    history.append({"role": "user", "content": req.message})
+        if prompt_span is not None:
+            prompt_span.set_attribute("prompt.messages", len(history))
     params["messages"] = history
     params["max_tokens"] = settings.LLM_MAX_TOKENS
     params["temperature"] = settings.LLM_TEMPERATURE
     stream_flag = settings.LLM_STREAM
 
     if stream_flag:
-        generator = _stream_chat(params)
-        return StreamingResponse(
-            generator,
-            media_type="text/event-stream",
-            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
-        )
+        chat_stream = get_stream_registry().open(model_name)
+        chat_stream.task = asyncio.create_task(_run_chat_stream(params, chat_stream))
+        return _sse_response(request, chat_stream)
 
     client = _get_client()
     try:
-        resp = await client.chat.completions.create(**params)
+        with LLM_REQUEST_SECONDS.time(model=model_name, mode="chat"), span("llm.chat", model=model_name):
+            resp = await client.chat.completions.create(**params)
     except Exception as exc:  # noqa: BLE001
+        LLM_ERRORS_TOTAL.inc(model=model_name, mode="chat")
         raise HTTPException(status_code=500, detail=str(exc)) from exc
 
     try:
@@ -152,15 +292,42 @@ async def chat_completions(
     return {"choices": [{"message": {"content": content}}]}
 
 
+@router.get("/chat/{stream_id}/events")
+async def resume_chat(
+    stream_id: str,
+    request: Request,
+    last_event_id: Optional[int] = None,
+):
+    """断线重连：回放 Last-Event-ID 之后的帧，再继续接收实时输出，不会再次调用大模型。"""
+    chat_stream = get_stream_registry().get(stream_id)
+    if chat_stream is None:
+        raise HTTPException(status_code=404, detail="Stream not found or expired")
+    header = request.headers.get("last-event-id")
+    if last_event_id is None:
+        last_event_id = int(header) if header and header.isdigit() else 0
+    try:
+        chat_stream.frames_after(last_event_id)
+    except ReplayGapError as exc:
+        raise HTTPException(status_code=410, detail=str(exc)) from exc
+    logger.info(f"Resume chat stream: id={stream_id}, last_event_id={last_event_id}")
+    return _sse_response(request, chat_stream, last_seq=last_event_id)
+
+
+@router.post("/chat/{stream_id}/cancel")
+async def cancel_chat(stream_id: str):
+    """停止生成：取消进行中的流式回答并释放上游连接。"""
+    cancelled = get_stream_registry().cancel(stream_id)
+    logger.info(f"Cancel chat stream: id={stream_id}, found={cancelled}")
+    return {"success": True, "cancelled": cancelled}
+
+
 @router.post("/items/extract")
 async def extract_items(req: ExtractRequest, db: AsyncSession = Depends(get_db)):
     """调用大模型从对话中提取标的物，返回 OpenAI 兼容格式。"""
     logger.info(f"Extracting items for conversation_id={req.conversation_id}, model={req.model}")
     
     # 1. 从 DB 获取历史消息
-    history_msgs = await crud_messages.list_messages(
-        db=db, conversation_id=req.conversation_id, limit=200
-    )
+    history_msgs = await load_history(db, req.conversation_id)
     
     conversation_summary = "\n\n".join(
         [
@@ -186,13 +353,20 @@ async def extract_items(req: ExtractRequest, db: AsyncSession = Depends(get_db))
 
     client = _get_client()
     try:
-        resp = await client.chat.completions.create(**params)
+        with LLM_REQUEST_SECONDS.time(model=params["model"], mode="extract"), span(
+            "llm.extract", model=params["model"]
+        ):
+            resp = await client.chat.completions.create(**params)
         content = resp.choices[0].message.content or "[]"
-        logger.info(f"Extracted items: {content}")
+        logger.info(f"Extracted items: chars={len(content)}")
+        logger.debug(f"Extracted items content: {content}")
     except Exception as exc:  # noqa: BLE001
+        LLM_ERRORS_TOTAL.inc(model=params["model"], mode="extract")
         logger.error(f"Error extracting items: {exc}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(exc)) from exc
 
+    # 用户接下来通常会查询这些标的物的价格与供应商，提前在后台预取
+    get_moi_prefetcher().schedule(parse_extracted_items(content), req.conversation_id)
     return JSONResponse({"choices": [{"message": {"content": content}}]})
 
 
@@ -202,66 +376,101 @@ def _ts_to_dt(ts: Optional[int]) -> datetime:
     return datetime.fromtimestamp(ts / 1000)
 
 
+def _message_values(conversation_id: int, message: ConversationMessageIn) -> Dict[str, Any]:
+    return {
+        "conversation_id": conversation_id,
+        "role": message.role,
+        "content": message.content,
+        "created_at": _ts_to_dt(message.timestamp),
+        "deep_thinking": message.deep_thinking,
+        "model": message.model,
+        "attachment_ids": format_attachment_ids(message.attachment_ids),
+    }
+
+
+def _history_record(message_id: int, values: Dict[str, Any]) -> HistoryRecord:
+    return HistoryRecord(
+        message_id, values["role"], values["content"], values["attachment_ids"], values["created_at"]
+    )
+
+
+async def _sync_write_behind(conv: Conversation, req: ConversationSyncRequest) -> ConversationOut:
+    queue = get_write_queue()
+    updated_at = _ts_to_dt(req.updated_at) if req.updated_at else datetime.utcnow()
+    pending = [queue.touch_conversation(conv.id, updated_at)]
+    values = None
+    if req.message:
+        logger.info(f"Queueing message: role={req.message.role}, chars={len(req.message.content)}")
+        values = _message_values(conv.id, req.message)
+        pending.append(queue.insert_message(values))
+    results = await asyncio.gather(*pending)
+    if values is not None:
+        get_history_cache().append(conv.id, _history_record(results[1], values))
+    return ConversationOut(
+        id=conv.id,
+        title=conv.name,
+        created_at=int(conv.created_at.timestamp() * 1000),
+        updated_at=int(updated_at.timestamp() * 1000),
+    )
+
+
 @router.post("/conversations/sync", response_model=ConversationOut)
 async def sync_conversation(
     req: ConversationSyncRequest, db: AsyncSession = Depends(get_db)
 ):
-    """按 id 同步会话及消息。"""
+    """按 id 同步会话及消息。
+
+    已有会话只读取名称与创建时间、刷新 updated_at，新会话（不带 id 或 id 不存在）插入后由数据库分配 id，
+    消息插入一条语句，最后一起提交；响应中的标题取自已保存的会话。
+    """
     logger.info(f"Syncing conversation: id={req.id}, title={req.title}")
-    conv: Conversation | None = None
-    if req.id:
+    if req.id and settings.DB_WRITE_BEHIND:
         conv = await crud_conversations.get(db, req.id)
-    if conv is None:
-        logger.info(f"Creating new conversation: title={req.title}")
-        conv = await crud_conversations.create(
-            db,
-            obj_in={
-                "name": req.title or "新对话",
-                "first_user_message": req.title or "",
-                "status": "active",
-                "created_at": _ts_to_dt(req.created_at),
-                "updated_at": _ts_to_dt(req.updated_at),
-            },
-        )
-        await db.flush()
-    else:
-        logger.info(f"Updating existing conversation: id={conv.id}")
-        await crud_conversations.update_by_id(
-            db,
-            conv.id,
-            {
-                "updated_at": _ts_to_dt(req.updated_at) if req.updated_at else datetime.utcnow(),
-            },
-        )
+        if conv is not None:
+            # 已有会话：消息插入与 updated_at 刷新交给写入队列合并提交，提交完成后返回
+            # 先归还本请求占用的连接，避免并发请求占满连接池时写入队列拿不到连接
+            await db.close()
+            return await _sync_write_behind(conv, req)
+
+    updated_at = _ts_to_dt(req.updated_at)
+    conv_id, title, created_at, created = await crud_conversations.touch_or_create(
+        db,
+        conversation_id=req.id,
+        name=req.title or "新对话",
+        first_user_message=req.title or "",
+        created_at=_ts_to_dt(req.created_at),
+        updated_at=updated_at,
+    )
+    if created and req.id:
+        logger.info(f"Conversation {req.id} not found, created new conversation id={conv_id}")
 
     # 同步单条消息（用户提问或大模型回答）
+    record = None
     if req.message:
-        logger.info(f"Syncing message: role={req.message.role}, content={req.message.content[:100]}")
-        await crud_messages.create(
-            db,
-            obj_in={
-                "conversation_id": conv.id,
-                "role": req.message.role,
-                "content": req.message.content,
-                "created_at": _ts_to_dt(req.message.timestamp),
-                "deep_thinking": req.message.deep_thinking,
-                "model": req.message.model,
-            },
-        )
+        logger.info(f"Syncing message: role={req.message.role}, chars={len(req.message.content)}")
+        values = _message_values(conv_id, req.message)
+        record = _history_record(await crud_messages.insert(db, values=values), values)
 
     await db.commit()
-    await db.refresh(conv)
+    if record is not None:
+        # 写入成功后同步更新历史缓存，下一轮对话无需查库
+        get_history_cache().append(conv_id, record, created=created)
 
     return ConversationOut(
-        id=conv.id,
-        title=conv.name,
-        created_at=int(conv.created_at.timestamp() * 1000),
-        updated_at=int(conv.updated_at.timestamp() * 1000),
+        id=conv_id,
+        title=title,
+        created_at=int(created_at.timestamp() * 1000),
+        updated_at=int(updated_at.timestamp() * 1000),
     )
 
 
 @router.get("/conversations", response_model=List[ConversationOut])
-async def list_conversations(db: AsyncSession = Depends(get_db)):
+async def list_conversations(request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    """会话列表；支持 If-None-Match，列表未变化时返回 304。"""
+    etag = make_etag("conversations", *await crud_conversations.list_version(db))
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    set_etag(response, etag)
     convs = await crud_conversations.list_conversations(db, limit=200, offset=0)
     return [
         ConversationOut(
@@ -275,11 +484,20 @@ async def list_conversations(db: AsyncSession = Depends(get_db)):
 
 
 @router.get("/conversations/{conversation_id}/messages", response_model=List[MessageOut])
-async def list_conversation_messages(conversation_id: int, db: AsyncSession = Depends(get_db)):
-    conv = await crud_conversations.get(db, conversation_id)
-    if not conv:
+async def list_conversation_messages(
+    conversation_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_db)
+):
+    """会话历史消息；支持 If-None-Match，没有新消息时返回 304。"""
+    version = await crud_conversations.messages_version(db, conversation_id)
+    if version is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
-    msgs = await crud_messages.list_messages(db, conversation_id=conv.id, limit=500)
+    etag = make_etag("messages", conversation_id, *version)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    set_etag(response, etag)
+    msgs = await crud_messages.list_messages(
+        db, conversation_id=conversation_id, limit=500, with_deep_thinking=True
+    )
     return [
         MessageOut(
             id=str(m.id),
@@ -288,6 +506,7 @@ async def list_conversation_messages(conversation_id: int, db: AsyncSession = De
             timestamp=int(m.created_at.timestamp() * 1000),
             deep_thinking=m.deep_thinking,
             model=m.model,
+            attachment_ids=parse_attachment_ids(m.attachment_ids) or None,
         )
         for m in msgs
     ]
@@ -295,11 +514,114 @@ async def list_conversation_messages(conversation_id: int, db: AsyncSession = De
 
 @router.delete("/conversations/{conversation_id}")
 async def delete_conversation(conversation_id: int, db: AsyncSession = Depends(get_db)):
+    await crud_conversations.delete_cascade(db, [conversation_id])
+    await db.commit()
+    get_history_cache().invalidate(conversation_id)
+    get_retrieval_index().detach_conversation(conversation_id)
+    get_moi_prefetcher().cancel(conversation_id)
+    return {"success": True}
+
+
+def _file_out(f: ConversationFile, *, duplicate: bool = False, content: Optional[str] = None) -> ConversationFileOut:
+    return ConversationFileOut(
+        id=f.id,
+        name=f.name,
+        file_type=f.file_type,
+        content_hash=f.content_hash,
+        codec=f.codec,
+        content_chars=f.content_chars,
+        stored_bytes=f.stored_bytes,
+        created_at=int(f.created_at.timestamp() * 1000),
+        price_summary=f.price_summary,
+        duplicate=duplicate,
+        content=content,
+    )
+
+
+@router.post("/conversations/{conversation_id}/files")
+async def upload_conversation_files(
+    conversation_id: int, files: List[UploadFile] = File(...), db: AsyncSession = Depends(get_db)
+) -> Dict[str, Any]:
+    """解析上传文件并压缩保存到会话，同一会话内正文相同的文件只保存一份。
+
+    返回的 id 作为消息的 attachment_ids 引用，对话时由后端决定内联全文还是检索片段。
+    """
     conv = await crud_conversations.get(db, conversation_id)
     if not conv:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    saved: List[ConversationFileOut] = []
+    errors: List[Dict[str, str]] = []
+    store = get_file_table_store()
+    index = get_retrieval_index()
+
+    for file in files:
+        name = file.filename or "file"
+        try:
+            result = await parse_file_content(file)
+        except Exception as exc:  # noqa: BLE001
+            logger.error(f"Failed to parse file {name}: {exc}", exc_info=True)
+            errors.append({"name": name, "error": str(exc)})
+            continue
+        if result["error"] or not result["content"]:
+            errors.append({"name": name, "error": result["content"] or "解析为空"})
+            continue
+        summary = None
+        if result["tables"]:
+            tables = store.put(result["file_id"], result["name"], result["tables"])
+            summary = tables.price_summary() or None
+            get_moi_prefetcher().schedule(
+                item_names_from_tables(tables.tables, settings.MOI_PREFETCH_MAX_ITEMS), conv.id
+            )
+        with span("conversation_files.store", file_type=result["type"]):
+            obj, created = await crud_conversation_files.store(
+                db,
+                conversation_id=conv.id,
+                name=result["name"],
+                file_type=result["type"],
+                content=result["content"],
+                price_summary=summary,
+            )
+        if settings.RAG_ENABLED:
+            await index.add_file(obj.content_hash, obj.name, result["content"])
+            index.attach(conv.id, [obj.content_hash])
+        logger.info(
+            f"Stored conversation file: conversation_id={conv.id}, id={obj.id}, duplicate={not created}, "
+            f"chars={obj.content_chars}, stored_bytes={obj.stored_bytes}, codec={obj.codec}"
+        )
+        saved.append(_file_out(obj, duplicate=not created))
+
+    await db.commit()
+    return {"files": saved, "errors": errors}
+
+
+@router.get("/conversations/{conversation_id}/files", response_model=List[ConversationFileOut])
+async def list_conversation_files(conversation_id: int, db: AsyncSession = Depends(get_db)):
+    files = await crud_conversation_files.list_by_conversation(db, conversation_id=conversation_id)
+    return [_file_out(f) for f in files]
+
+
+@router.get("/conversations/{conversation_id}/files/{file_id}", response_model=ConversationFileOut)
+async def get_conversation_file(
+    conversation_id: int,
+    file_id: int,
+    include_content: bool = False,
+    db: AsyncSession = Depends(get_db),
+):
+    found = await crud_conversation_files.get_many(
+        db, conversation_id=conversation_id, ids=[file_id], with_content=include_content
+    )
+    if not found:
+        raise HTTPException(status_code=404, detail="File not found")
+    f = found[0]
+    return _file_out(f, content=read_content(f) if include_content else None)
+
+
+@router.delete("/conversations/{conversation_id}/files/{file_id}")
+async def delete_conversation_file(conversation_id: int, file_id: int, db: AsyncSession = Depends(get_db)):
+    found = await crud_conversation_files.get_many(db, conversation_id=conversation_id, ids=[file_id])
+    if not found:
         return {"success": True}
-    await crud_messages.delete_by_conversation(db, conv.id)
-    await crud_conversations.delete_by_id(db, conv.id)
+    await crud_conversation_files.delete_by_id(db, file_id)
     await db.commit()
+    get_retrieval_index().detach(conversation_id, [found[0].content_hash])
     return {"success": True}
-
@@ -4,11 +4,18 @@ MOI数据库路由
 """
 
 import logging
+import os
+import tempfile
 from typing import Dict, Any, Optional
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
+from src.config import settings
+from src.services import moi_ingest, moi_queries, supplier_stats
 from src.services.matrixone_client import get_matrixone_client
+from src.services.moi_cache import get_moi_query_cache
+from src.utils.sse import DONE_FRAME, encode_json
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +34,14 @@ class SQLQueryResponse(BaseModel):
     error: Optional[str] = None
 
 
+def _response(result: Dict[str, Any]) -> SQLQueryResponse:
+    return SQLQueryResponse(
+        columns=result.get("columns", []),
+        rows=result.get("rows", []),
+        error=result.get("error")
+    )
+
+
 @router.post("/run_sql", response_model=SQLQueryResponse)
 async def run_sql(request: SQLQueryRequest) -> SQLQueryResponse:
     """
@@ -36,13 +51,7 @@ async def run_sql(request: SQLQueryRequest) -> SQLQueryResponse:
     """
     try:
         client = get_matrixone_client()
-        result = await client.run_sql(request.statement)
-        
-        return SQLQueryResponse(
-            columns=result.get("columns", []),
-            rows=result.get("rows", []),
-            error=result.get("error")
-        )
+        return _response(await client.run_sql(request.statement))
     except Exception as e:
         logger.exception(f"执行SQL查询失败: {e}")
         raise HTTPException(status_code=500, detail=f"查询失败: {str(e)}")
@@ -60,31 +69,7 @@ async def query_procurement_projects(request: QueryProcurementProjectsRequest) -
     从 xunyuan_agent.bidding_records_1 表中查询采购项目信息
     """
     try:
-        escaped_item = request.item_name.replace("'", "''")
-        
-        sql = f"""
-SELECT
-  `项目名称`,
-  `单位` AS `采购单位`,
-  `细化产品`,
-  `供应商名称`,
-  `中标金额_万元` AS `中标金额（万元）`,
-  `参与状态`
-FROM `xunyuan_agent`.`bidding_records_1`
-WHERE `项目名称` LIKE '%{escaped_item}%'
-   OR `细化产品` LIKE '%{escaped_item}%'
-ORDER BY `项目名称` DESC, `中标金额_万元` DESC
-LIMIT 20;
-        """.strip()
-        
-        client = get_matrixone_client()
-        result = await client.run_sql(sql)
-        
-        return SQLQueryResponse(
-            columns=result.get("columns", []),
-            rows=result.get("rows", []),
-            error=result.get("error")
-        )
+        return _response(await moi_queries.query_procurement_projects(request.item_name))
     except Exception as e:
         logger.exception(f"查询采购项目失败: {e}")
         raise HTTPException(status_code=500, detail=f"查询失败: {str(e)}")
@@ -105,162 +90,8 @@ async def query_historical_performance(request: QueryHistoricalPerformanceReques
     """
     try:
         logger.info(f"收到历史表现查询请求: item_name='{request.item_name}', has_embedding={request.embedding is not None}")
-
-        client = get_matrixone_client()
-
-        # 优先使用向量查询
-        if request.embedding:
-            logger.info(f"检测到embedding字段，长度: {len(request.embedding)}，开始执行向量查询")
-            try:
-                vector_str = "[" + ",".join(map(str, request.embedding)) + "]"
-                logger.debug(f"向量字符串: {vector_str[:100]}...")
-
-                # 同时查询两个向量字段，取最好的结果
-                vector_results = []
-
-                # 查询项目名称向量
-                try:
-                    logger.info("开始执行项目名称向量查询")
-                    project_sql = f"""
-SELECT
-    t.`供应商名称`,
-    COUNT(*) AS `投标次数`,
-    SUM(CASE WHEN t.`参与状态` = '中标' THEN 1 ELSE 0 END) AS `中标次数`,
-    ROUND(SUM(CASE WHEN t.`参与状态` = '中标' THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2) AS `中标率(%)`,
-    SUM(CAST(REPLACE(t.`中标金额_万元`, ',', '') AS DECIMAL(15,2))) AS `合计中标金额（万元）`
-FROM
-    (
-        SELECT
-            `供应商名称`,
-            `参与状态`,
-            `中标金额_万元`
-        FROM
-            `xunyuan_agent`.`bidding_records_1`
-        ORDER BY l2_distance(`project_name_embedding`, '{vector_str}') ASC
-        LIMIT 50
-    ) AS t
-WHERE t.`参与状态` = '中标'
-GROUP BY
-    t.`供应商名称`
-ORDER BY
-    `中标次数` DESC,
-    `合计中标金额（万元）` DESC
-LIMIT 10;
-                    """.strip()
-
-                    project_result = await client.run_sql(project_sql)
-                    logger.info(f"项目名称向量查询完成，结果行数: {len(project_result.get('rows', []))}")
-                    if project_result.get("rows") and len(project_result["rows"]) > 0:
-                        vector_results.append(("project", project_result))
-                        logger.info(f"项目名称向量查询成功，添加到结果列表")
-                    else:
-                        logger.warning("项目名称向量查询返回空结果")
-                except Exception as e:
-                    logger.warning(f"项目名称向量查询失败: {e}")
-
-                # 查询产品向量
-                try:
-                    logger.info("开始执行产品向量查询")
-                    product_sql = f"""
-SELECT
-    t.`供应商名称`,
-    COUNT(*) AS `投标次数`,
-    SUM(CASE WHEN t.`参与状态` = '中标' THEN 1 ELSE 0 END) AS `中标次数`,
-    ROUND(SUM(CASE WHEN t.`参与状态` = '中标' THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2) AS `中标率(%)`,
-    SUM(CAST(REPLACE(t.`中标金额_万元`, ',', '') AS DECIMAL(15,2))) AS `合计中标金额（万元）`
-FROM
-    (
-        SELECT
-            `供应商名称`,
-            `参与状态`,
-            `中标金额_万元`
-        FROM
-            `xunyuan_agent`.`bidding_records_1`
-        ORDER BY l2_distance(`product_embedding`, '{vector_str}') ASC
-        LIMIT 50
-    ) AS t
-WHERE t.`参与状态` = '中标'
-GROUP BY
-    t.`供应商名称`
-ORDER BY
-    `中标次数` DESC,
-    `合计中标金额（万元）` DESC
-LIMIT 10;
-                    """.strip()
-
-                    product_result = await client.run_sql(product_sql)
-                    logger.info(f"产品向量查询完成，结果行数: {len(product_result.get('rows', []))}")
-                    if product_result.get("rows") and len(product_result["rows"]) > 0:
-                        vector_results.append(("product", product_result))
-                        logger.info(f"产品向量查询成功，添加到结果列表")
-                    else:
-                        logger.warning("产品向量查询返回空结果")
-                except Exception as e:
-                    logger.warning(f"产品向量查询失败: {e}")
-
-                # 如果有向量查询结果，选择最好的一个返回
-                logger.info(f"向量查询统计: 成功查询数 {len(vector_results)}，详情: {[(name, len(result.get('rows', []))) for name, result in vector_results]}")
-
-                if vector_results:
-                    # 优先选择结果更多的查询
-                    best_result = max(vector_results, key=lambda x: len(x[1]["rows"]))
-                    logger.info(f"向量查询成功: 选择 {best_result[0]} 向量查询，返回 {len(best_result[1]['rows'])} 条结果")
-                    return SQLQueryResponse(
-                        columns=best_result[1].get("columns", []),
-                        rows=best_result[1].get("rows", []),
-                        error=best_result[1].get("error")
-                    )
-
-                logger.warning("所有向量查询均无结果，将退化到LIKE查询。可能原因: 1)向量数据不存在 2)相似度阈值过高 3)数据库中无匹配记录")
-            except Exception as e:
-                logger.error(f"向量查询整体失败，将退化到LIKE查询。异常信息: {str(e)}", exc_info=True)
-                # 继续执行LIKE查询，不抛出异常
-
-        # 向量查询无结果、失败或未提供向量，使用 LIKE 查询作为退化方案
-        if not request.embedding:
-            logger.info("未提供embedding参数，直接使用LIKE查询")
-        else:
-            logger.info("向量查询无结果或失败，开始执行LIKE查询作为退化方案")
-
-        escaped_item = request.item_name.replace("'", "''")
-        logger.debug(f"LIKE查询关键词: '{escaped_item}'")
-
-        fallback_sql = f"""
-SELECT
-    t.`供应商名称`,
-    COUNT(*) AS `投标次数`,
-    SUM(CASE WHEN t.`参与状态` = '中标' THEN 1 ELSE 0 END) AS `中标次数`,
-    ROUND(SUM(CASE WHEN t.`参与状态` = '中标' THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2) AS `中标率(%)`,
-    SUM(CAST(REPLACE(t.`中标金额_万元`, ',', '') AS DECIMAL(15,2))) AS `合计中标金额（万元）`
-FROM
-    (
-        SELECT
-            `供应商名称`,
-            `参与状态`,
-            `中标金额_万元`
-        FROM
-            `xunyuan_agent`.`bidding_records_1`
-        WHERE
-            `项目名称` LIKE '%{escaped_item}%'
-            OR `细化产品` LIKE '%{escaped_item}%'
-        LIMIT 50
-    ) AS t
-WHERE t.`参与状态` = '中标'
-GROUP BY
-    t.`供应商名称`
-ORDER BY
-    `中标次数` DESC,
-    `合计中标金额（万元）` DESC
-LIMIT 10;
-        """.strip()
-        
-        client = get_matrixone_client()
-        result = await client.run_sql(fallback_sql)
-        
-        return SQLQueryResponse(
-            columns=result.get("columns", []),
-            rows=result.get("rows", []),
-            error=result.get("error")
+        return _response(
+            await moi_queries.query_historical_performance(request.item_name, request.embedding)
         )
     except Exception as e:
         logger.exception(f"查询历史表现失败: {e}")
@@ -282,120 +113,125 @@ async def query_secondary_price(request: QuerySecondaryPriceRequest) -> SQLQuery
     """
     try:
         logger.info(f"收到二采价格查询请求: item_name='{request.item_name}', has_embedding={request.embedding is not None}")
+        return _response(await moi_queries.query_secondary_price(request.item_name, request.embedding))
+    except Exception as e:
+        logger.exception(f"查询二采价格失败: {e}")
+        raise HTTPException(status_code=500, detail=f"查询失败: {str(e)}")
 
-        client = get_matrixone_client()
 
-        # 优先使用向量查询
-        if request.embedding:
-            logger.info(f"检测到embedding字段，长度: {len(request.embedding)}，开始执行向量查询")
-            try:
-                vector_str = "[" + ",".join(map(str, request.embedding)) + "]"
-                logger.debug(f"向量字符串: {vector_str[:100]}...")
-
-                # 同时查询两个向量字段，取最好的结果
-                vector_results = []
-
-                # 查询项目名称向量
-                try:
-                    logger.info("开始执行项目名称向量查询 (二采价格)")
-                    project_sql = f"""
-SELECT
-    `项目名称`,
-    `物料短描述`,
-    `物料单位`,
-    `平均单价（元）`,
-    `最高价（元）`,
-    `最低价（元）`,
-    l2_distance(`project_name_embedding`, '{vector_str}') AS similarity_score
-FROM `xunyuan_agent`.`product_price`
-ORDER BY similarity_score ASC
-LIMIT 3;
-                    """.strip()
-
-                    project_result = await client.run_sql(project_sql)
-                    logger.info(f"项目名称向量查询完成 (二采价格)，结果行数: {len(project_result.get('rows', []))}")
-                    if project_result.get("rows") and len(project_result["rows"]) > 0:
-                        vector_results.append(("project", project_result))
-                        logger.info(f"项目名称向量查询成功 (二采价格)，添加到结果列表")
-                    else:
-                        logger.warning("项目名称向量查询返回空结果 (二采价格)")
-                except Exception as e:
-                    logger.warning(f"项目名称向量查询失败 (二采价格): {e}")
-
-                # 查询产品向量（物料短描述）
-                try:
-                    logger.info("开始执行产品向量查询 (二采价格)")
-                    product_sql = f"""
-SELECT
-    `项目名称`,
-    `物料短描述`,
-    `物料单位`,
-    `平均单价（元）`,
-    `最高价（元）`,
-    `最低价（元）`,
-    l2_distance(`product_embedding`, '{vector_str}') AS similarity_score
-FROM `xunyuan_agent`.`product_price`
-ORDER BY similarity_score ASC
-LIMIT 3;
-                    """.strip()
-
-                    product_result = await client.run_sql(product_sql)
-                    logger.info(f"产品向量查询完成 (二采价格)，结果行数: {len(product_result.get('rows', []))}")
-                    if product_result.get("rows") and len(product_result["rows"]) > 0:
-                        vector_results.append(("product", product_result))
-                        logger.info(f"产品向量查询成功 (二采价格)，添加到结果列表")
-                    else:
-                        logger.warning("产品向量查询返回空结果 (二采价格)")
-                except Exception as e:
-                    logger.warning(f"产品向量查询失败 (二采价格): {e}")
-
-                # 如果有向量查询结果，选择最好的一个返回
-                logger.info(f"向量查询统计 (二采价格): 成功查询数 {len(vector_results)}，详情: {[(name, len(result.get('rows', []))) for name, result in vector_results]}")
-
-                if vector_results:
-                    # 优先选择结果更多的查询，如果结果数量相同，选择第一个
-                    best_result = max(vector_results, key=lambda x: len(x[1]["rows"]))
-                    logger.info(f"向量查询成功 (二采价格): 选择 {best_result[0]} 向量查询，返回 {len(best_result[1]['rows'])} 条结果")
-                    return SQLQueryResponse(
-                        columns=best_result[1].get("columns", []),
-                        rows=best_result[1].get("rows", []),
-                        error=best_result[1].get("error")
-                    )
+class BatchQueryItem(BaseModel):
+    """批量查询中的单个标的物"""
+    item_name: str
+    embedding: Optional[list[float]] = None
 
-                logger.warning("所有向量查询均无结果 (二采价格)，将退化到LIKE查询。可能原因: 1)向量数据不存在 2)相似度阈值过高 3)数据库中无匹配记录")
-            except Exception as e:
-                logger.error(f"向量查询整体失败 (二采价格)，将退化到LIKE查询。异常信息: {str(e)}", exc_info=True)
-                # 继续执行LIKE查询，不抛出异常
-
-        # 向量查询无结果、失败或未提供向量，使用 LIKE 查询作为退化方案
-        if not request.embedding:
-            logger.info("未提供embedding参数 (二采价格)，直接使用LIKE查询")
-        else:
-            logger.info("向量查询无结果或失败 (二采价格)，开始执行LIKE查询作为退化方案")
-        escaped_item = request.item_name.replace("'", "''")
-
-        fallback_sql = f"""
-SELECT
-  `项目名称`,
-  `物料短描述`,
-  `物料单位`,
-  `平均单价（元）`,
-  `最高价（元）`,
-  `最低价（元）`
-FROM `xunyuan_agent`.`product_price`
-WHERE `物料短描述` LIKE '%{escaped_item}%'
-   OR `项目名称` LIKE '%{escaped_item}%'
-LIMIT 10;
-        """.strip()
-        
-        client = get_matrixone_client()
-        result = await client.run_sql(fallback_sql)
-        
-        return SQLQueryResponse(
-            columns=result.get("columns", []),
-            rows=result.get("rows", []),
-            error=result.get("error")
+
+class BatchQueryRequest(BaseModel):
+    """批量查询请求（重复的标的物只查询一次）"""
+    items: list[BatchQueryItem]
+
+
+class BatchQueryResponse(BaseModel):
+    """批量查询响应：按标的物名称（去除首尾空白）索引"""
+    results: Dict[str, SQLQueryResponse] = {}
+
+
+async def _run_batch(name: str, request: BatchQueryRequest, query) -> BatchQueryResponse:
+    items = moi_queries.dedupe_items(request.items)
+    if len(items) > settings.MOI_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400, detail=f"单次最多查询 {settings.MOI_BATCH_MAX_ITEMS} 个标的物"
         )
+    logger.info(f"收到{name}批量查询请求: items={len(items)}, requested={len(request.items)}")
+    try:
+        results = await query(items)
     except Exception as e:
-        logger.exception(f"查询二采价格失败: {e}")
-        raise HTTPException(status_code=500, detail=f"查询失败: {str(e)}")
\ No newline at end of file
+        logger.exception(f"{name}批量查询失败: {e}")
+        raise HTTPException(status_code=500, detail=f"查询失败: {str(e)}")
+    return BatchQueryResponse(results={item: _response(result) for item, result in results.items()})
+
+
+@router.post("/query/procurement-projects/batch", response_model=BatchQueryResponse)
+async def query_procurement_projects_batch(request: BatchQueryRequest) -> BatchQueryResponse:
+    """批量查询采购项目数据，一条合并 SQL 覆盖全部标的物（embedding 不使用）"""
+    return await _run_batch("采购项目", request, moi_queries.batch_procurement_projects)
+
+
+@router.post("/query/historical-performance/batch", response_model=BatchQueryResponse)
+async def query_historical_performance_batch(request: BatchQueryRequest) -> BatchQueryResponse:
+    """批量查询潜在供应商历史表现：带向量的标的物限并发做向量查询，其余合并为一条 LIKE 查询"""
+    return await _run_batch("历史表现", request, moi_queries.batch_historical_performance)
+
+
+@router.post("/query/secondary-price/batch", response_model=BatchQueryResponse)
+async def query_secondary_price_batch(request: BatchQueryRequest) -> BatchQueryResponse:
+    """批量查询二采产品价格：带向量的标的物限并发做向量查询，其余合并为一条 LIKE 查询"""
+    return await _run_batch("二采价格", request, moi_queries.batch_secondary_price)
+
+
+async def _save_upload(file: UploadFile, suffix: str) -> str:
+    """把上传文件分块写入临时文件，超过 MOI_INGEST_MAX_UPLOAD_MB 时返回 413。"""
+    limit = settings.MOI_INGEST_MAX_UPLOAD_MB * 1024 * 1024
+    size = 0
+    fd, path = tempfile.mkstemp(suffix=suffix, prefix="moi-ingest-")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while block := await file.read(1024 * 1024):
+                size += len(block)
+                if size > limit:
+                    raise HTTPException(
+                        status_code=413, detail=f"文件超过 {settings.MOI_INGEST_MAX_UPLOAD_MB} MB"
+                    )
+                out.write(block)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+@router.post("/ingest")
+async def ingest(
+    file: UploadFile = File(...),
+    table: str = Form(...),
+    embed: bool = Form(True),
+) -> StreamingResponse:
+    """
+    导入 CSV / XLSX 导出文件到 bidding_records_1 / product_price
+
+    按自然键去重（重复导入不会产生重复记录），embed 为真时按 MOI_INGEST_EMBEDDER 生成向量列。
+    每批提交后推送一个进度帧 {table, rows, inserted, skipped, invalid, elapsed_s, rows_per_sec, done}，
+    出错时推送 {"error"}，最后发送 [DONE]。
+    """
+    if table not in moi_ingest.TABLES:
+        raise HTTPException(status_code=400, detail=f"不支持导入的表: {table}")
+    suffix = os.path.splitext(file.filename or "")[1].lower()
+    if suffix not in (".csv", ".xlsx", ".xlsm"):
+        raise HTTPException(status_code=400, detail="只支持 .csv / .xlsx 文件")
+    path = await _save_upload(file, suffix)
+    embedder = moi_ingest.get_ingest_embedder() if embed else None
+    logger.info(f"收到导入请求: table={table}, file={file.filename}, embed={embedder is not None}")
+
+    async def frames():
+        inserted = 0
+        try:
+            async for progress in moi_ingest.ingest(path, table, embedder=embedder):
+                inserted = progress["inserted"]
+                yield encode_json(progress)
+            if table == "bidding_records_1" and settings.MOI_SUPPLIER_STATS and inserted:
+                await supplier_stats.refresh()
+            if inserted:
+                get_moi_query_cache().clear()
+        except moi_ingest.IngestError as exc:
+            logger.warning(f"导入文件无法处理: {exc}")
+            yield encode_json({"error": str(exc)})
+        except Exception as exc:  # noqa: BLE001
+            logger.exception(f"导入失败: {exc}")
+            yield encode_json({"error": str(exc)})
+        finally:
+            os.remove(path)
+        yield DONE_FRAME
+
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
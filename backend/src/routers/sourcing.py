@@ -0,0 +1,57 @@
+"""
+寻源分析路由
+一次请求并发查询一个标的物的内部数据源（MOI）与外部网页搜索，结果按完成顺序以 SSE 返回
+"""
+
+import logging
+from typing import List
+
+from fastapi import APIRouter, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from src.services import sourcing
+from src.utils.sse import DONE_FRAME, encode_json
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/sourcing")
+
+
+class SourcingAnalyzeRequest(BaseModel):
+    """寻源分析请求"""
+    item_name: str
+    sources: List[str] = list(sourcing.ALL_SOURCES)
+    # 潜在供应商评估维度（“历史表现”来自内部数据库，其余维度对排名靠前的供应商做网页搜索）
+    dimensions: List[str] = list(sourcing.DEFAULT_DIMENSIONS)
+
+
+@router.post("/analyze")
+async def analyze(request: SourcingAnalyzeRequest) -> StreamingResponse:
+    """
+    并发查询标的物的各数据源
+
+    每个数据源完成（或超时、失败）时推送一个 data 帧：
+    {"source", "item_name", "status": ok/error/timeout, "elapsed_ms", "result", "error"}，
+    MOI 数据源的 result 为 {columns, rows}，网页搜索为 {summary, pages}；
+    潜在供应商的网页调研帧 source 为 "supplier_search"，另带 supplier / dimension。全部完成后发送 [DONE]。
+    """
+    item_name = request.item_name.strip()
+    if not item_name:
+        raise HTTPException(status_code=400, detail="item_name 不能为空")
+    unknown = [s for s in request.sources if s not in sourcing.ALL_SOURCES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"未知数据源: {', '.join(unknown)}")
+    logger.info(f"收到寻源分析请求: item_name='{item_name}', sources={request.sources}")
+
+    async def frames():
+        async for event in sourcing.analyze(item_name, request.sources, request.dimensions):
+            yield encode_json(jsonable_encoder(event))
+        yield DONE_FRAME
+
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -12,6 +12,11 @@ class ChatCompletionRequest(BaseModel):
     model: Optional[str] = None
     message: str
     conversation_id: Optional[int] = None
+    # /api/files/parse 返回的 file_id：按问题检索这些文件的相关片段并附带价格汇总，
+    # 同时关联到 conversation_id，后续轮次无需再传
+    file_ids: Optional[List[str]] = None
+    # 本轮引用的会话文件 id（/api/conversations/{id}/files 返回）：由后端按大小决定内联全文或检索片段
+    attachment_ids: Optional[List[int]] = None
     # 生成参数统一由后端 settings 管理
 
 
@@ -27,6 +32,7 @@ class ConversationMessageIn(BaseModel):
     message_id: Optional[str] = None
     deep_thinking: Optional[str] = None
     model: Optional[str] = None
+    attachment_ids: Optional[List[int]] = None
 
 
 class ConversationSyncRequest(BaseModel):
@@ -51,5 +57,19 @@ class MessageOut(BaseModel):
     timestamp: int
     deep_thinking: Optional[str] = None
     model: Optional[str] = None
+    attachment_ids: Optional[List[int]] = None
 
 
+class ConversationFileOut(BaseModel):
+    id: int
+    name: str
+    file_type: str
+    content_hash: str
+    codec: str
+    content_chars: int
+    stored_bytes: int
+    created_at: int
+    price_summary: Optional[str] = None
+    # 上传时正文与会话内已有文件相同，复用了已有记录
+    duplicate: bool = False
+    content: Optional[str] = None
@@ -0,0 +1,263 @@
+"""
+流式聊天登记表
+为每个 /api/chat/completions 流分配 id，上游生成与 HTTP 连接解耦：
+生成任务把 SSE 帧写入有界回放缓冲，HTTP 响应作为订阅者读取。
+客户端断线后可携带 Last-Event-ID 重连，回放缺失的帧后继续接收实时输出，无需再次调用大模型。
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+import uuid
+from collections import deque
+from typing import AsyncGenerator, Deque, Dict, List, Optional, Tuple
+
+from starlette.requests import Request
+
+from src.config import settings
+from src.utils import metrics
+from src.utils.sse import HEARTBEAT_FRAME
+
+logger = logging.getLogger(__name__)
+
+# 结束原因
+OUTCOME_COMPLETED = "completed"
+OUTCOME_CANCELLED = "cancelled"  # 前端点击“停止生成”
+OUTCOME_DISCONNECTED = "disconnected"  # 浏览器断开且宽限期内未重连
+OUTCOME_FAILED = "failed"
+
+
+class ReplayGapError(Exception):
+    """请求回放的位置已被环形缓冲淘汰，无法无损续传。"""
+
+
+class ChatStream:
+    """单个流式回答：取消信号 + 带序号的帧环形缓冲。"""
+
+    __slots__ = (
+        "id",
+        "model",
+        "started_at",
+        "cancel_event",
+        "cancel_reason",
+        "events",
+        "last_seq",
+        "finished",
+        "subscribers",
+        "detached_at",
+        "task",
+        "_signal",
+    )
+
+    def __init__(self, model: str, max_events: int) -> None:
+        self.id = uuid.uuid4().hex
+        self.model = model
+        self.started_at = time.monotonic()
+        self.cancel_event = asyncio.Event()
+        self.cancel_reason: Optional[str] = None
+        self.events: Deque[Tuple[int, str]] = deque(maxlen=max_events)
+        self.last_seq = 0
+        self.finished = False
+        self.subscribers = 0
+        self.detached_at = self.started_at
+        self.task: Optional[asyncio.Task] = None
+        self._signal = asyncio.Event()
+
+    def cancel(self, reason: str) -> None:
+        if self.cancel_reason is None:
+            self.cancel_reason = reason
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    @property
+    def signal(self) -> asyncio.Event:
+        """下一次有新帧或流结束时被置位的事件。"""
+        return self._signal
+
+    def _notify(self) -> None:
+        signal, self._signal = self._signal, asyncio.Event()
+        signal.set()
+
+    def publish(self, frame: str) -> None:
+        self.last_seq += 1
+        self.events.append((self.last_seq, f"id: {self.last_seq}\n{frame}"))
+        self._notify()
+
+    def mark_finished(self) -> None:
+        self.finished = True
+        self._notify()
+
+    def frames_after(self, seq: int) -> List[Tuple[int, str]]:
+        if seq >= self.last_seq:
+            return []
+        oldest = self.events[0][0] if self.events else self.last_seq + 1
+        if seq + 1 < oldest:
+            raise ReplayGapError(f"event {seq + 1} evicted, oldest buffered is {oldest}")
+        return list(itertools.islice(self.events, seq + 1 - oldest, None))
+
+
+class ChatStreamRegistry:
+    """进程内的流登记表（多 worker 部署时每个进程各自维护，重连需路由到同一 worker）。"""
+
+    def __init__(self) -> None:
+        self._streams: Dict[str, ChatStream] = {}
+        self.outcomes: Dict[str, int] = {
+            OUTCOME_COMPLETED: 0,
+            OUTCOME_CANCELLED: 0,
+            OUTCOME_DISCONNECTED: 0,
+            OUTCOME_FAILED: 0,
+        }
+        # 被取消/断连的流在结束前已持续的总时长，用于估算节省的上游开销
+        self.cancelled_seconds: float = 0.0
+        self.resumes: int = 0
+
+    @property
+    def active(self) -> int:
+        return sum(1 for s in self._streams.values() if not s.finished)
+
+    def open(self, model: str) -> ChatStream:
+        stream = ChatStream(model, settings.CHAT_STREAM_REPLAY_EVENTS)
+        self._streams[stream.id] = stream
+        # 响应从未开始发送（客户端在首帧前离开）时同样按宽限期回收
+        self._schedule_orphan_check(stream)
+        return stream
+
+    def get(self, stream_id: str) -> Optional[ChatStream]:
+        return self._streams.get(stream_id)
+
+    def cancel(self, stream_id: str, reason: str = OUTCOME_CANCELLED) -> bool:
+        stream = self._streams.get(stream_id)
+        if stream is None or stream.finished:
+            return False
+        stream.cancel(reason)
+        return True
+
+    def finish(self, stream: ChatStream, outcome: str) -> None:
+        """生成任务结束：记录结果，保留缓冲一段时间供晚到的重连回放。"""
+        if stream.finished:
+            return
+        stream.mark_finished()
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+        elapsed = time.monotonic() - stream.started_at
+        if outcome in (OUTCOME_CANCELLED, OUTCOME_DISCONNECTED):
+            self.cancelled_seconds += elapsed
+            logger.info(
+                f"Chat stream {stream.id} {outcome} after {elapsed:.2f}s, model={stream.model}"
+            )
+        asyncio.get_running_loop().call_later(
+            settings.CHAT_STREAM_RETENTION_SECONDS, self._streams.pop, stream.id, None
+        )
+
+    async def shutdown(self, timeout: float) -> None:
+        """进程退出前调用：取消仍在生成的流，等待其关闭上游连接并记录结果，超时后强制取消任务。
+
+        uvicorn 在执行 lifespan 关闭前已按 SHUTDOWN_GRACE_SECONDS 等待进行中的 SSE 连接自然结束，
+        此处只处理宽限期内仍未完成的流。
+        """
+        pending = [s for s in self._streams.values() if not s.finished and s.task is not None]
+        if not pending:
+            return
+        logger.info(f"Cancelling {len(pending)} chat streams on shutdown")
+        for stream in pending:
+            stream.cancel(OUTCOME_CANCELLED)
+        tasks = [s.task for s in pending]
+        _, still_running = await asyncio.wait(tasks, timeout=timeout)
+        for task in still_running:
+            task.cancel()
+
+    def _schedule_orphan_check(self, stream: ChatStream) -> None:
+        asyncio.get_running_loop().call_later(
+            settings.CHAT_STREAM_RESUME_GRACE_SECONDS, self._expire_orphan, stream
+        )
+
+    def _detach(self, stream: ChatStream) -> None:
+        stream.subscribers -= 1
+        if stream.subscribers > 0 or stream.finished:
+            return
+        # 最后一个订阅者离开：宽限期内无人重连则取消上游
+        stream.detached_at = time.monotonic()
+        self._schedule_orphan_check(stream)
+
+    def _expire_orphan(self, stream: ChatStream) -> None:
+        if stream.subscribers or stream.finished:
+            return
+        idle = time.monotonic() - stream.detached_at
+        if idle >= settings.CHAT_STREAM_RESUME_GRACE_SECONDS * 0.99:
+            stream.cancel(OUTCOME_DISCONNECTED)
+
+    async def subscribe(
+        self,
+        stream: ChatStream,
+        request: Request,
+        last_seq: int = 0,
+        heartbeat_seconds: float = 0,
+        poll_interval: float = 0.5,
+    ) -> AsyncGenerator[str, None]:
+        """从 last_seq 之后开始输出帧，直到流结束或客户端断开。
+
+        调用方应事先用 frames_after(last_seq) 校验回放位置仍在缓冲内。
+        空闲时轮询连接状态：上游长时间无输出时不会写 socket，仅靠发送失败无法及时发现断连。
+        """
+        stream.subscribers += 1
+        if last_seq:
+            self.resumes += 1
+        loop = asyncio.get_running_loop()
+        last_sent = loop.time()
+        try:
+            while True:
+                signal = stream.signal
+                try:
+                    frames = stream.frames_after(last_seq)
+                except ReplayGapError:
+                    # 订阅者落后超过缓冲容量，结束连接，由客户端重连时得到 410
+                    logger.warning(f"Subscriber of chat stream {stream.id} fell behind")
+                    return
+                for seq, frame in frames:
+                    last_seq = seq
+                    yield frame
+                    last_sent = loop.time()
+                if stream.finished and last_seq >= stream.last_seq:
+                    return
+                try:
+                    async with asyncio.timeout(poll_interval):
+                        await signal.wait()
+                    continue
+                except TimeoutError:
+                    pass
+                if await request.is_disconnected():
+                    return
+                if heartbeat_seconds > 0 and loop.time() - last_sent >= heartbeat_seconds:
+                    last_sent = loop.time()
+                    yield HEARTBEAT_FRAME
+        finally:
+            self._detach(stream)
+
+
+# 全局登记表实例
+_registry: Optional[ChatStreamRegistry] = None
+
+
+def get_stream_registry() -> ChatStreamRegistry:
+    """获取流登记表实例（单例模式）"""
+    global _registry
+    if _registry is None:
+        _registry = ChatStreamRegistry()
+    return _registry
+
+
+metrics.gauge("chat_streams_active", "进行中的流式回答数").set_function(
+    lambda: get_stream_registry().active
+)
+metrics.counter("chat_streams_total", "结束的流式回答数", ("outcome",)).set_function(
+    lambda: {(k,): v for k, v in get_stream_registry().outcomes.items()}
+)
+metrics.counter(
+    "chat_streams_cancelled_seconds_total", "被取消/断连的流在结束前累计持续时长"
+).set_function(lambda: {(): get_stream_registry().cancelled_seconds})
+metrics.counter("chat_stream_resumes_total", "断线重连次数").set_function(
+    lambda: {(): get_stream_registry().resumes}
+)
@@ -0,0 +1,132 @@
+"""
+对话上下文组装：系统提示词 + 历史消息 + 本轮附件 + 检索片段
+- 历史消息引用的附件只保留一行占位（名称、编号、字数），文件全文不随历史逐轮重发；
+- 本轮引用的附件不超过 FILE_INLINE_CHARS 字时全文内联，否则只内联开头，其余内容依赖检索；
+- 会话附件不在本进程检索索引中（进程重启、由其他 worker 上传）时，从数据库解压正文补建索引。
+"""
+
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.crud.crud_conversation_files import crud_conversation_files, read_content
+from src.db.models import ConversationFile
+from src.prompt import SYSTEM_PROMPT
+from src.services.file_tables import get_file_table_store
+from src.services.history_cache import load_history
+from src.services.retrieval import build_file_context, get_retrieval_index
+
+logger = logging.getLogger(__name__)
+
+def parse_attachment_ids(raw: Optional[str]) -> List[int]:
+    if not raw:
+        return []
+    return [int(part) for part in raw.split(",") if part.strip().isdigit()]
+
+
+def format_attachment_ids(ids: Optional[Iterable[int]]) -> Optional[str]:
+    ids = list(dict.fromkeys(ids or ()))
+    return ",".join(str(i) for i in ids) or None
+
+
+def _stub(f: ConversationFile) -> str:
+    return f"[附件 #{f.id}: {f.name}，{f.content_chars} 字]"
+
+
+def file_price_context(file_ids: Iterable[str]) -> str:
+    """按 file_id 取出已保存表格的价格汇总，附加到本轮用户消息，比价时不必从正文重新推算。"""
+    store = get_file_table_store()
+    parts = []
+    for file_id in file_ids:
+        entry = store.get(file_id)
+        if entry is None:
+            continue
+        summary = entry.price_summary()
+        if summary:
+            parts.append(f"=== {entry.name} ===\n{summary}")
+    if not parts:
+        return ""
+    return "\n\n【已上传文件的价格汇总（金额已统一为元）】\n" + "\n\n".join(parts)
+
+
+def _inline_attachments(files: Sequence[ConversationFile], contents: Dict[int, str]) -> str:
+    parts = []
+    for f in files:
+        text = contents[f.id]
+        if len(text) > settings.FILE_INLINE_CHARS:
+            text = text[: settings.FILE_INLINE_CHARS] + f"\n...[全文共 {len(text)} 字，其余内容按问题检索引用]"
+        if f.price_summary:
+            text += f"\n\n【价格汇总（金额已统一为元）】\n{f.price_summary}"
+        parts.append(f"=== 附件 #{f.id}: {f.name} ===\n{text}")
+    return "以下是用户本轮上传的文件内容：\n\n" + "\n\n".join(parts) + "\n\n---\n\n"
+
+
+async def _ensure_indexed(db: AsyncSession, conversation_id: int, files: Sequence[ConversationFile]) -> None:
+    index = get_retrieval_index()
+    missing = [f.id for f in files if not index.has_file(f.content_hash)]
+    if missing:
+        for f in await crud_conversation_files.get_many(
+            db, conversation_id=conversation_id, ids=missing, with_content=True
+        ):
+            await index.add_file(f.content_hash, f.name, read_content(f))
+    index.attach(conversation_id, [f.content_hash for f in files])
+
+
+async def build_chat_messages(
+    db: AsyncSession,
+    *,
+    conversation_id: Optional[int],
+    message: str,
+    attachment_ids: Optional[Sequence[int]] = None,
+    file_ids: Optional[Sequence[str]] = None,
+) -> List[Dict[str, str]]:
+    history: List[Dict[str, str]] = [{"role": "system", "content": SYSTEM_PROMPT}]
+    conv_files: Dict[int, ConversationFile] = {}
+    if conversation_id:
+        conv_files = {
+            f.id: f
+            for f in await crud_conversation_files.list_by_conversation(db, conversation_id=conversation_id)
+        }
+        for m in await load_history(db, conversation_id):
+            content = m.content
+            stubs = [_stub(conv_files[i]) for i in parse_attachment_ids(m.attachment_ids) if i in conv_files]
+            if stubs:
+                content += "\n" + "\n".join(stubs)
+            history.append({"role": m.role, "content": content})
+
+    # 本轮附件：按大小决定全文或开头内联
+    current = [conv_files[i] for i in dict.fromkeys(attachment_ids or ()) if i in conv_files]
+    inline = ""
+    inlined_fully = set()
+    if current:
+        loaded = await crud_conversation_files.get_many(
+            db, conversation_id=conversation_id, ids=[f.id for f in current], with_content=True
+        )
+        contents = {f.id: read_content(f) for f in loaded}
+        current = [f for f in current if f.id in contents]
+        inline = _inline_attachments(current, contents)
+        inlined_fully = {f.content_hash for f in current if f.content_chars <= settings.FILE_INLINE_CHARS}
+
+    # 检索：会话附件 + 本进程内通过 /files/parse 关联的文件 + 请求显式指定的文件
+    retrieved = ""
+    if settings.RAG_ENABLED:
+        index = get_retrieval_index()
+        if conversation_id and file_ids:
+            index.attach(conversation_id, file_ids)
+        if conv_files:
+            await _ensure_indexed(db, conversation_id, list(conv_files.values()))
+        search_ids = set(file_ids or ())
+        if conversation_id:
+            search_ids |= index.conversation_files(conversation_id)
+        # 已全文内联的附件不再重复检索
+        search_ids -= inlined_fully
+        if search_ids:
+            retrieved = await build_file_context(message, search_ids)
+
+    user_content = retrieved + inline + message
+    if file_ids:
+        user_content += file_price_context(file_ids)
+    history.append({"role": "user", "content": user_content})
+    return history
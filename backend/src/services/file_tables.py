@@ -0,0 +1,67 @@
+"""
+已上传文件的结构化表格（进程内 LRU，按文件内容哈希索引）
+同一文件重复上传只保存一份；多 worker 部署时各进程独立保存。
+"""
+
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+from src.config import settings
+from src.utils import metrics
+from src.utils.table_extract import Table, summarize_prices
+
+
+class FileTables:
+    __slots__ = ("file_id", "name", "tables")
+
+    def __init__(self, file_id: str, name: str, tables: List[Table]):
+        self.file_id = file_id
+        self.name = name
+        self.tables = tables
+
+    def price_summary(self) -> str:
+        return summarize_prices(self.tables)
+
+
+class FileTableStore:
+    def __init__(self, max_files: int):
+        self.max_files = max(max_files, 1)
+        self._files: "OrderedDict[str, FileTables]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, file_id: str, name: str, tables: List[Table]) -> FileTables:
+        entry = FileTables(file_id, name, tables)
+        with self._lock:
+            self._files[file_id] = entry
+            self._files.move_to_end(file_id)
+            while len(self._files) > self.max_files:
+                self._files.popitem(last=False)
+        return entry
+
+    def get(self, file_id: str) -> Optional[FileTables]:
+        with self._lock:
+            entry = self._files.get(file_id)
+            if entry is not None:
+                self._files.move_to_end(file_id)
+            return entry
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+
+# 全局表格存储实例
+_store: Optional[FileTableStore] = None
+
+
+def get_file_table_store() -> FileTableStore:
+    """获取表格存储实例（单例模式）"""
+    global _store
+    if _store is None:
+        _store = FileTableStore(settings.TABLE_STORE_MAX_FILES)
+    return _store
+
+
+metrics.gauge("file_table_store_files", "进程内保存结构化表格的文件数").set_function(
+    lambda: len(get_file_table_store())
+)
@@ -0,0 +1,163 @@
+"""
+会话历史缓存（进程内 LRU）
+- 按会话缓存组装提示词所需的历史窗口（与 list_messages 相同：按 created_at 排序的前 HISTORY_WINDOW 条），
+  记录为 __slots__ 对象，只保留 id / 角色 / 正文 / 附件 / 时间，不持有 ORM 实例；
+- /api/conversations/sync 写入成功后直接追加到缓存（write-through），删除会话时失效；
+- 每次读取先做一次与 ETag 相同的聚合查询（conversations.updated_at + 消息数 + 最大消息 id）校验版本，
+  其他 worker 写入或删除过该会话时重新加载。消息只追加不修改，消息数与最大 id 一致即窗口内容一致；
+  updated_at 可能来自客户端时间戳且数据库精度为秒，不参与比较。
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.crud.crud_conversations import crud_conversations
+from src.crud.crud_messages import crud_messages
+from src.utils import metrics
+
+# 组装提示词时读取的历史消息条数上限
+HISTORY_WINDOW = 200
+
+HISTORY_CACHE_TOTAL = metrics.counter(
+    "history_cache_requests_total", "会话历史缓存读取次数（hit/miss/stale）", ("result",)
+)
+
+
+class HistoryRecord:
+    __slots__ = ("id", "role", "content", "attachment_ids", "created_at")
+
+    def __init__(self, id: int, role: str, content: str, attachment_ids: Optional[str], created_at: datetime):
+        self.id = id
+        self.role = role
+        self.content = content
+        self.attachment_ids = attachment_ids
+        self.created_at = created_at
+
+    @classmethod
+    def from_message(cls, m) -> "HistoryRecord":
+        return cls(m.id, m.role, m.content, m.attachment_ids, m.created_at)
+
+
+class _Window:
+    __slots__ = ("records", "count", "max_id", "chars")
+
+    def __init__(self, records: List[HistoryRecord], count: int, max_id: int):
+        self.records = records
+        # 会话全部消息的条数与最大 id（不只是窗口内），用于版本校验
+        self.count = count
+        self.max_id = max_id
+        self.chars = sum(len(r.content) for r in records)
+
+
+class HistoryCache:
+    def __init__(self, max_conversations: int, max_chars: int):
+        self.max_conversations = max(max_conversations, 1)
+        self.max_chars = max_chars
+        self._windows: "OrderedDict[int, _Window]" = OrderedDict()
+        self._chars = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+    def get(self, conversation_id: int, count: int, max_id: int) -> Optional[List[HistoryRecord]]:
+        with self._lock:
+            window = self._windows.get(conversation_id)
+            if window is None:
+                HISTORY_CACHE_TOTAL.inc(result="miss")
+                return None
+            if (window.count, window.max_id) != (count, max_id):
+                self._pop(conversation_id)
+                HISTORY_CACHE_TOTAL.inc(result="stale")
+                return None
+            self._windows.move_to_end(conversation_id)
+            HISTORY_CACHE_TOTAL.inc(result="hit")
+            return window.records
+
+    def put(self, conversation_id: int, records: List[HistoryRecord], count: int, max_id: int) -> None:
+        with self._lock:
+            self._pop(conversation_id)
+            window = _Window(records, count, max_id)
+            self._windows[conversation_id] = window
+            self._chars += window.chars
+            self._evict()
+
+    def append(self, conversation_id: int, record: HistoryRecord, *, created: bool = False) -> None:
+        """写入成功后追加一条消息；created=True 表示会话是本次新建的，可直接建立缓存。"""
+        with self._lock:
+            window = self._windows.get(conversation_id)
+            if window is None:
+                if created:
+                    window = _Window([], 0, 0)
+                    self._windows[conversation_id] = window
+                else:
+                    return
+            if window.records and record.created_at < window.records[-1].created_at:
+                # 时间戳早于窗口末尾，插入位置无法确定，等下次读取时重新加载
+                self._pop(conversation_id)
+                return
+            if len(window.records) < HISTORY_WINDOW:
+                window.records = window.records + [record]
+                window.chars += len(record.content)
+                self._chars += len(record.content)
+            window.count += 1
+            window.max_id = max(window.max_id, record.id)
+            self._windows.move_to_end(conversation_id)
+            self._evict()
+
+    def invalidate(self, conversation_id: int) -> None:
+        with self._lock:
+            self._pop(conversation_id)
+
+    def _pop(self, conversation_id: int) -> None:
+        window = self._windows.pop(conversation_id, None)
+        if window is not None:
+            self._chars -= window.chars
+
+    def _evict(self) -> None:
+        while self._windows and (
+            len(self._windows) > self.max_conversations or (self.max_chars and self._chars > self.max_chars)
+        ):
+            _, window = self._windows.popitem(last=False)
+            self._chars -= window.chars
+
+
+async def load_history(db: AsyncSession, conversation_id: int) -> Sequence[HistoryRecord]:
+    """读取会话历史窗口：版本一致时命中缓存，否则查库并回填。"""
+    version: Optional[Tuple] = await crud_conversations.messages_version(db, conversation_id)
+    if version is None:
+        get_history_cache().invalidate(conversation_id)
+        return []
+    _, count, max_id = version
+    max_id = max_id or 0
+    if settings.HISTORY_CACHE_CONVERSATIONS > 0:
+        records = get_history_cache().get(conversation_id, count, max_id)
+        if records is not None:
+            return records
+    msgs = await crud_messages.list_messages(db=db, conversation_id=conversation_id, limit=HISTORY_WINDOW)
+    records = [HistoryRecord.from_message(m) for m in msgs]
+    if settings.HISTORY_CACHE_CONVERSATIONS > 0:
+        get_history_cache().put(conversation_id, records, count, max_id)
+    return records
+
+
+# 全局历史缓存实例
+_cache: Optional[HistoryCache] = None
+
+
+def get_history_cache() -> HistoryCache:
+    """获取会话历史缓存实例（单例模式）"""
+    global _cache
+    if _cache is None:
+        _cache = HistoryCache(settings.HISTORY_CACHE_CONVERSATIONS, settings.HISTORY_CACHE_MAX_CHARS)
+    return _cache
+
+
+metrics.gauge("history_cache_conversations", "历史缓存中的会话数").set_function(
+    lambda: len(get_history_cache())
+)
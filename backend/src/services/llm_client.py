@@ -1,25 +1,68 @@
 import logging
-from typing import Dict, List
-
-from openai import AsyncOpenAI
+import time
+from typing import TYPE_CHECKING, Dict, List
 
 from src.config import settings
+from src.utils import metrics
+from src.utils.sse import StreamStats
+from src.utils.tracing import span
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
 
 logger = logging.getLogger(__name__)
 
+LLM_REQUEST_SECONDS = metrics.histogram(
+    "llm_request_duration_seconds",
+    "大模型调用耗时（流式为整段生成时长）",
+    ("model", "mode"),
+)
+LLM_TTFT_SECONDS = metrics.histogram(
+    "llm_time_to_first_token_seconds", "流式调用首个增量到达耗时", ("model",)
+)
+LLM_TOKENS_PER_SECOND = metrics.histogram(
+    "llm_tokens_per_second",
+    "流式调用生成速率（按增量个数近似 token 数）",
+    ("model",),
+    buckets=(1, 5, 10, 20, 30, 50, 75, 100, 150, 200, 400),
+)
+LLM_TOKENS_TOTAL = metrics.counter(
+    "llm_stream_tokens_total", "流式调用输出增量总数", ("model",)
+)
+LLM_ERRORS_TOTAL = metrics.counter("llm_errors_total", "大模型调用失败次数", ("model", "mode"))
+
 
 
 class LLMError(Exception):
     """调用底层大模型(LLM) 接口异常。"""
 
 
-_client: AsyncOpenAI | None = None
+_client: "AsyncOpenAI | None" = None
+
+
+def record_stream_metrics(
+    model: str, started: float, ended: float, stats: StreamStats
+) -> None:
+    """记录一次流式生成的耗时、首 token 时延与生成速率（时间均为 loop.time() 口径）。"""
+    LLM_REQUEST_SECONDS.observe(ended - started, model=model, mode="stream")
+    if stats.first_delta_at is None:
+        return
+    LLM_TTFT_SECONDS.observe(stats.first_delta_at - started, model=model)
+    LLM_TOKENS_TOTAL.inc(stats.deltas, model=model)
+    generating = stats.last_delta_at - stats.first_delta_at
+    if stats.deltas > 1 and generating > 0:
+        LLM_TOKENS_PER_SECOND.observe((stats.deltas - 1) / generating, model=model)
 
 
-def _get_client() -> AsyncOpenAI:
-    """懒加载 OpenAI 兼容客户端，可通过 LLM_BASE_URL 指向 DeepSeek 等服务。"""
+def _get_client() -> "AsyncOpenAI":
+    """懒加载 OpenAI 兼容客户端，可通过 LLM_BASE_URL 指向 DeepSeek 等服务。
+
+    openai 包导入约需 0.6s，推迟到首次调用（或启动后的后台预热）时再导入。
+    """
     global _client
     if _client is None:
+        from openai import AsyncOpenAI
+
         _client = AsyncOpenAI(
             api_key=settings.LLM_API_KEY,
             base_url=settings.LLM_BASE_URL,
@@ -54,16 +97,27 @@ async def chat(
         # OpenAI v1 客户端支持 response_format={"type": "json_object"} 等
         params["response_format"] = {"type": response_format}
 
+    start = time.perf_counter()
     try:
-        logger.info(f"Calling LLM: model={resolved_model}, messages: {messages}")
-        resp = await client.chat.completions.create(**params)
+        logger.info(
+            f"Calling LLM: model={resolved_model}, messages={len(messages)}, "
+            f"chars={sum(len(m.get('content') or '') for m in messages)}"
+        )
+        with span("llm.chat", model=resolved_model):
+            resp = await client.chat.completions.create(**params)
     except Exception as exc:  # noqa: BLE001
+        LLM_ERRORS_TOTAL.inc(model=resolved_model, mode="chat")
         logger.error(f"LLM API call failed: {exc}", exc_info=True)
         raise LLMError(f"LLM 调用失败: {exc}") from exc
+    finally:
+        LLM_REQUEST_SECONDS.observe(
+            time.perf_counter() - start, model=resolved_model, mode="chat"
+        )
 
     try:
         content = resp.choices[0].message.content or ""
-        logger.info(f"LLM response received, content: {content}")
+        logger.info(f"LLM response received, chars={len(content)}")
+        logger.debug(f"LLM response content: {content}")
     except (AttributeError, IndexError) as exc:  # pragma: no cover - 防御性
         logger.error(f"Failed to parse LLM response: {resp}", exc_info=True)
         raise LLMError(f"Unexpected LLM response: {resp}") from exc
@@ -5,15 +5,28 @@ MatrixOne数据库客户端服务
 """
 
 import logging
+import time
 from typing import Dict, Any, Optional, List
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.config import settings
 from src.db.session import AsyncSessionLocal
+from src.utils import metrics
+from src.utils.logger import redact
+from src.utils.tracing import span
 
 logger = logging.getLogger(__name__)
 
+# 查询类型：vector（向量检索）/ hybrid（混合检索）/ like（关键词退化查询）/ stats（供应商聚合表）/ raw（前端透传 SQL）
+SQL_QUERY_SECONDS = metrics.histogram(
+    "moi_sql_duration_seconds", "MOI 查询耗时", ("query_type",)
+)
+SQL_QUERIES_TOTAL = metrics.counter(
+    "moi_sql_queries_total", "MOI 查询次数", ("query_type", "status")
+)
+SQL_ROWS_TOTAL = metrics.counter("moi_sql_rows_total", "MOI 查询返回行数", ("query_type",))
+
 
 class MatrixOneClient:
     """MatrixOne数据库直接连接客户端"""
@@ -22,59 +35,78 @@ class MatrixOneClient:
         self.database_url = settings.DATABASE_URL
         logger.info(f"MatrixOne客户端初始化，数据库URL: {self.database_url}")
 
-    async def run_sql(self, statement: str) -> Dict[str, Any]:
+    async def run_sql(
+        self, statement: str, query_type: str = "raw", params: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
         """
         直接执行SQL查询到MatrixOne数据库
 
         Args:
             statement: SQL语句
+            query_type: 查询类型（vector/like/raw），用于指标分类
+            params: 绑定参数（语句中以 :name 引用），标的物名称等外部输入一律以参数传入
 
         Returns:
             查询结果，包含columns和rows
         """
-        logger.info(f"执行SQL查询: {statement[:500]}{'...' if len(statement) > 500 else ''}")
-
-        try:
-            async with AsyncSessionLocal() as session:
-                # 执行SQL查询
-                result = await session.execute(text(statement))
-
-                # 获取列名
-                if result.returns_rows:
-                    columns = list(result.keys())
-                    raw_rows = result.fetchall()
-
-                    # 将行转换为字典列表
-                    rows = []
-                    for row in raw_rows:
-                        row_dict = {}
-                        for idx, col in enumerate(columns):
-                            row_dict[col] = row[idx]
-                        rows.append(row_dict)
-
-                    logger.info(f"SQL查询成功，返回 {len(rows)} 行数据，列: {columns}")
-                    return {
-                        "columns": columns,
-                        "rows": rows
-                    }
-                else:
-                    # 非查询语句（如INSERT、UPDATE、DELETE）
-                    await session.commit()
-                    logger.info("SQL执行成功（非查询语句）")
-                    return {
-                        "columns": [],
-                        "rows": [],
-                        "affected_rows": result.rowcount
-                    }
-
-        except Exception as e:
-            error_msg = f"SQL执行错误: {str(e)}"
-            logger.exception(error_msg)
-            return {
-                "error": error_msg,
-                "columns": [],
-                "rows": []
-            }
+        if logger.isEnabledFor(logging.INFO):
+            # 先折叠向量字面量再截断，避免日志被上千维向量占满
+            brief = redact(statement)
+            logger.info(f"执行SQL查询: {brief[:500]}{'...' if len(brief) > 500 else ''}")
+
+        start = time.perf_counter()
+        status = "ok"
+        with span("moi.run_sql", query_type=query_type) as current:
+            try:
+                async with AsyncSessionLocal() as session:
+                    # 执行SQL查询
+                    result = await session.execute(text(statement), params or {})
+
+                    # 获取列名
+                    if result.returns_rows:
+                        columns = list(result.keys())
+                        raw_rows = result.fetchall()
+
+                        # 将行转换为字典列表
+                        rows = []
+                        for row in raw_rows:
+                            row_dict = {}
+                            for idx, col in enumerate(columns):
+                                row_dict[col] = row[idx]
+                            rows.append(row_dict)
+
+                        logger.info(f"SQL查询成功，返回 {len(rows)} 行数据，列: {columns}")
+                        SQL_ROWS_TOTAL.inc(len(rows), query_type=query_type)
+                        if current is not None:
+                            current.set_attribute("db.rows", len(rows))
+                        return {
+                            "columns": columns,
+                            "rows": rows
+                        }
+                    else:
+                        # 非查询语句（如INSERT、UPDATE、DELETE）
+                        await session.commit()
+                        logger.info("SQL执行成功（非查询语句）")
+                        return {
+                            "columns": [],
+                            "rows": [],
+                            "affected_rows": result.rowcount
+                        }
+
+            except Exception as e:
+                status = "error"
+                if current is not None:
+                    current.set_error(e)
+                error_msg = f"SQL执行错误: {str(e)}"
+                logger.exception(error_msg)
+                return {
+                    "error": error_msg,
+                    "columns": [],
+                    "rows": []
+                }
+            finally:
+                SQL_QUERY_SECONDS.observe(time.perf_counter() - start, query_type=query_type)
+                SQL_QUERIES_TOTAL.inc(query_type=query_type, status=status)
 
 
 # 全局客户端实例
@@ -0,0 +1,185 @@
+"""
+MOI 查询结果缓存（进程内 LRU + 有效期）
+- 键为 (查询类型, 标的物名称, 向量摘要)：向量查询按向量内容与检索方式（MOI_RETRIEVAL_MODE）区分，
+  同名标的物带不同向量的请求互不命中；
+- 只缓存成功的结果（不带 error），有效期 MOI_QUERY_CACHE_SECONDS，超过 MOI_QUERY_CACHE_ENTRIES 条时淘汰最久未用的；
+- 同一个键的查询正在执行时（如后台预取），后到的请求（含批量查询）等待同一结果，不重复查库；
+  执行方被取消或失败时，批量查询的等待方自行重新查询；
+- 返回的结果为共享对象，调用方不得修改；数据导入完成后清空。
+"""
+
+import asyncio
+import hashlib
+import struct
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from src.config import settings
+from src.utils import metrics
+
+MOI_CACHE_TOTAL = metrics.counter(
+    "moi_query_cache_requests_total", "MOI 查询缓存读取次数（hit/shared/miss）", ("result",)
+)
+
+QueryResult = Dict[str, Any]
+CacheKey = Tuple[str, str, str]
+
+
+def cache_key(kind: str, item_name: str, embedding: Optional[Sequence[float]] = None) -> CacheKey:
+    """不带向量时摘要为空串；带向量时为检索方式加向量内容的摘要。"""
+    digest = ""
+    if embedding:
+        packed = struct.pack(f"<{len(embedding)}d", *embedding)
+        digest = f"{settings.MOI_RETRIEVAL_MODE}:{hashlib.blake2b(packed, digest_size=16).hexdigest()}"
+    return (kind, item_name.strip(), digest)
+
+
+class MoiQueryCache:
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max(max_entries, 1)
+        self._entries: "OrderedDict[CacheKey, Tuple[float, QueryResult]]" = OrderedDict()
+        self._inflight: Dict[CacheKey, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: CacheKey) -> Optional[QueryResult]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, result = entry
+        if expires < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return result
+
+    def put(self, key: CacheKey, result: QueryResult) -> None:
+        if result.get("error"):
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_load(self, key: CacheKey, loader: Callable[[], Awaitable[QueryResult]]) -> QueryResult:
+        """命中直接返回；同键查询进行中时等待其结果；否则执行 loader 并写入缓存。"""
+        result = self.get(key)
+        if result is not None:
+            MOI_CACHE_TOTAL.inc(result="hit")
+            return result
+        pending = self._inflight.get(key)
+        if pending is not None:
+            MOI_CACHE_TOTAL.inc(result="shared")
+            try:
+                # shield：等待方被取消时不影响执行方
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if pending.cancelled():
+                    return await self.get_or_load(key, loader)
+                raise
+        MOI_CACHE_TOTAL.inc(result="miss")
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await loader()
+        except BaseException as exc:
+            if isinstance(exc, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(exc)
+                # 没有等待方时避免 “exception was never retrieved” 警告
+                future.exception()
+            raise
+        else:
+            self.put(key, result)
+            future.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    async def get_or_load_many(
+        self,
+        keys: Dict[str, CacheKey],
+        loader: Callable[[List[str]], Awaitable[Dict[str, QueryResult]]],
+    ) -> Dict[str, QueryResult]:
+        """批量版 get_or_load：keys 为 {标的物: 缓存键}。
+
+        命中的直接返回；同键查询进行中的等待其结果；其余登记为进行中后交给 loader 合并查询，
+        返回 {标的物: 结果}。
+        """
+        results: Dict[str, QueryResult] = {}
+        waiting: Dict[str, asyncio.Future] = {}
+        missing: List[str] = []
+        own: Dict[CacheKey, asyncio.Future] = {}
+        loop = asyncio.get_running_loop()
+        for item, key in keys.items():
+            hit = self.get(key)
+            if hit is not None:
+                results[item] = hit
+            elif key in self._inflight:
+                waiting[item] = self._inflight[key]
+            else:
+                missing.append(item)
+                own[key] = self._inflight[key] = loop.create_future()
+        MOI_CACHE_TOTAL.inc(len(results), result="hit")
+        MOI_CACHE_TOTAL.inc(len(waiting), result="shared")
+        MOI_CACHE_TOTAL.inc(len(missing), result="miss")
+
+        if missing:
+            try:
+                loaded = await loader(missing)
+            except BaseException as exc:
+                for future in own.values():
+                    if isinstance(exc, asyncio.CancelledError):
+                        future.cancel()
+                    else:
+                        future.set_exception(exc)
+                        future.exception()
+                raise
+            else:
+                for item in missing:
+                    key = keys[item]
+                    self.put(key, loaded[item])
+                    if not own[key].done():
+                        own[key].set_result(loaded[item])
+                    results[item] = loaded[item]
+            finally:
+                for key, future in own.items():
+                    if self._inflight.get(key) is future:
+                        del self._inflight[key]
+
+        retry: Dict[str, CacheKey] = {}
+        for item, future in waiting.items():
+            try:
+                # shield：本请求被取消时不影响执行方
+                results[item] = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                retry[item] = keys[item]
+            except Exception:
+                retry[item] = keys[item]
+        if retry:
+            results.update(await self.get_or_load_many(retry, loader))
+        return results
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+# 全局 MOI 查询缓存实例
+_cache: Optional[MoiQueryCache] = None
+
+
+def get_moi_query_cache() -> MoiQueryCache:
+    """获取 MOI 查询缓存实例（单例模式）"""
+    global _cache
+    if _cache is None:
+        _cache = MoiQueryCache(settings.MOI_QUERY_CACHE_SECONDS, settings.MOI_QUERY_CACHE_ENTRIES)
+    return _cache
+
+
+metrics.gauge("moi_query_cache_entries", "MOI 查询缓存条目数").set_function(lambda: len(get_moi_query_cache()))
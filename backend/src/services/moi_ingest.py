@@ -0,0 +1,361 @@
+"""
+MOI 业务数据导入：把 CSV / XLSX 导出文件批量写入 bidding_records_1 / product_price，并生成向量列
+- 文件按行流式读取（XLSX 只读模式），每 MOI_INGEST_CHUNK_ROWS 行为一批：规范化数值列 → 按自然键去重
+  （批内去重，并跳过表中已存在的记录）→ 批量生成向量 → 一条多行 INSERT 写入并提交；
+- bidding_records_1 的每批插入持有聚合表水位行的锁直到提交，并发导入串行写入，记录按 id 顺序可见；
+- 重复导入同一文件不会产生重复记录；每批提交后回调 on_chunk（CLI 用于记录断点，中断后从断点继续）；
+- 向量化方式可替换（embedder 只需提供 async embed(texts)）：openai 使用 SOURCING_EMBEDDING_MODEL，
+  与查询向量一致；hash 为本地哈希嵌入，只用于测试与离线演示；
+- backfill_embeddings 为表中向量为空的存量记录补齐向量（按文本去重，相同文本只向量化一次）。
+"""
+
+import asyncio
+import csv
+import logging
+import time
+from itertools import islice
+from typing import Any, AsyncGenerator, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam, text
+
+from src.config import settings
+from src.db.session import AsyncSessionLocal
+from src.services import supplier_stats
+from src.utils import metrics
+from src.utils.table_extract import format_value, parse_number
+from src.utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+INGEST_ROWS_TOTAL = metrics.counter("moi_ingest_rows_total", "MOI 数据导入行数", ("table", "result"))
+
+MOI_SCHEMA = "xunyuan_agent"
+
+
+class IngestError(ValueError):
+    """导入文件无法处理（格式不支持、缺少自然键列等）。"""
+
+
+class TableSpec:
+    """可导入的表：写入列、自然键、数值列（列 -> (单位倍数, 格式)）、向量列（向量列 -> 文本列）。"""
+
+    __slots__ = ("name", "columns", "key", "numeric", "embeddings")
+
+    def __init__(
+        self,
+        name: str,
+        columns: Tuple[str, ...],
+        key: Tuple[str, ...],
+        numeric: Dict[str, Tuple[float, str]],
+        embeddings: Tuple[Tuple[str, str], ...],
+    ):
+        self.name = name
+        self.columns = columns
+        self.key = key
+        self.numeric = numeric
+        self.embeddings = embeddings
+
+    @property
+    def qualified(self) -> str:
+        return f"`{MOI_SCHEMA}`.`{self.name}`"
+
+
+TABLES: Dict[str, TableSpec] = {
+    spec.name: spec
+    for spec in (
+        TableSpec(
+            "bidding_records_1",
+            columns=(
+                "细化产品", "单位", "项目名称", "供应商名称", "参与状态", "是否参股企业",
+                "中标金额_万元", "供应商联系人", "电话号码", "电子邮件",
+            ),
+            key=("项目名称", "单位", "细化产品", "供应商名称"),
+            # decimal 列，单位万元；单元格带“元/亿元”等单位时换算
+            numeric={"中标金额_万元": (1e4, "{:.2f}")},
+            embeddings=(("project_name_embedding", "项目名称"), ("product_embedding", "细化产品")),
+        ),
+        TableSpec(
+            "product_price",
+            columns=(
+                "项目名称", "单位", "物料编码", "物料短描述", "物料单位",
+                "平均单价（元）", "最高价（元）", "最低价（元）",
+            ),
+            key=("项目名称", "单位", "物料编码"),
+            # varchar 列，统一为两位小数、千分位格式
+            numeric={
+                "平均单价（元）": (1.0, "{:,.2f}"),
+                "最高价（元）": (1.0, "{:,.2f}"),
+                "最低价（元）": (1.0, "{:,.2f}"),
+            },
+            embeddings=(("project_name_embedding", "项目名称"), ("product_embedding", "物料短描述")),
+        ),
+    )
+}
+
+
+def get_table_spec(table: str) -> TableSpec:
+    spec = TABLES.get(table)
+    if spec is None:
+        raise IngestError(f"不支持导入的表: {table}（可选 {', '.join(TABLES)}）")
+    return spec
+
+
+def get_ingest_embedder(kind: Optional[str] = None):
+    """按 MOI_INGEST_EMBEDDER 创建向量化器：openai（需配置 SOURCING_EMBEDDING_MODEL）/ hash / none；不生成向量时返回 None。"""
+    from src.services.retrieval import HashEmbedder, OpenAIEmbedder
+
+    kind = (kind or settings.MOI_INGEST_EMBEDDER).lower()
+    if kind == "openai" and settings.SOURCING_EMBEDDING_MODEL:
+        return OpenAIEmbedder(settings.SOURCING_EMBEDDING_MODEL, settings.MOI_INGEST_EMBED_BATCH)
+    if kind == "hash":
+        return HashEmbedder(settings.MOI_EMBED_DIM)
+    return None
+
+
+# ---------------------------------------------------------------------------
+# 文件读取与规范化
+# ---------------------------------------------------------------------------
+
+
+def _csv_encoding(path: str) -> str:
+    with open(path, "rb") as f:
+        head = f.read(64 * 1024)
+    try:
+        head.decode("utf-8-sig")
+        return "utf-8-sig"
+    except UnicodeDecodeError as exc:
+        # 截断在多字节字符中间不算解码失败
+        return "utf-8-sig" if exc.start >= len(head) - 3 else "gb18030"
+
+
+def _csv_rows(path: str) -> Iterator[Sequence[Any]]:
+    with open(path, newline="", encoding=_csv_encoding(path)) as f:
+        yield from csv.reader(f)
+
+
+def _xlsx_rows(path: str) -> Iterator[Sequence[Any]]:
+    import openpyxl
+
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        yield from wb.worksheets[0].iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+
+def open_rows(path: str) -> Tuple[List[str], Iterator[Sequence[Any]]]:
+    """打开导出文件，返回 (表头, 数据行迭代器)；XLSX 只读取第一个工作表。"""
+    lowered = path.lower()
+    if lowered.endswith(".csv"):
+        rows = _csv_rows(path)
+    elif lowered.endswith((".xlsx", ".xlsm")):
+        rows = _xlsx_rows(path)
+    else:
+        raise IngestError("只支持 .csv / .xlsx 文件")
+    for row in rows:
+        header = [format_value(cell).strip() for cell in row]
+        if any(header):
+            return header, rows
+    raise IngestError("文件为空")
+
+
+def normalize_number(value: Any, base: float, fmt: str) -> Optional[str]:
+    """解析数值单元格（千分位、货币符号、元/万元/亿元单位），按列的单位换算并格式化；空值返回 None。
+
+    无法解析时抛出 ValueError。
+    """
+    number, multiplier, _, percent = parse_number(value)
+    if number is None or percent:
+        if format_value(value).strip():
+            raise ValueError(f"无法解析的数值: {value!r}")
+        return None
+    if multiplier is not None:
+        number = number * multiplier / base
+    return fmt.format(number)
+
+
+def _text(value: Any) -> Optional[str]:
+    result = format_value(value).strip()
+    return result or None
+
+
+def _key(spec: TableSpec, record: Dict[str, Any]) -> Tuple[str, ...]:
+    return tuple(record.get(column) or "" for column in spec.key)
+
+
+def _vector_literal(vector: Sequence[float]) -> str:
+    return "[" + ",".join(f"{float(x):.6g}" for x in vector) + "]"
+
+
+async def _embed(embedder, texts: Sequence[str]) -> Dict[str, str]:
+    with span("moi.ingest.embed", texts=len(texts)):
+        vectors = await embedder.embed(list(texts))
+    return {t: _vector_literal(v) for t, v in zip(texts, vectors)}
+
+
+# ---------------------------------------------------------------------------
+# 导入
+# ---------------------------------------------------------------------------
+
+
+async def _existing_keys(db, spec: TableSpec, records: Sequence[Dict[str, Any]]) -> set:
+    """查询本批记录中已存在于表中的自然键（按自然键首列 IN 过滤后在内存中比较，NULL 按空串处理）。"""
+    first = spec.key[0]
+    values = sorted({record.get(first) or "" for record in records})
+    columns = ", ".join(f"`{column}`" for column in spec.key)
+    condition = f"`{first}` IN :values"
+    if "" in values:
+        condition += f" OR `{first}` IS NULL OR `{first}` = ''"
+    stmt = text(f"SELECT {columns} FROM {spec.qualified} WHERE {condition}").bindparams(
+        bindparam("values", expanding=True)
+    )
+    rows = (await db.execute(stmt, {"values": values})).all()
+    return {tuple(value or "" for value in row) for row in rows}
+
+
+def _insert_sql(spec: TableSpec, columns: Sequence[str], count: int) -> str:
+    names = ", ".join(f"`{column}`" for column in columns)
+    rows = ", ".join(
+        "(" + ", ".join(f":c{j}_{i}" for j in range(len(columns))) + ")" for i in range(count)
+    )
+    return f"INSERT INTO {spec.qualified} ({names}) VALUES {rows}"
+
+
+async def _load_chunk(spec: TableSpec, records: List[Dict[str, Any]], embedder) -> Tuple[int, int]:
+    """写入一批规范化后的记录，返回 (写入数, 已存在跳过数)。"""
+    unique: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+    for record in records:
+        unique.setdefault(_key(spec, record), record)
+    async with AsyncSessionLocal() as db:
+        existing = await _existing_keys(db, spec, list(unique.values()))
+        await db.rollback()
+        fresh = [record for key, record in unique.items() if key not in existing]
+        if not fresh:
+            return 0, len(records)
+
+        columns = list(spec.columns)
+        if embedder is not None:
+            texts = sorted({record[source] for _, source in spec.embeddings for record in fresh if record.get(source)})
+            vectors = await _embed(embedder, texts) if texts else {}
+            for column, source in spec.embeddings:
+                for record in fresh:
+                    record[column] = vectors.get(record.get(source))
+            columns.extend(column for column, _ in spec.embeddings)
+
+        params = {f"c{j}_{i}": record.get(column) for i, record in enumerate(fresh) for j, column in enumerate(columns)}
+        with span("moi.ingest.insert", table=spec.name, rows=len(fresh)):
+            if spec.name == "bidding_records_1":
+                # 增量刷新的水位要求记录按 id 顺序可见
+                await supplier_stats.lock_watermark(db)
+            await db.execute(text(_insert_sql(spec, columns, len(fresh))), params)
+            await db.commit()
+    return len(fresh), len(records) - len(fresh)
+
+
+async def ingest(
+    path: str,
+    table: str,
+    *,
+    embedder=None,
+    chunk_rows: Optional[int] = None,
+    skip_rows: int = 0,
+    on_chunk: Optional[Callable[[int], Any]] = None,
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """把导出文件导入 table，每批提交后产出一次累计进度：
+
+    {"table", "rows": 已读取数据行, "inserted", "skipped": 已存在/重复, "invalid": 数值无法解析,
+     "elapsed_s", "rows_per_sec", "done"}。
+    skip_rows 跳过文件开头已处理的数据行（断点续传）；on_chunk(已处理行数) 在每批提交后调用。
+    """
+    spec = get_table_spec(table)
+    chunk_rows = max(chunk_rows or settings.MOI_INGEST_CHUNK_ROWS, 1)
+    header, rows = await asyncio.to_thread(open_rows, path)
+    positions = {name: i for i, name in enumerate(header) if name in spec.columns}
+    missing = [column for column in spec.key if column not in positions]
+    if missing:
+        raise IngestError(f"缺少自然键列: {', '.join(missing)}")
+
+    start = time.perf_counter()
+    stats = {
+        "table": table, "rows": skip_rows, "inserted": 0, "skipped": 0, "invalid": 0,
+        "elapsed_s": 0.0, "rows_per_sec": 0.0, "done": False,
+    }
+    if skip_rows:
+        await asyncio.to_thread(lambda: next(islice(rows, skip_rows - 1, None), None))
+    read = 0
+
+    while True:
+        chunk = await asyncio.to_thread(lambda: list(islice(rows, chunk_rows)))
+        if chunk:
+            records: List[Dict[str, Any]] = []
+            for n, row in enumerate(chunk, start=1):
+                record: Dict[str, Any] = {}
+                try:
+                    for column, i in positions.items():
+                        value = row[i] if i < len(row) else None
+                        if column in spec.numeric:
+                            record[column] = normalize_number(value, *spec.numeric[column])
+                        else:
+                            record[column] = _text(value)
+                except ValueError as exc:
+                    stats["invalid"] += 1
+                    if stats["invalid"] <= 10:
+                        logger.warning(f"MOI ingest {table}: skip data row {stats['rows'] + n}: {exc}")
+                    continue
+                if any(record.values()):
+                    records.append(record)
+            inserted, skipped = await _load_chunk(spec, records, embedder) if records else (0, 0)
+            stats["rows"] += len(chunk)
+            stats["inserted"] += inserted
+            stats["skipped"] += skipped
+            read += len(chunk)
+            INGEST_ROWS_TOTAL.inc(inserted, table=table, result="inserted")
+            INGEST_ROWS_TOTAL.inc(skipped, table=table, result="skipped")
+            if on_chunk is not None:
+                on_chunk(stats["rows"])
+        elapsed = time.perf_counter() - start
+        stats["elapsed_s"] = round(elapsed, 2)
+        stats["rows_per_sec"] = round(read / elapsed, 1) if elapsed > 0 else 0.0
+        stats["done"] = len(chunk) < chunk_rows
+        yield dict(stats)
+        if stats["done"]:
+            break
+    INGEST_ROWS_TOTAL.inc(stats["invalid"], table=table, result="invalid")
+    logger.info(
+        f"MOI ingest {table} finished: rows={stats['rows']} inserted={stats['inserted']} "
+        f"skipped={stats['skipped']} invalid={stats['invalid']} ({stats['rows_per_sec']} rows/s)"
+    )
+
+
+async def backfill_embeddings(table: str, embedder, batch_size: int = 500) -> Dict[str, int]:
+    """为向量为空的存量记录补齐向量：每次取一批尚无向量的不同文本，向量化后按文本回填并提交。"""
+    spec = get_table_spec(table)
+    stats = {"texts": 0, "rows": 0}
+    async with AsyncSessionLocal() as db:
+        for column, source in spec.embeddings:
+            while True:
+                texts = (
+                    await db.execute(
+                        text(
+                            f"SELECT DISTINCT `{source}` FROM {spec.qualified} "
+                            f"WHERE `{column}` IS NULL AND `{source}` IS NOT NULL AND `{source}` <> '' LIMIT :limit"
+                        ),
+                        {"limit": batch_size},
+                    )
+                ).scalars().all()
+                await db.rollback()
+                if not texts:
+                    break
+                vectors = await _embed(embedder, texts)
+                result = await db.execute(
+                    text(
+                        f"UPDATE {spec.qualified} SET `{column}` = :vector "
+                        f"WHERE `{source}` = :text AND `{column}` IS NULL"
+                    ),
+                    [{"vector": vector, "text": t} for t, vector in vectors.items()],
+                )
+                await db.commit()
+                stats["texts"] += len(texts)
+                stats["rows"] += max(result.rowcount, 0)
+                logger.info(f"MOI backfill {table}.{column}: {stats['texts']} texts, {stats['rows']} rows")
+    return stats
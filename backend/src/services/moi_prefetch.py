@@ -0,0 +1,161 @@
+"""
+MOI 数据预取：标的物提取或文件解析出标的物后，在后台预先查询二采价格、历史表现与采购项目，
+写入 MOI 查询缓存，用户随后发起比价 / 供应商对比时直接命中
+- 每次最多预取 MOI_PREFETCH_MAX_ITEMS 个标的物；全进程同时执行的预取查询不超过 MOI_PREFETCH_CONCURRENCY，
+  低于前台批量查询的并发，避免挤占连接池；
+- 预取与前台查询共用缓存的进行中结果：前台请求到达时若预取正在查询同一标的物，直接等待该结果；
+- 采购项目不使用向量，预取结果可被前端与寻源分析直接命中；
+- 历史表现与二采价格按向量缓存，前端自带的向量服务端无法复现，因此只在配置 SOURCING_EMBEDDING_MODEL 时预取：
+  用服务端生成（并缓存）的向量查询，供 /api/sourcing/analyze 命中；未配置或向量生成失败时不预取这两项；
+- 预取任务按会话登记，删除会话时取消；进程退出时全部取消。
+"""
+
+import asyncio
+import json
+import logging
+import re
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Set
+
+from src.config import settings
+from src.services import moi_queries
+from src.services.sourcing import embed_item
+from src.utils import metrics
+from src.utils.table_extract import TYPE_TEXT, Table
+
+logger = logging.getLogger(__name__)
+
+MOI_PREFETCH_TOTAL = metrics.counter(
+    "moi_prefetch_items_total", "MOI 预取的标的物数（done/cancelled/error）", ("status",)
+)
+
+# 表格中视为标的物名称的列
+_ITEM_HEADER = re.compile(r"标的|产品|物料|设备|型号|品名|名称|规格")
+_NUMERIC = re.compile(r"^[\d\s.,，%¥￥$+-]*$")
+_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+
+def parse_extracted_items(content: str) -> List[str]:
+    """解析 /api/items/extract 的大模型输出（JSON 数组，元素为 {name, quantity} 或字符串），解析失败返回空列表。"""
+    text = _FENCE.sub("", (content or "").strip())
+    start, end = text.find("["), text.rfind("]")
+    if start < 0 or end <= start:
+        return []
+    try:
+        data = json.loads(text[start : end + 1])
+    except ValueError:
+        return []
+    names: List[str] = []
+    for entry in data if isinstance(data, list) else []:
+        name = entry.get("name") if isinstance(entry, dict) else entry
+        if isinstance(name, str) and name.strip():
+            names.append(name.strip())
+    return names
+
+
+def item_names_from_tables(tables: Iterable[Table], limit: int) -> List[str]:
+    """从解析出的表格中取标的物名称：每张表第一个表头匹配名称类关键词的文本列，跳过合计 / 小计行，去掉纯数字与过长的值。"""
+    names: List[str] = []
+    for table in tables:
+        index = next(
+            (i for i, c in enumerate(table.columns) if c.type == TYPE_TEXT and _ITEM_HEADER.search(c.name)), None
+        )
+        if index is None:
+            continue
+        for row in table.item_rows():
+            value = str(row[index] or "").strip() if index < len(row) else ""
+            if 2 <= len(value) <= 64 and not _NUMERIC.match(value) and value not in names:
+                names.append(value)
+                if len(names) >= limit:
+                    return names
+    return names
+
+
+class MoiPrefetcher:
+    def __init__(self, concurrency: int, max_items: int):
+        self.max_items = max(max_items, 1)
+        self._slots = asyncio.Semaphore(max(concurrency, 1))
+        # 会话 id -> 进行中的预取任务（未关联会话的记在 None 下）
+        self._tasks: Dict[Optional[int], Set[asyncio.Task]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(tasks) for tasks in self._tasks.values())
+
+    def schedule(self, items: Sequence[str], conversation_id: Optional[int] = None) -> int:
+        """登记预取任务并立即返回，返回登记的标的物数。"""
+        if not settings.MOI_PREFETCH_ENABLED or settings.MOI_QUERY_CACHE_SECONDS <= 0:
+            return 0
+        names = list(dict.fromkeys(name.strip() for name in items if name and name.strip()))[: self.max_items]
+        if not names:
+            return 0
+        tasks = self._tasks.setdefault(conversation_id, set())
+        for name in names:
+            task = asyncio.create_task(self._prefetch(name))
+            tasks.add(task)
+            task.add_done_callback(lambda t, cid=conversation_id: self._done(cid, t))
+        logger.info(f"MOI prefetch scheduled: conversation_id={conversation_id}, items={len(names)}")
+        return len(names)
+
+    async def _run(self, work: Callable[[], Awaitable[Any]]) -> Any:
+        # 取得并发名额后才创建查询，排队期间被取消不会留下未执行的协程
+        async with self._slots:
+            return await work()
+
+    async def _prefetch(self, item: str) -> None:
+        await asyncio.gather(
+            self._run(lambda: moi_queries.query_procurement_projects(item)),
+            self._prefetch_vector(item),
+        )
+
+    async def _prefetch_vector(self, item: str) -> None:
+        if not settings.SOURCING_EMBEDDING_MODEL:
+            return
+        embedding = await self._run(lambda: embed_item(item))
+        if not embedding:
+            return
+        await asyncio.gather(
+            self._run(lambda: moi_queries.query_secondary_price(item, embedding)),
+            self._run(lambda: moi_queries.query_historical_performance(item, embedding)),
+        )
+
+    def _done(self, conversation_id: Optional[int], task: asyncio.Task) -> None:
+        tasks = self._tasks.get(conversation_id)
+        if tasks is not None:
+            tasks.discard(task)
+            if not tasks:
+                self._tasks.pop(conversation_id, None)
+        if task.cancelled():
+            MOI_PREFETCH_TOTAL.inc(status="cancelled")
+        elif task.exception() is not None:
+            MOI_PREFETCH_TOTAL.inc(status="error")
+            logger.warning(f"MOI prefetch failed: {task.exception()}")
+        else:
+            MOI_PREFETCH_TOTAL.inc(status="done")
+
+    def cancel(self, conversation_id: Optional[int]) -> int:
+        """取消会话的预取任务（删除会话时调用），返回取消的任务数。"""
+        tasks = list(self._tasks.pop(conversation_id, ()))
+        for task in tasks:
+            task.cancel()
+        return len(tasks)
+
+    async def shutdown(self) -> None:
+        tasks = [task for group in self._tasks.values() for task in group]
+        self._tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# 全局预取器实例
+_prefetcher: Optional[MoiPrefetcher] = None
+
+
+def get_moi_prefetcher() -> MoiPrefetcher:
+    """获取 MOI 预取器实例（单例模式）"""
+    global _prefetcher
+    if _prefetcher is None:
+        _prefetcher = MoiPrefetcher(settings.MOI_PREFETCH_CONCURRENCY, settings.MOI_PREFETCH_MAX_ITEMS)
+    return _prefetcher
+
+
+metrics.gauge("moi_prefetch_inflight", "进行中的 MOI 预取任务数").set_function(lambda: len(get_moi_prefetcher()))
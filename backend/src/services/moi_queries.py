@@ -0,0 +1,623 @@
+"""
+MOI 内部数据源查询：采购项目、潜在供应商历史表现、二采产品价格
+- /api/moi/query/* 与 /api/sourcing/analyze 共用同一套 SQL；
+- 提供向量时，项目名称 / 产品两个向量列并发查询，取结果较多的一组；
+  均无结果或失败时退化为 LIKE 查询；
+- MOI_RETRIEVAL_MODE=hybrid 时改为混合检索：一条语句内两个向量列与关键词各取前 K 条候选，
+  按加权倒数排名融合（RRF）打分，向量距离超过 MOI_HYBRID_MAX_DISTANCE 的候选不计分；
+- MOI_SUPPLIER_STATS 开启时，历史表现的 LIKE 查询先读供应商聚合表（细化产品匹配，无结果再按项目分组），
+  不再对原始记录做实时 GROUP BY 与金额转换；聚合表无匹配时回退到原查询；
+- 单个与批量查询的成功结果按 (查询类型, 标的物, 向量摘要) 缓存 MOI_QUERY_CACHE_SECONDS 秒（moi_cache），
+  标的物提取 / 文件解析后的后台预取（moi_prefetch）写入同一缓存；
+- 批量查询：标的物去重后，向量查询按 MOI_BATCH_CONCURRENCY 限制并发；LIKE 查询把多个标的物作为派生表
+  与数据表连接，一条语句扫描一次表，再用 ROW_NUMBER 按标的物各自截取前 N 行，结果按标的物拆分；
+- 标的物名称来自用户输入、上传文件的表格与大模型输出，一律作为绑定参数传入（:pattern，
+  合并查询为 :item_0、:pattern_0 ...），不拼接进 SQL 文本。
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence
+
+from src.config import settings
+from src.services.matrixone_client import get_matrixone_client
+from src.services.moi_cache import cache_key, get_moi_query_cache
+from src.services.supplier_stats import STATS_TABLES
+
+logger = logging.getLogger(__name__)
+
+QueryResult = Dict[str, Any]
+
+# 合并查询附加的列：所属标的物、在该标的物结果中的序号
+BATCH_ITEM_COLUMN = "_item"
+BATCH_RANK_COLUMN = "_rn"
+
+# 向量检索的两个向量列：项目名称 / 产品
+VECTOR_COLUMNS = ("project_name_embedding", "product_embedding")
+
+# 供应商历史表现：在候选招投标记录中按中标次数、中标金额排名
+_HISTORY_SQL = """
+SELECT
+    t.`供应商名称`,
+    COUNT(*) AS `投标次数`,
+    SUM(CASE WHEN t.`参与状态` = '中标' THEN 1 ELSE 0 END) AS `中标次数`,
+    ROUND(SUM(CASE WHEN t.`参与状态` = '中标' THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2) AS `中标率(%)`,
+    SUM(CAST(REPLACE(t.`中标金额_万元`, ',', '') AS DECIMAL(15,2))) AS `合计中标金额（万元）`
+FROM
+    (
+        SELECT
+            `供应商名称`,
+            `参与状态`,
+            `中标金额_万元`
+        FROM
+            `xunyuan_agent`.`bidding_records_1`
+        {candidates}
+        LIMIT 50
+    ) AS t
+WHERE t.`参与状态` = '中标'
+GROUP BY
+    t.`供应商名称`
+ORDER BY
+    `中标次数` DESC,
+    `合计中标金额（万元）` DESC
+LIMIT 10;
+""".strip()
+
+# 供应商聚合表：汇总匹配到的各细化产品 / 项目分组，只列出有中标记录的供应商
+_STATS_COLUMNS = """
+    s.`供应商名称`,
+    SUM(s.`投标次数`) AS `投标次数`,
+    SUM(s.`中标次数`) AS `中标次数`,
+    ROUND(SUM(s.`中标次数`) * 100.0 / SUM(s.`投标次数`), 2) AS `中标率(%)`,
+    SUM(s.`合计中标金额_万元`) AS `合计中标金额（万元）`""".strip("\n")
+
+_PRICE_COLUMNS = """
+    `项目名称`,
+    `物料短描述`,
+    `物料单位`,
+    `平均单价（元）`,
+    `最高价（元）`,
+    `最低价（元）`""".strip("\n")
+
+
+# 混合检索：每路候选数
+HYBRID_BRANCH_LIMIT = 50
+
+# 二采价格混合检索的融合键（即返回的列）
+_PRICE_KEY = ("项目名称", "物料短描述", "物料单位", "平均单价（元）", "最高价（元）", "最低价（元）")
+
+
+def like_params(item_name: str) -> Dict[str, str]:
+    """单个标的物查询的绑定参数：LIKE 模式。"""
+    return {"pattern": f"%{item_name}%"}
+
+
+def vector_literal(embedding: Sequence[float]) -> str:
+    return "[" + ",".join(map(str, embedding)) + "]"
+
+
+def procurement_projects_sql() -> str:
+    return """
+SELECT
+  `项目名称`,
+  `单位` AS `采购单位`,
+  `细化产品`,
+  `供应商名称`,
+  `中标金额_万元` AS `中标金额（万元）`,
+  `参与状态`
+FROM `xunyuan_agent`.`bidding_records_1`
+WHERE `项目名称` LIKE :pattern
+   OR `细化产品` LIKE :pattern
+ORDER BY `项目名称` DESC, `中标金额_万元` DESC
+LIMIT 20;
+    """.strip()
+
+
+def history_vector_sql(column: str, vector: str) -> str:
+    return _HISTORY_SQL.format(candidates=f"ORDER BY l2_distance(`{column}`, '{vector}') ASC")
+
+
+def history_like_sql() -> str:
+    return _HISTORY_SQL.format(
+        candidates=(
+            "WHERE\n"
+            "            `项目名称` LIKE :pattern\n"
+            "            OR `细化产品` LIKE :pattern"
+        )
+    )
+
+
+def price_vector_sql(column: str, vector: str) -> str:
+    return f"""
+SELECT
+{_PRICE_COLUMNS},
+    l2_distance(`{column}`, '{vector}') AS similarity_score
+FROM `xunyuan_agent`.`product_price`
+ORDER BY similarity_score ASC
+LIMIT 3;
+    """.strip()
+
+
+def price_like_sql() -> str:
+    return f"""
+SELECT
+{_PRICE_COLUMNS}
+FROM `xunyuan_agent`.`product_price`
+WHERE `物料短描述` LIKE :pattern
+   OR `项目名称` LIKE :pattern
+LIMIT 10;
+    """.strip()
+
+
+def _hybrid_branch(table: str, key: Sequence[str], order: str, where: str, weight: float, vector: bool) -> str:
+    """一路候选：按 order 取前 HYBRID_BRANCH_LIMIT 条并编排名；内层保持 ORDER BY ... LIMIT 的形式以使用向量索引。"""
+    columns = ", ".join(f"`{column}`" for column in key)
+    distance = "`_ord`" if vector else "NULL"
+    return (
+        f"SELECT {columns}, {distance} AS `_dist`, {float(weight)!r} AS `_w`, "
+        f"ROW_NUMBER() OVER (ORDER BY `_ord`) AS `_rank` "
+        f"FROM (SELECT {columns}, {order} AS `_ord` FROM {table} {where + ' ' if where else ''}"
+        f"ORDER BY `_ord` LIMIT {HYBRID_BRANCH_LIMIT}) x"
+    )
+
+
+def hybrid_candidates_sql(table: str, key: Sequence[str], text_columns: Sequence[str], vector: str) -> str:
+    """混合检索候选：两个向量列与关键词（text_columns 任一列 LIKE :pattern，首列命中优先、文本越短越靠前）
+    各取一路，按融合键汇总 relevance = Σ 权重 / (MOI_HYBRID_RRF_K + 排名)，distance 为最近的向量距离。"""
+    primary = text_columns[0]
+    keyword_where = "WHERE " + " OR ".join(f"`{column}` LIKE :pattern" for column in text_columns)
+    keyword_order = (
+        f"(CASE WHEN `{primary}` LIKE :pattern THEN 0 ELSE 10000 END) + LENGTH(COALESCE(`{primary}`, ''))"
+    )
+    branches = [
+        _hybrid_branch(table, key, f"l2_distance(`{column}`, '{vector}')", "", 1.0, vector=True)
+        for column in VECTOR_COLUMNS
+    ]
+    branches.append(
+        _hybrid_branch(table, key, keyword_order, keyword_where, settings.MOI_HYBRID_KEYWORD_WEIGHT, vector=False)
+    )
+    columns = ", ".join(f"c.`{column}`" for column in key)
+    threshold = settings.MOI_HYBRID_MAX_DISTANCE
+    condition = f"WHERE c.`_dist` IS NULL OR c.`_dist` <= {threshold:g}" if threshold > 0 else ""
+    union = "\n    UNION ALL ".join(branches)
+    return f"""
+SELECT
+    {columns},
+    SUM(c.`_w` / ({settings.MOI_HYBRID_RRF_K} + c.`_rank`)) AS `relevance`,
+    MIN(c.`_dist`) AS `distance`
+FROM (
+    {union}
+) c
+{condition}
+GROUP BY {columns}
+    """.strip()
+
+
+def history_hybrid_sql(vector: str) -> str:
+    """混合检索取融合得分最高的 50 条招投标记录作为候选，再按供应商汇总（与 history_vector_sql 口径一致）。"""
+    candidates = hybrid_candidates_sql(
+        "`xunyuan_agent`.`bidding_records_1`", ("id",), ("细化产品", "项目名称"), vector
+    )
+    return _HISTORY_SQL.format(
+        candidates=f"b\n        JOIN (\n{candidates}\n        ) f ON b.`id` = f.`id`\n        ORDER BY f.`relevance` DESC"
+    )
+
+
+def price_hybrid_sql(vector: str) -> str:
+    candidates = hybrid_candidates_sql(
+        "`xunyuan_agent`.`product_price`", _PRICE_KEY, ("物料短描述", "项目名称"), vector
+    )
+    columns = ",\n    ".join(f"h.`{column}`" for column in _PRICE_KEY)
+    return f"""
+SELECT
+    {columns},
+    h.`distance` AS similarity_score,
+    h.`relevance`
+FROM (
+{candidates}
+) h
+ORDER BY h.`relevance` DESC
+LIMIT 10;
+    """.strip()
+
+
+def history_stats_sql(table: str, key_column: str) -> str:
+    return f"""
+SELECT
+{_STATS_COLUMNS}
+FROM {table} s
+WHERE s.`{key_column}` LIKE :pattern
+GROUP BY s.`供应商名称`
+HAVING SUM(s.`中标次数`) > 0
+ORDER BY
+    `中标次数` DESC,
+    `合计中标金额（万元）` DESC
+LIMIT 10;
+    """.strip()
+
+
+async def _best_vector_result(label: str, statements: List[str]) -> Optional[QueryResult]:
+    """并发执行各向量列的查询，返回行数最多的一组（行数相同取靠前的列）；均无结果时返回 None。"""
+    client = get_matrixone_client()
+    results = await asyncio.gather(*(client.run_sql(sql, query_type="vector") for sql in statements))
+    for column, result in zip(VECTOR_COLUMNS, results):
+        if result.get("error"):
+            logger.warning(f"{label}向量查询失败 ({column}): {result['error']}")
+        else:
+            logger.info(f"{label}向量查询完成 ({column})，结果行数: {len(result.get('rows', []))}")
+    candidates = [r for r in results if r.get("rows")]
+    if not candidates:
+        logger.warning(f"{label}向量查询均无结果，退化到LIKE查询")
+        return None
+    return max(candidates, key=lambda r: len(r["rows"]))
+
+
+async def _hybrid_result(label: str, statement: str, item_name: str) -> Optional[QueryResult]:
+    """执行一条混合检索语句；出错或无结果时返回 None（退化为后续查询）。"""
+    result = await get_matrixone_client().run_sql(statement, query_type="hybrid", params=like_params(item_name))
+    if result.get("error"):
+        logger.warning(f"{label}混合检索失败: {result['error']}")
+        return None
+    return result if result.get("rows") else None
+
+
+async def _history_vector(item_name: str, embedding: Sequence[float]) -> Optional[QueryResult]:
+    vector = vector_literal(embedding)
+    if settings.MOI_RETRIEVAL_MODE == "hybrid":
+        return await _hybrid_result("历史表现", history_hybrid_sql(vector), item_name)
+    return await _best_vector_result("历史表现", [history_vector_sql(column, vector) for column in VECTOR_COLUMNS])
+
+
+async def _price_vector(item_name: str, embedding: Sequence[float]) -> Optional[QueryResult]:
+    vector = vector_literal(embedding)
+    if settings.MOI_RETRIEVAL_MODE == "hybrid":
+        return await _hybrid_result("二采价格", price_hybrid_sql(vector), item_name)
+    return await _best_vector_result("二采价格", [price_vector_sql(column, vector) for column in VECTOR_COLUMNS])
+
+
+async def _history_stats(item_name: str) -> Optional[QueryResult]:
+    """从聚合表读取历史表现：先按细化产品、再按项目分组匹配；均无结果或出错时返回 None。"""
+    client = get_matrixone_client()
+    for table, key_column in STATS_TABLES:
+        result = await client.run_sql(
+            history_stats_sql(table, key_column), query_type="stats", params=like_params(item_name)
+        )
+        if result.get("error"):
+            return None
+        if result.get("rows"):
+            return result
+    return None
+
+
+# 缓存与预取使用的查询类型（与寻源分析的数据源名称一致）
+PROCUREMENT_PROJECT = "procurement_project"
+POTENTIAL_SUPPLIER = "potential_supplier"
+SECONDARY_PRICE = "secondary_price"
+
+
+async def _cached(
+    kind: str, item_name: str, embedding: Optional[Sequence[float]], loader: Callable[[], Awaitable[QueryResult]]
+) -> QueryResult:
+    if settings.MOI_QUERY_CACHE_SECONDS <= 0:
+        return await loader()
+    return await get_moi_query_cache().get_or_load(cache_key(kind, item_name, embedding), loader)
+
+
+async def query_procurement_projects(item_name: str) -> QueryResult:
+    """采购项目：按项目名称 / 细化产品模糊匹配 xunyuan_agent.bidding_records_1。"""
+    return await _cached(
+        PROCUREMENT_PROJECT,
+        item_name,
+        None,
+        lambda: get_matrixone_client().run_sql(
+            procurement_projects_sql(), query_type="like", params=like_params(item_name)
+        ),
+    )
+
+
+async def query_historical_performance(
+    item_name: str, embedding: Optional[Sequence[float]] = None
+) -> QueryResult:
+    """潜在供应商历史表现：向量查询优先，LIKE 查询为退化方案。"""
+    return await _cached(
+        POTENTIAL_SUPPLIER, item_name, embedding, lambda: _historical_performance(item_name, embedding)
+    )
+
+
+async def query_secondary_price(
+    item_name: str, embedding: Optional[Sequence[float]] = None
+) -> QueryResult:
+    """二采产品价格：向量查询优先，LIKE 查询为退化方案。"""
+    return await _cached(SECONDARY_PRICE, item_name, embedding, lambda: _secondary_price(item_name, embedding))
+
+
+async def _historical_performance(item_name: str, embedding: Optional[Sequence[float]]) -> QueryResult:
+    if embedding:
+        result = await _history_vector(item_name, embedding)
+        if result is not None:
+            return result
+    if settings.MOI_SUPPLIER_STATS:
+        result = await _history_stats(item_name)
+        if result is not None:
+            return result
+    return await get_matrixone_client().run_sql(history_like_sql(), query_type="like", params=like_params(item_name))
+
+
+async def _secondary_price(item_name: str, embedding: Optional[Sequence[float]]) -> QueryResult:
+    if embedding:
+        result = await _price_vector(item_name, embedding)
+        if result is not None:
+            return result
+    return await get_matrixone_client().run_sql(price_like_sql(), query_type="like", params=like_params(item_name))
+
+
+# ---------------------------------------------------------------------------
+# 批量查询
+# ---------------------------------------------------------------------------
+
+
+def batch_params(items: Sequence[str]) -> Dict[str, str]:
+    """合并查询的绑定参数：第 i 个标的物的名称与 LIKE 模式为 :item_i / :pattern_i。"""
+    params: Dict[str, str] = {}
+    for i, item in enumerate(items):
+        params[f"item_{i}"] = item
+        params[f"pattern_{i}"] = f"%{item}%"
+    return params
+
+
+def _items_table(count: int) -> str:
+    """标的物派生表：每行一个标的物及其 LIKE 模式，取值见 batch_params。"""
+    return "\n    UNION ALL ".join(
+        f"SELECT :item_{i} AS `{BATCH_ITEM_COLUMN}`, :pattern_{i} AS `_pattern`" for i in range(count)
+    )
+
+
+def procurement_projects_batch_sql(count: int) -> str:
+    return f"""
+SELECT * FROM (
+  SELECT
+    m.`{BATCH_ITEM_COLUMN}`,
+    b.`项目名称`,
+    b.`单位` AS `采购单位`,
+    b.`细化产品`,
+    b.`供应商名称`,
+    b.`中标金额_万元` AS `中标金额（万元）`,
+    b.`参与状态`,
+    ROW_NUMBER() OVER (
+      PARTITION BY m.`{BATCH_ITEM_COLUMN}` ORDER BY b.`项目名称` DESC, b.`中标金额_万元` DESC
+    ) AS `{BATCH_RANK_COLUMN}`
+  FROM `xunyuan_agent`.`bidding_records_1` b
+  JOIN (
+    {_items_table(count)}
+  ) m ON b.`项目名称` LIKE m.`_pattern` OR b.`细化产品` LIKE m.`_pattern`
+) r
+WHERE r.`{BATCH_RANK_COLUMN}` <= 20
+ORDER BY r.`{BATCH_ITEM_COLUMN}`, r.`{BATCH_RANK_COLUMN}`;
+    """.strip()
+
+
+def history_like_batch_sql(count: int) -> str:
+    """与 history_like_sql 相同：每个标的物取 50 条候选记录，按供应商汇总中标情况后取前 10。"""
+    return f"""
+SELECT * FROM (
+  SELECT
+    g.*,
+    ROW_NUMBER() OVER (
+      PARTITION BY g.`{BATCH_ITEM_COLUMN}` ORDER BY g.`中标次数` DESC, g.`合计中标金额（万元）` DESC
+    ) AS `{BATCH_RANK_COLUMN}`
+  FROM (
+    SELECT
+        t.`{BATCH_ITEM_COLUMN}`,
+        t.`供应商名称`,
+        COUNT(*) AS `投标次数`,
+        SUM(CASE WHEN t.`参与状态` = '中标' THEN 1 ELSE 0 END) AS `中标次数`,
+        ROUND(SUM(CASE WHEN t.`参与状态` = '中标' THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2) AS `中标率(%)`,
+        SUM(CAST(REPLACE(t.`中标金额_万元`, ',', '') AS DECIMAL(15,2))) AS `合计中标金额（万元）`
+    FROM
+        (
+            SELECT
+                m.`{BATCH_ITEM_COLUMN}`,
+                b.`供应商名称`,
+                b.`参与状态`,
+                b.`中标金额_万元`,
+                ROW_NUMBER() OVER (PARTITION BY m.`{BATCH_ITEM_COLUMN}`) AS `_pos`
+            FROM `xunyuan_agent`.`bidding_records_1` b
+            JOIN (
+                {_items_table(count)}
+            ) m ON b.`项目名称` LIKE m.`_pattern` OR b.`细化产品` LIKE m.`_pattern`
+        ) AS t
+    WHERE t.`_pos` <= 50 AND t.`参与状态` = '中标'
+    GROUP BY t.`{BATCH_ITEM_COLUMN}`, t.`供应商名称`
+  ) g
+) r
+WHERE r.`{BATCH_RANK_COLUMN}` <= 10
+ORDER BY r.`{BATCH_ITEM_COLUMN}`, r.`{BATCH_RANK_COLUMN}`;
+    """.strip()
+
+
+def history_stats_batch_sql(table: str, key_column: str, count: int) -> str:
+    return f"""
+SELECT * FROM (
+  SELECT
+    g.*,
+    ROW_NUMBER() OVER (
+      PARTITION BY g.`{BATCH_ITEM_COLUMN}` ORDER BY g.`中标次数` DESC, g.`合计中标金额（万元）` DESC
+    ) AS `{BATCH_RANK_COLUMN}`
+  FROM (
+    SELECT
+    m.`{BATCH_ITEM_COLUMN}`,
+{_STATS_COLUMNS}
+    FROM {table} s
+    JOIN (
+      {_items_table(count)}
+    ) m ON s.`{key_column}` LIKE m.`_pattern`
+    GROUP BY m.`{BATCH_ITEM_COLUMN}`, s.`供应商名称`
+    HAVING SUM(s.`中标次数`) > 0
+  ) g
+) r
+WHERE r.`{BATCH_RANK_COLUMN}` <= 10
+ORDER BY r.`{BATCH_ITEM_COLUMN}`, r.`{BATCH_RANK_COLUMN}`;
+    """.strip()
+
+
+def price_like_batch_sql(count: int) -> str:
+    columns = ",\n".join(f"  p.{line.strip()}" for line in _PRICE_COLUMNS.split(",\n"))
+    return f"""
+SELECT * FROM (
+  SELECT
+  m.`{BATCH_ITEM_COLUMN}`,
+{columns},
+  ROW_NUMBER() OVER (PARTITION BY m.`{BATCH_ITEM_COLUMN}`) AS `{BATCH_RANK_COLUMN}`
+  FROM `xunyuan_agent`.`product_price` p
+  JOIN (
+    {_items_table(count)}
+  ) m ON p.`物料短描述` LIKE m.`_pattern` OR p.`项目名称` LIKE m.`_pattern`
+) r
+WHERE r.`{BATCH_RANK_COLUMN}` <= 10
+ORDER BY r.`{BATCH_ITEM_COLUMN}`, r.`{BATCH_RANK_COLUMN}`;
+    """.strip()
+
+
+def dedupe_items(items: Iterable[Any]) -> Dict[str, Optional[Sequence[float]]]:
+    """按去除首尾空白后的名称去重（保留首次出现的顺序与向量），忽略空名称。
+
+    items 的元素需带 item_name / embedding 属性（embedding 可缺省）。
+    """
+    unique: Dict[str, Optional[Sequence[float]]] = {}
+    for entry in items:
+        name = entry.item_name.strip()
+        if not name:
+            continue
+        embedding = getattr(entry, "embedding", None)
+        if name not in unique or (embedding and not unique[name]):
+            unique[name] = embedding
+    return unique
+
+
+def split_batch_result(result: QueryResult, items: Sequence[str]) -> Optional[Dict[str, QueryResult]]:
+    """把合并查询的结果按标的物拆开，去掉附加列；查询出错时返回 None。"""
+    if result.get("error"):
+        return None
+    extra = (BATCH_ITEM_COLUMN, BATCH_RANK_COLUMN)
+    columns = [c for c in result.get("columns", []) if c not in extra]
+    split: Dict[str, QueryResult] = {item: {"columns": columns, "rows": []} for item in items}
+    for row in result.get("rows", []):
+        target = split.get(row.get(BATCH_ITEM_COLUMN))
+        if target is not None:
+            target["rows"].append({c: row[c] for c in columns})
+    return split
+
+
+def _chunks(items: Sequence[str], size: int) -> List[Sequence[str]]:
+    size = max(size, 1)
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+async def _batch(
+    label: str,
+    items: Dict[str, Optional[Sequence[float]]],
+    vector_query: Optional[Callable[[str, Sequence[float]], Awaitable[Optional[QueryResult]]]],
+    like_batch_sql: Callable[[int], str],
+    like_sql: Callable[[], str],
+    prefetch: Optional[Callable[[List[str]], Awaitable[Dict[str, QueryResult]]]] = None,
+) -> Dict[str, QueryResult]:
+    client = get_matrixone_client()
+    slots = asyncio.Semaphore(max(settings.MOI_BATCH_CONCURRENCY, 1))
+    results: Dict[str, Optional[QueryResult]] = {}
+
+    async def vector(item: str, embedding: Sequence[float]) -> None:
+        async with slots:
+            results[item] = await vector_query(item, embedding)
+
+    async def like_one(item: str) -> None:
+        async with slots:
+            results[item] = await client.run_sql(like_sql(), query_type="like", params=like_params(item))
+
+    async def like_chunk(chunk: Sequence[str]) -> None:
+        async with slots:
+            combined = await client.run_sql(like_batch_sql(len(chunk)), query_type="like", params=batch_params(chunk))
+        split = split_batch_result(combined, chunk)
+        if split is None:
+            # 合并语句失败（如数据库不支持窗口函数）时逐个查询，单个标的物的错误只影响自己
+            logger.warning(f"{label}合并查询失败，改为逐个查询: {combined.get('error')}")
+            await asyncio.gather(*(like_one(item) for item in chunk))
+            return
+        results.update(split)
+
+    if vector_query is not None:
+        await asyncio.gather(*(vector(item, emb) for item, emb in items.items() if emb))
+    pending = [item for item in items if results.get(item) is None]
+    if prefetch is not None and pending:
+        results.update(await prefetch(pending))
+    # 以上均无结果的标的物合并为 LIKE 查询
+    pending = [item for item in items if results.get(item) is None]
+    await asyncio.gather(*(like_chunk(chunk) for chunk in _chunks(pending, settings.MOI_BATCH_SQL_ITEMS)))
+    logger.info(f"{label}批量查询完成: items={len(items)}, like={len(pending)}")
+    return {item: results[item] for item in items}
+
+
+async def _history_stats_many(items: List[str]) -> Dict[str, QueryResult]:
+    """批量读取聚合表：每张表每批一条语句，只返回有结果的标的物。"""
+    client = get_matrixone_client()
+    found: Dict[str, QueryResult] = {}
+    for table, key_column in STATS_TABLES:
+        pending = [item for item in items if item not in found]
+        for chunk in _chunks(pending, settings.MOI_BATCH_SQL_ITEMS):
+            combined = await client.run_sql(
+                history_stats_batch_sql(table, key_column, len(chunk)), query_type="stats", params=batch_params(chunk)
+            )
+            split = split_batch_result(combined, chunk)
+            if split is None:
+                return found
+            found.update({item: result for item, result in split.items() if result["rows"]})
+    return found
+
+
+async def _batch_cached(
+    kind: str,
+    items: Dict[str, Optional[Sequence[float]]],
+    run: Callable[[Dict[str, Optional[Sequence[float]]]], Awaitable[Dict[str, QueryResult]]],
+) -> Dict[str, QueryResult]:
+    """命中缓存的标的物直接返回，正在查询（如后台预取）的等待其结果，其余合并查询后写入缓存。"""
+    if settings.MOI_QUERY_CACHE_SECONDS <= 0:
+        return await run(items)
+    results = await get_moi_query_cache().get_or_load_many(
+        {item: cache_key(kind, item, embedding) for item, embedding in items.items()},
+        lambda missing: run({item: items[item] for item in missing}),
+    )
+    return {item: results[item] for item in items}
+
+
+async def batch_procurement_projects(items: Dict[str, Optional[Sequence[float]]]) -> Dict[str, QueryResult]:
+    """批量查询采购项目（不使用向量），返回 {标的物: 结果}。"""
+    items = dict.fromkeys(items)
+    return await _batch_cached(
+        PROCUREMENT_PROJECT,
+        items,
+        lambda missing: _batch("采购项目", missing, None, procurement_projects_batch_sql, procurement_projects_sql),
+    )
+
+
+async def batch_historical_performance(items: Dict[str, Optional[Sequence[float]]]) -> Dict[str, QueryResult]:
+    """批量查询潜在供应商历史表现，返回 {标的物: 结果}。"""
+    return await _batch_cached(
+        POTENTIAL_SUPPLIER,
+        items,
+        lambda missing: _batch(
+            "历史表现",
+            missing,
+            _history_vector,
+            history_like_batch_sql,
+            history_like_sql,
+            prefetch=_history_stats_many if settings.MOI_SUPPLIER_STATS else None,
+        ),
+    )
+
+
+async def batch_secondary_price(items: Dict[str, Optional[Sequence[float]]]) -> Dict[str, QueryResult]:
+    """批量查询二采产品价格，返回 {标的物: 结果}。"""
+    return await _batch_cached(
+        SECONDARY_PRICE,
+        items,
+        lambda missing: _batch("二采价格", missing, _price_vector, price_like_batch_sql, price_like_sql),
+    )
@@ -0,0 +1,266 @@
+"""
+文件内容检索：分块 → 向量化 → 进程内 NumPy 索引 → 按问题取 top-k 片段
+- 解析后的文件按段落打包成约 RAG_CHUNK_CHARS 字的块（相邻块保留少量重叠），记录所在页/工作表/幻灯片；
+- 向量化支持本地哈希嵌入（字符二元组特征哈希，无外部依赖，供测试与离线部署）与 OpenAI 兼容 embeddings 接口；
+- 索引按 file_id（内容哈希）去重保存，会话只记录关联的 file_id；对话时只把与当前问题最相关、
+  且总量不超过 RAG_TOKEN_BUDGET 的片段放进提示词，替代整文件截断拼接。
+"""
+
+import asyncio
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from src.config import settings
+from src.utils import metrics
+from src.utils.tracing import span
+
+if TYPE_CHECKING:
+    import numpy as np
+
+RAG_CHUNKS_TOTAL = metrics.counter("rag_chunks_indexed_total", "写入检索索引的文本块数")
+RAG_RETRIEVE_SECONDS = metrics.histogram("rag_retrieve_duration_seconds", "检索（问题向量化 + 相似度计算）耗时")
+
+# 解析器输出的位置标记：【第 3 页】、【工作表: Sheet1】、【幻灯片 2】
+_LOCATION = re.compile(r"^【(第 \d+ 页(?:（OCR）)?|工作表: [^】]+|幻灯片 \d+)】")
+_CJK = re.compile(r"[\u3400-\u9fff\uf900-\ufaff]")
+_WORD = re.compile(r"[a-z0-9]+(?:[.\-][a-z0-9]+)*")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：中文约 1 字 1 token，其余约 4 字符 1 token。"""
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class Chunk:
+    __slots__ = ("file_id", "file_name", "index", "location", "text")
+
+    def __init__(self, file_id: str, file_name: str, index: int, location: str, text: str):
+        self.file_id = file_id
+        self.file_name = file_name
+        self.index = index
+        self.location = location
+        self.text = text
+
+    def label(self) -> str:
+        return f"{self.file_name} · {self.location}" if self.location else self.file_name
+
+
+def chunk_text(text: str, chunk_chars: int, overlap: int) -> List[Tuple[str, str]]:
+    """按行打包为不超过 chunk_chars 的块，返回 [(位置, 文本)]；位置变化（换页/换表）时强制分块。"""
+    chunks: List[Tuple[str, str]] = []
+    location = ""
+    buf: List[str] = []
+    size = 0
+
+    def flush(carry: bool) -> None:
+        nonlocal buf, size
+        body = "\n".join(buf).strip()
+        if body:
+            chunks.append((location, body))
+        tail = body[-overlap:] if carry and overlap and body else ""
+        buf, size = ([tail] if tail else []), len(tail)
+
+    for line in text.splitlines():
+        match = _LOCATION.match(line)
+        if match:
+            flush(carry=False)
+            location = match.group(1)
+            continue
+        while len(line) > chunk_chars:
+            # 超长行（如无换行的纯文本）按长度硬切
+            if size:
+                flush(carry=True)
+            buf.append(line[:chunk_chars])
+            size += chunk_chars
+            flush(carry=True)
+            line = line[chunk_chars:]
+        if size + len(line) > chunk_chars and size:
+            flush(carry=True)
+        buf.append(line)
+        size += len(line) + 1
+    flush(carry=False)
+    return chunks
+
+
+class HashEmbedder:
+    """本地哈希嵌入：中文按字符二元组、英文数字按词做特征哈希，确定性且无外部依赖。"""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def _features(self, text: str) -> List[int]:
+        lowered = text.lower()
+        chars = [c for c in lowered if not c.isspace()]
+        feats = ["".join(chars[i : i + 2]) for i in range(max(len(chars) - 1, 1))]
+        feats.extend(_WORD.findall(lowered))
+        return [zlib.crc32(f.encode("utf-8")) for f in feats]
+
+    def embed_sync(self, texts: Sequence[str]) -> "np.ndarray":
+        import numpy as np
+
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            hashes = np.asarray(self._features(text), dtype=np.uint32)
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(matrix[row], hashes % self.dim, signs)
+        return _normalize(matrix)
+
+    async def embed(self, texts: Sequence[str]) -> "np.ndarray":
+        return await asyncio.to_thread(self.embed_sync, texts)
+
+
+class OpenAIEmbedder:
+    """OpenAI 兼容 embeddings 接口（复用对话的客户端与鉴权配置）。"""
+
+    def __init__(self, model: str, batch_size: int = 64):
+        self.model = model
+        self.batch_size = batch_size
+
+    async def embed(self, texts: Sequence[str]) -> "np.ndarray":
+        import numpy as np
+
+        from src.services.llm_client import _get_client
+
+        client = _get_client()
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), self.batch_size):
+            resp = await client.embeddings.create(model=self.model, input=list(texts[start : start + self.batch_size]))
+            vectors.extend(item.embedding for item in resp.data)
+        return _normalize(np.asarray(vectors, dtype=np.float32))
+
+
+def _normalize(matrix: "np.ndarray") -> "np.ndarray":
+    import numpy as np
+
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class _FileIndex:
+    __slots__ = ("chunks", "vectors")
+
+    def __init__(self, chunks: List[Chunk], vectors: "np.ndarray"):
+        self.chunks = chunks
+        self.vectors = vectors
+
+
+class RetrievalIndex:
+    """进程内向量索引：文件按 LRU 淘汰，会话 -> file_id 关联单独保存。"""
+
+    def __init__(self, embedder, max_files: int):
+        self.embedder = embedder
+        self.max_files = max(max_files, 1)
+        self._files: "OrderedDict[str, _FileIndex]" = OrderedDict()
+        self._conversations: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def has_file(self, file_id: str) -> bool:
+        return file_id in self._files
+
+    async def add_file(self, file_id: str, file_name: str, text: str) -> int:
+        """分块并向量化一个文件，返回块数；同一 file_id 只索引一次。"""
+        if self.has_file(file_id):
+            return len(self._files[file_id].chunks)
+        pieces = chunk_text(text, settings.RAG_CHUNK_CHARS, settings.RAG_CHUNK_OVERLAP)
+        if not pieces:
+            return 0
+        chunks = [Chunk(file_id, file_name, i, loc, body) for i, (loc, body) in enumerate(pieces)]
+        with span("rag.embed", chunks=len(chunks)):
+            vectors = await self.embedder.embed([c.text for c in chunks])
+        with self._lock:
+            self._files[file_id] = _FileIndex(chunks, vectors)
+            while len(self._files) > self.max_files:
+                self._files.popitem(last=False)
+        RAG_CHUNKS_TOTAL.inc(len(chunks))
+        return len(chunks)
+
+    def attach(self, conversation_id: int, file_ids: Iterable[str]) -> None:
+        with self._lock:
+            self._conversations.setdefault(conversation_id, set()).update(file_ids)
+
+    def detach(self, conversation_id: int, file_ids: Iterable[str]) -> None:
+        with self._lock:
+            self._conversations.get(conversation_id, set()).difference_update(file_ids)
+
+    def detach_conversation(self, conversation_id: int) -> None:
+        with self._lock:
+            self._conversations.pop(conversation_id, None)
+
+    def conversation_files(self, conversation_id: int) -> Set[str]:
+        return set(self._conversations.get(conversation_id, ()))
+
+    async def search(self, question: str, file_ids: Iterable[str], top_k: int) -> List[Tuple[float, Chunk]]:
+        import numpy as np
+
+        with self._lock:
+            indexes = [self._files[f] for f in file_ids if f in self._files]
+            for f in file_ids:
+                if f in self._files:
+                    self._files.move_to_end(f)
+        if not indexes or not question.strip():
+            return []
+        with RAG_RETRIEVE_SECONDS.time(), span("rag.retrieve", files=len(indexes)):
+            query = (await self.embedder.embed([question]))[0]
+            chunks = [c for idx in indexes for c in idx.chunks]
+            scores = np.concatenate([idx.vectors @ query for idx in indexes])
+            k = min(top_k, len(chunks))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), chunks[i]) for i in top]
+
+
+def select_within_budget(hits: Sequence[Tuple[float, Chunk]], token_budget: int) -> List[Chunk]:
+    """按相关度依次选取片段直到用完 token 预算，再按文件与原文顺序排列，便于模型阅读。"""
+    selected: List[Chunk] = []
+    used = 0
+    for _, chunk in hits:
+        cost = estimate_tokens(chunk.text)
+        if used + cost > token_budget:
+            continue
+        selected.append(chunk)
+        used += cost
+    selected.sort(key=lambda c: (c.file_name, c.file_id, c.index))
+    return selected
+
+
+async def build_file_context(question: str, file_ids: Iterable[str]) -> str:
+    """取与问题最相关的文件片段，格式化为提示词前缀；无可用片段时返回空串。"""
+    hits = await get_retrieval_index().search(question, list(file_ids), settings.RAG_TOP_K)
+    chunks = select_within_budget(hits, settings.RAG_TOKEN_BUDGET)
+    if not chunks:
+        return ""
+    parts = [f"[{c.label()}]\n{c.text}" for c in chunks]
+    return (
+        "以下是从用户上传文件中检索到的与问题最相关的片段，请基于这些内容回答：\n\n"
+        + "\n\n".join(parts)
+        + "\n\n---\n\n"
+    )
+
+
+# 全局检索索引实例
+_index: Optional[RetrievalIndex] = None
+
+
+def get_retrieval_index() -> RetrievalIndex:
+    """获取检索索引实例（单例模式）"""
+    global _index
+    if _index is None:
+        if settings.RAG_EMBEDDER == "openai" and settings.EMBEDDING_MODEL:
+            embedder = OpenAIEmbedder(settings.EMBEDDING_MODEL)
+        else:
+            embedder = HashEmbedder(settings.RAG_EMBED_DIM)
+        _index = RetrievalIndex(embedder, settings.RAG_MAX_FILES)
+    return _index
+
+
+metrics.gauge("rag_indexed_files", "检索索引中的文件数").set_function(
+    lambda: len(get_retrieval_index())
+)
@@ -0,0 +1,202 @@
+"""
+寻源分析：一次请求并发查询一个标的物的全部数据源，按完成顺序逐个产出结果
+- 内部数据源（MOI）：采购项目、潜在供应商历史表现、二采产品价格；
+  外部数据源：芯查查 / 半导小芯 / 1688，按各自关键词做网页搜索；
+- 历史表现与二采价格需要的查询向量只生成一次（SOURCING_EMBEDDING_MODEL，未配置时直接 LIKE 查询），
+  采购项目与网页搜索不等待向量；生成的向量随 MOI 查询缓存保存，与预取（moi_prefetch）共用同一向量；
+- 每个数据源有独立的截止时间，超时或失败只体现在该数据源的结果中（status=timeout/error）；
+- 潜在供应商历史表现返回后，立即对排名靠前的供应商按各评估维度并发做网页搜索。
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, AsyncGenerator, Awaitable, Dict, List, Optional, Sequence, Set
+
+from src.config import settings
+from src.services import moi_queries
+from src.services.moi_cache import cache_key, get_moi_query_cache
+from src.services.web_search import get_web_search_client
+from src.utils import metrics
+from src.utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+SOURCING_SOURCE_SECONDS = metrics.histogram(
+    "sourcing_source_duration_seconds", "寻源分析各数据源耗时", ("source", "status")
+)
+
+INTERNAL_SOURCES = ("procurement_project", "potential_supplier", "secondary_price")
+
+# 外部数据源 -> 附加的搜索关键词
+EXTERNAL_SOURCE_KEYWORDS = {
+    "ichipcheck": "芯查查 价格 库存 供应商",
+    "halfchip": "半导小芯 元器件 价格 库存",
+    "1688": "1688 批发 价格 供应商",
+}
+
+ALL_SOURCES = INTERNAL_SOURCES + tuple(EXTERNAL_SOURCE_KEYWORDS)
+
+# MOI 查询缓存中查询向量的类型
+QUERY_EMBEDDING = "query_embedding"
+
+# 供应商评估维度 -> 网页搜索关键词；“历史表现”来自内部数据库，不做网页搜索
+HISTORY_DIMENSION = "历史表现"
+DIMENSION_KEYWORDS = {
+    "市场份额": "市场份额 行业排名 市场地位",
+    "总体实力": "企业规模 注册资本 资质认证 公司实力",
+    "关键能力": "技术能力 研发实力 生产能力 核心竞争力",
+}
+DEFAULT_DIMENSIONS = (HISTORY_DIMENSION,) + tuple(DIMENSION_KEYWORDS)
+
+# 网页搜索每次保留的结果条数：数据源搜索 / 供应商调研
+SOURCE_PAGES = 5
+SUPPLIER_PAGES = 3
+
+
+async def embed_item(text: str) -> Optional[List[float]]:
+    """生成 MOI 向量检索用的查询向量；未配置模型、超时或失败时返回 None（退化为 LIKE 查询）。
+
+    成功生成的向量在 MOI 查询缓存中保存 MOI_QUERY_CACHE_SECONDS，同一标的物再次查询时得到同一向量，
+    向量查询的缓存键随之一致。
+    """
+    if not settings.SOURCING_EMBEDDING_MODEL:
+        return None
+    if settings.MOI_QUERY_CACHE_SECONDS <= 0:
+        return (await _embed(text)).get("embedding")
+    result = await get_moi_query_cache().get_or_load(cache_key(QUERY_EMBEDDING, text), lambda: _embed(text))
+    return result.get("embedding")
+
+
+async def _embed(text: str) -> Dict[str, Any]:
+    """返回 {"embedding"}，失败时返回 {"error"}（不写入缓存）。"""
+    from src.services.llm_client import _get_client
+
+    try:
+        async with asyncio.timeout(settings.SOURCING_EMBED_TIMEOUT_SECONDS):
+            with span("sourcing.embed"):
+                resp = await _get_client().embeddings.create(
+                    model=settings.SOURCING_EMBEDDING_MODEL, input=[text]
+                )
+        return {"embedding": list(resp.data[0].embedding)}
+    except Exception as exc:  # noqa: BLE001
+        logger.warning(f"Sourcing embedding failed, falling back to LIKE queries: {exc}")
+        return {"error": str(exc)}
+
+
+def _status(result: Any) -> Optional[str]:
+    """MOI 查询出错时不抛异常，而是在结果中带 error 字段。"""
+    if isinstance(result, dict) and result.get("error"):
+        return str(result["error"])
+    return None
+
+
+async def _run_source(work: Awaitable[Any], timeout: float, event: Dict[str, Any]) -> Dict[str, Any]:
+    """在截止时间内完成一个数据源，返回带 status / elapsed_ms 的事件；不向外抛异常。"""
+    start = time.perf_counter()
+    source = event["source"]
+    with span("sourcing.source", source=source) as current:
+        try:
+            async with asyncio.timeout(timeout):
+                event["result"] = await work
+            error = _status(event["result"])
+            event["status"] = "error" if error else "ok"
+            if error:
+                event["error"] = error
+        except TimeoutError:
+            event["status"] = "timeout"
+            event["error"] = f"超过 {timeout:g} 秒未返回"
+        except Exception as exc:  # noqa: BLE001
+            logger.warning(f"Sourcing source {source} failed: {exc}")
+            event["status"] = "error"
+            event["error"] = str(exc)
+            if current is not None:
+                current.set_error(exc)
+    elapsed = time.perf_counter() - start
+    event["elapsed_ms"] = round(elapsed * 1000)
+    SOURCING_SOURCE_SECONDS.observe(elapsed, source=source, status=event["status"])
+    return event
+
+
+def top_suppliers(result: Dict[str, Any], limit: int) -> List[str]:
+    suppliers: List[str] = []
+    for row in result.get("rows") or []:
+        name = row.get("供应商名称")
+        if name and name not in suppliers:
+            suppliers.append(name)
+    return suppliers[:limit]
+
+
+async def analyze(
+    item_name: str,
+    sources: Sequence[str] = ALL_SOURCES,
+    dimensions: Sequence[str] = DEFAULT_DIMENSIONS,
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """并发查询各数据源，按完成顺序产出事件：
+
+    {"source", "item_name", "status": ok/error/timeout, "elapsed_ms", "result", "error"?}；
+    供应商网页调研的事件 source 为 "supplier_search"，另带 supplier / dimension。
+    生成器被关闭（客户端断开）时取消所有未完成的查询。
+    """
+    web = get_web_search_client()
+    pending: Set[asyncio.Task] = set()
+    embedding_task: Optional[asyncio.Task] = None
+
+    def start(work: Awaitable[Any], timeout: float, source: str, **extra: Any) -> None:
+        event = {"source": source, "item_name": item_name, **extra}
+        pending.add(asyncio.create_task(_run_source(work, timeout, event)))
+
+    async def embedding() -> Optional[List[float]]:
+        if embedding_task is None:
+            return None
+        # shield：某个数据源超时被取消时不影响另一个数据源继续等待同一个向量
+        return await asyncio.shield(embedding_task)
+
+    if settings.SOURCING_EMBEDDING_MODEL and {"potential_supplier", "secondary_price"} & set(sources):
+        embedding_task = asyncio.create_task(embed_item(item_name))
+
+    async def history() -> Dict[str, Any]:
+        return await moi_queries.query_historical_performance(item_name, await embedding())
+
+    async def price() -> Dict[str, Any]:
+        return await moi_queries.query_secondary_price(item_name, await embedding())
+
+    moi_timeout = settings.SOURCING_MOI_TIMEOUT_SECONDS
+    web_timeout = settings.SOURCING_WEB_TIMEOUT_SECONDS
+    for source in sources:
+        if source == "procurement_project":
+            start(moi_queries.query_procurement_projects(item_name), moi_timeout, source)
+        elif source == "potential_supplier":
+            start(history(), moi_timeout, source)
+        elif source == "secondary_price":
+            start(price(), moi_timeout, source)
+        elif source in EXTERNAL_SOURCE_KEYWORDS:
+            query = f"{item_name} {EXTERNAL_SOURCE_KEYWORDS[source]}"
+            start(web.search(query, SOURCE_PAGES), web_timeout, source, query=query)
+
+    external_dimensions = [d for d in dimensions if d != HISTORY_DIMENSION]
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                pending.discard(task)
+                event = task.result()
+                if event["source"] == "potential_supplier" and event["status"] == "ok":
+                    # 第二阶段：历史表现靠前的供应商按评估维度做网页调研，先发出再回传历史表现
+                    for supplier in top_suppliers(event["result"], settings.SOURCING_TOP_SUPPLIERS):
+                        for dimension in external_dimensions:
+                            query = f"{supplier} {DIMENSION_KEYWORDS.get(dimension, dimension)}"
+                            start(
+                                web.search(query, SUPPLIER_PAGES),
+                                web_timeout,
+                                "supplier_search",
+                                supplier=supplier,
+                                dimension=dimension,
+                                query=query,
+                            )
+                yield event
+    finally:
+        for task in pending:
+            task.cancel()
+        if embedding_task is not None and not embedding_task.done():
+            embedding_task.cancel()
@@ -0,0 +1,207 @@
+"""
+供应商历史表现聚合表（增量刷新）
+- supplier_product_stats：供应商 × 细化产品；supplier_project_stats：供应商 × 项目分组
+  （项目名称去掉年份与批次/标段后缀，同一采购项目的历年各批次归为一组）；
+  每行保存投标次数、中标次数与中标记录的合计金额（万元）；
+- bidding_records_1 只追加导入：刷新时按主键读取水位之后的新记录，在 Python 中按键汇总增量，
+  再以 upsert 累加到聚合表，只改动新记录涉及的行；
+- 每批在一个事务内先以比较交换（CAS）推进水位再写增量，多个刷新任务并发运行时不会重复累加；
+- 水位假定记录按 id 顺序可见：导入 bidding_records_1 的事务在插入前锁住水位行（lock_watermark），
+  持锁到提交，并发导入因此串行写入，刷新不会越过尚未提交的较小 id；
+- 原始记录被修改或删除后需 --rebuild 全量重建。
+"""
+
+import logging
+import re
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.db.session import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+MOI_SCHEMA = "xunyuan_agent"
+PRODUCT_STATS_TABLE = f"`{MOI_SCHEMA}`.`supplier_product_stats`"
+PROJECT_STATS_TABLE = f"`{MOI_SCHEMA}`.`supplier_project_stats`"
+STATE_TABLE = f"`{MOI_SCHEMA}`.`supplier_stats_state`"
+STATE_NAME = "bidding_records_1"
+
+# 聚合表 -> 分组列
+STATS_TABLES = (
+    (PRODUCT_STATS_TABLE, "细化产品"),
+    (PROJECT_STATS_TABLE, "项目分组"),
+)
+
+_YEAR = re.compile(r"(19|20)\d{2}\s*年(度)?")
+_SUFFIX = re.compile(r"[（(][^（()）]*[)）]\s*$|[-—_\s]*(第\s*\S{1,4}\s*[批期次包]|\S{1,4}\s*标段|标段\s*\d+|标包\s*\S{1,4}|包\s*\d+)\s*$")
+
+_Key = Tuple[str, str]
+
+
+def project_bucket(project_name: str) -> str:
+    """项目分组：去掉年份与末尾的批次/标段/包号及括号说明。"""
+    name = _YEAR.sub("", project_name or "").strip()
+    while True:
+        stripped = _SUFFIX.sub("", name).strip()
+        if stripped == name or not stripped:
+            return name
+        name = stripped
+
+
+def _amount(value: Any) -> Decimal:
+    if value is None:
+        return Decimal(0)
+    try:
+        return Decimal(str(value).replace(",", ""))
+    except InvalidOperation:
+        return Decimal(0)
+
+
+class _Delta:
+    __slots__ = ("bids", "wins", "amount")
+
+    def __init__(self) -> None:
+        self.bids = 0
+        self.wins = 0
+        self.amount = Decimal(0)
+
+
+def aggregate(rows) -> Tuple[Dict[_Key, _Delta], Dict[_Key, _Delta]]:
+    """把一批原始记录汇总为两张聚合表的增量；没有供应商名称的记录跳过。"""
+    by_product: Dict[_Key, _Delta] = defaultdict(_Delta)
+    by_project: Dict[_Key, _Delta] = defaultdict(_Delta)
+    for row in rows:
+        supplier = (row.供应商名称 or "").strip()
+        if not supplier:
+            continue
+        won = row.参与状态 == "中标"
+        amount = _amount(row.中标金额_万元) if won else Decimal(0)
+        for delta in (
+            by_product[(supplier, (row.细化产品 or "").strip())],
+            by_project[(supplier, project_bucket(row.项目名称))],
+        ):
+            delta.bids += 1
+            delta.wins += won
+            delta.amount += amount
+    return by_product, by_project
+
+
+def _upsert_sql(dialect: str, table: str, key_column: str) -> str:
+    columns = f"(`供应商名称`, `{key_column}`, `投标次数`, `中标次数`, `合计中标金额_万元`)"
+    values = "(:supplier, :key, :bids, :wins, :amount)"
+    if dialect == "sqlite":
+        # 基准测试使用的 SQLite 替身
+        return (
+            f"INSERT INTO {table} {columns} VALUES {values} "
+            f"ON CONFLICT (`供应商名称`, `{key_column}`) DO UPDATE SET "
+            "`投标次数` = `投标次数` + excluded.`投标次数`, "
+            "`中标次数` = `中标次数` + excluded.`中标次数`, "
+            "`合计中标金额_万元` = `合计中标金额_万元` + excluded.`合计中标金额_万元`"
+        )
+    return (
+        f"INSERT INTO {table} {columns} VALUES {values} "
+        "ON DUPLICATE KEY UPDATE "
+        "`投标次数` = `投标次数` + VALUES(`投标次数`), "
+        "`中标次数` = `中标次数` + VALUES(`中标次数`), "
+        "`合计中标金额_万元` = `合计中标金额_万元` + VALUES(`合计中标金额_万元`)"
+    )
+
+
+async def _watermark(db: AsyncSession) -> int:
+    row = (
+        await db.execute(text(f"SELECT `last_record_id` FROM {STATE_TABLE} WHERE `name` = :name"), {"name": STATE_NAME})
+    ).first()
+    if row is not None:
+        return int(row.last_record_id)
+    try:
+        await db.execute(
+            text(f"INSERT INTO {STATE_TABLE} (`name`, `last_record_id`) VALUES (:name, 0)"), {"name": STATE_NAME}
+        )
+        await db.commit()
+    except IntegrityError:
+        # 另一个任务同时创建了水位行
+        await db.rollback()
+        return await _watermark(db)
+    return 0
+
+
+async def lock_watermark(db: AsyncSession) -> None:
+    """锁住水位行直到 db 的当前事务结束；写入 bidding_records_1 的事务在插入前调用。
+
+    自增 id 在持锁期间分配、提交后才释放锁，并发导入的记录因此按 id 顺序可见。
+    SQLite 替身本身串行化写事务，不需要加锁。
+    """
+    await _watermark(db)
+    if db.get_bind().dialect.name == "sqlite":
+        return
+    await db.execute(
+        text(f"SELECT `last_record_id` FROM {STATE_TABLE} WHERE `name` = :name FOR UPDATE"), {"name": STATE_NAME}
+    )
+
+
+async def _apply_batch(db: AsyncSession, old: int, new: int, rows) -> bool:
+    """在一个事务内推进水位并累加增量；水位已被其他任务推进时返回 False（不写入）。"""
+    moved = await db.execute(
+        text(
+            f"UPDATE {STATE_TABLE} SET `last_record_id` = :new, `refreshed_at` = CURRENT_TIMESTAMP "
+            "WHERE `name` = :name AND `last_record_id` = :old"
+        ),
+        {"name": STATE_NAME, "old": old, "new": new},
+    )
+    if moved.rowcount != 1:
+        await db.rollback()
+        return False
+    dialect = db.get_bind().dialect.name
+    for (table, key_column), deltas in zip(STATS_TABLES, aggregate(rows)):
+        if deltas:
+            # 金额以字符串绑定（sqlite3 不支持 Decimal 参数），由列类型转换为定点数
+            await db.execute(
+                text(_upsert_sql(dialect, table, key_column)),
+                [
+                    {"supplier": supplier, "key": key, "bids": d.bids, "wins": d.wins, "amount": str(d.amount)}
+                    for (supplier, key), d in deltas.items()
+                ],
+            )
+    await db.commit()
+    return True
+
+
+async def refresh(batch_size: int = 5000, rebuild: bool = False) -> Dict[str, int]:
+    """把水位之后新导入的招投标记录累加到聚合表，返回处理的记录数与最终水位。"""
+    stats = {"records": 0, "batches": 0, "last_record_id": 0}
+    async with AsyncSessionLocal() as db:
+        if rebuild:
+            for table, _ in STATS_TABLES:
+                await db.execute(text(f"DELETE FROM {table}"))
+            await db.execute(text(f"DELETE FROM {STATE_TABLE} WHERE `name` = :name"), {"name": STATE_NAME})
+            await db.commit()
+            logger.info("Supplier stats cleared for rebuild")
+        last_id = await _watermark(db)
+        while True:
+            rows: List[Any] = (
+                await db.execute(
+                    text(
+                        "SELECT `id`, `供应商名称`, `细化产品`, `项目名称`, `参与状态`, `中标金额_万元` "
+                        f"FROM `{MOI_SCHEMA}`.`bidding_records_1` WHERE `id` > :last_id ORDER BY `id` LIMIT :limit"
+                    ),
+                    {"last_id": last_id, "limit": batch_size},
+                )
+            ).all()
+            await db.rollback()
+            if not rows:
+                break
+            new_id = int(rows[-1].id)
+            if not await _apply_batch(db, last_id, new_id, rows):
+                logger.warning(f"Supplier stats watermark moved by another refresh at id={last_id}, stopping")
+                break
+            last_id = new_id
+            stats["records"] += len(rows)
+            stats["batches"] += 1
+            logger.info(f"Supplier stats refreshed up to id={last_id} ({stats['records']} records)")
+    stats["last_record_id"] = last_id
+    return stats
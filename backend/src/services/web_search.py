@@ -0,0 +1,108 @@
+"""
+外部网页搜索（博查 Web Search API）
+- 地址与密钥取自 WEB_SEARCH_API_URL / WEB_SEARCH_API_KEY，密钥只在服务端使用；
+- 复用一个 httpx.AsyncClient（连接池 + keep-alive），进程内并发请求数不超过 WEB_SEARCH_CONCURRENCY。
+"""
+
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from src.config import settings
+from src.utils import metrics
+from src.utils.tracing import span
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+WEB_SEARCH_SECONDS = metrics.histogram("web_search_duration_seconds", "网页搜索耗时", ("status",))
+
+
+class WebSearchError(Exception):
+    """调用网页搜索接口失败。"""
+
+
+def _pages(data: Dict[str, Any], count: int) -> List[Dict[str, str]]:
+    values = ((data.get("webPages") or {}).get("value")) or []
+    return [
+        {"title": v.get("name") or v.get("title") or "", "url": v.get("url") or "", "snippet": v.get("snippet") or ""}
+        for v in values[:count]
+    ]
+
+
+class WebSearchClient:
+    def __init__(self, url: str, api_key: str, timeout: float, concurrency: int):
+        self.url = url
+        self.api_key = api_key
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(max(concurrency, 1))
+        self._client: Optional["httpx.AsyncClient"] = None
+
+    def _get_client(self) -> "httpx.AsyncClient":
+        if self._client is None:
+            import httpx
+
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                headers={"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"},
+            )
+        return self._client
+
+    async def search(self, query: str, count: int = 10) -> Dict[str, Any]:
+        """搜索并返回 {"summary": 摘要, "pages": [{"title", "url", "snippet"}]}，最多 count 条。"""
+        if not self.api_key:
+            raise WebSearchError("WEB_SEARCH_API_KEY 未配置")
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            async with self._slots:
+                with span("web_search.search") as current:
+                    resp = await self._get_client().post(
+                        self.url, json={"query": query, "summary": True, "count": count}
+                    )
+                    if current is not None:
+                        current.set_attribute("http.status_code", resp.status_code)
+            if resp.status_code != 200:
+                raise WebSearchError(f"搜索请求失败: {resp.status_code}")
+            body = resp.json()
+            if body.get("code") not in (None, 200):
+                raise WebSearchError(f"搜索请求失败: {body.get('msg') or body.get('code')}")
+            data = body.get("data") or {}
+            return {"summary": data.get("summary") or "", "pages": _pages(data, count)}
+        except asyncio.CancelledError:
+            # 调用方截止时间已到或客户端断开
+            status = "cancelled"
+            raise
+        except WebSearchError:
+            status = "error"
+            raise
+        except Exception as exc:  # noqa: BLE001
+            status = "error"
+            raise WebSearchError(f"搜索请求失败: {exc}") from exc
+        finally:
+            WEB_SEARCH_SECONDS.observe(time.perf_counter() - start, status=status)
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# 全局搜索客户端实例
+_client: Optional[WebSearchClient] = None
+
+
+def get_web_search_client() -> WebSearchClient:
+    """获取网页搜索客户端实例（单例模式）"""
+    global _client
+    if _client is None:
+        _client = WebSearchClient(
+            settings.WEB_SEARCH_API_URL,
+            settings.WEB_SEARCH_API_KEY,
+            timeout=settings.WEB_SEARCH_TIMEOUT_SECONDS,
+            concurrency=settings.WEB_SEARCH_CONCURRENCY,
+        )
+    return _client
@@ -0,0 +1,192 @@
+"""
+消息写入合并提交（write-behind / group commit）
+- 消息插入与会话 updated_at 刷新先进入进程内队列，后台任务每 DB_WRITE_FLUSH_MS 毫秒或攒够
+  DB_WRITE_BATCH_ROWS 行时在一个事务内批量写入并提交；
+- 调用方 await 返回的结果：提交成功后才返回（消息拿到自增 id），接口语义与逐条提交一致，只是提交次数大幅减少；
+- 同一会话的多次 updated_at 刷新在批内合并为一次（取最大值）；
+- 批量提交失败时逐条重试，单条坏数据（如会话已删除）只影响自己的调用方；
+- 关闭时先停止接收、写完队列中剩余数据再退出；关闭后到达的写入直接同步提交。
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import update
+
+from src.config import settings
+from src.db.models import Conversation, Message
+from src.db.session import AsyncSessionLocal
+from src.utils import metrics
+from src.utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+WRITE_BATCH_ROWS = metrics.histogram(
+    "db_write_behind_batch_rows",
+    "合并提交每批的写入条数",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000),
+)
+WRITE_COMMITS_TOTAL = metrics.counter("db_write_behind_commits_total", "合并提交的事务数", ("status",))
+
+_Insert = Tuple[Dict[str, Any], "asyncio.Future[int]"]
+
+
+class WriteBehindQueue:
+    def __init__(self, session_factory, batch_rows: int, flush_ms: float, max_pending: int):
+        self.session_factory = session_factory
+        self.batch_rows = max(batch_rows, 1)
+        self.flush_seconds = max(flush_ms, 0) / 1000
+        self._inserts: List[_Insert] = []
+        # 会话 id -> (最新 updated_at, 等待该次刷新的 future)
+        self._touches: Dict[int, Tuple[datetime, List["asyncio.Future[None]"]]] = {}
+        self._slots = asyncio.Semaphore(max(max_pending, 1))
+        self._wakeup = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    @property
+    def pending(self) -> int:
+        return len(self._inserts) + sum(len(f) for _, f in self._touches.values())
+
+    def _ensure_task(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="db-write-behind")
+
+    async def insert_message(self, values: Dict[str, Any]) -> int:
+        """排队插入一条消息，提交后返回消息 id。"""
+        future: "asyncio.Future[int]" = asyncio.get_running_loop().create_future()
+        if self._closing:
+            await self._flush([(values, future)], {})
+            return future.result()
+        async with self._slots:
+            self._inserts.append((values, future))
+            self._notify()
+            return await future
+
+    async def touch_conversation(self, conversation_id: int, updated_at: datetime) -> None:
+        """排队刷新会话 updated_at，提交后返回。"""
+        future: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        if self._closing:
+            await self._flush([], {conversation_id: (updated_at, [future])})
+            return future.result()
+        async with self._slots:
+            latest, futures = self._touches.get(conversation_id, (updated_at, []))
+            futures.append(future)
+            self._touches[conversation_id] = (max(latest, updated_at), futures)
+            self._notify()
+            return await future
+
+    def _notify(self) -> None:
+        self._ensure_task()
+        self._wakeup.set()
+        if self.pending >= self.batch_rows:
+            self._full.set()
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            if not self._closing and self.pending < self.batch_rows and self.flush_seconds:
+                # 攒批窗口：到时或攒满即提交
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.flush_seconds)
+                except asyncio.TimeoutError:
+                    pass
+            self._wakeup.clear()
+            self._full.clear()
+            inserts, self._inserts = self._inserts[: self.batch_rows], self._inserts[self.batch_rows :]
+            touches, self._touches = self._touches, {}
+            if inserts or touches:
+                await self._flush(inserts, touches)
+            if self._inserts or self._touches:
+                self._wakeup.set()
+            elif self._closing:
+                return
+
+    async def _flush(
+        self,
+        inserts: List[_Insert],
+        touches: Dict[int, Tuple[datetime, List["asyncio.Future[None]"]]],
+    ) -> None:
+        rows = len(inserts) + len(touches)
+        try:
+            with span("db.write_behind.flush", rows=rows):
+                ids = await self._commit([v for v, _ in inserts], {cid: ts for cid, (ts, _) in touches.items()})
+        except Exception as exc:  # noqa: BLE001
+            WRITE_COMMITS_TOTAL.inc(status="error")
+            if rows > 1:
+                logger.warning(f"Write-behind batch of {rows} rows failed, retrying row by row: {exc}")
+                for item in inserts:
+                    await self._flush([item], {})
+                for cid, entry in touches.items():
+                    await self._flush([], {cid: entry})
+                return
+            logger.error(f"Write-behind write failed: {exc}", exc_info=True)
+            for _, future in inserts:
+                if not future.done():
+                    future.set_exception(exc)
+            for _, futures in touches.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(exc)
+            return
+        WRITE_COMMITS_TOTAL.inc(status="ok")
+        WRITE_BATCH_ROWS.observe(rows)
+        for (_, future), obj_id in zip(inserts, ids):
+            if not future.done():
+                future.set_result(obj_id)
+        for _, futures in touches.values():
+            for future in futures:
+                if not future.done():
+                    future.set_result(None)
+
+    async def _commit(self, inserts: List[Dict[str, Any]], touches: Dict[int, datetime]) -> List[int]:
+        async with self.session_factory() as db:
+            objs = [Message(**values) for values in inserts]
+            db.add_all(objs)
+            if touches:
+                # 按主键批量 UPDATE（executemany）
+                await db.execute(
+                    update(Conversation),
+                    [{"id": cid, "updated_at": ts} for cid, ts in touches.items()],
+                )
+            await db.flush()
+            ids = [obj.id for obj in objs]
+            await db.commit()
+            return ids
+
+    async def shutdown(self, timeout: float = 30) -> None:
+        """停止接收新的排队写入，等待队列写完。"""
+        self._closing = True
+        if self._task is None:
+            return
+        self._wakeup.set()
+        self._full.set()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Write-behind queue did not drain within {timeout}s, pending={self.pending}")
+
+
+# 全局写入队列实例
+_queue: Optional[WriteBehindQueue] = None
+
+
+def get_write_queue() -> WriteBehindQueue:
+    """获取消息写入队列实例（单例模式）"""
+    global _queue
+    if _queue is None:
+        _queue = WriteBehindQueue(
+            AsyncSessionLocal,
+            batch_rows=settings.DB_WRITE_BATCH_ROWS,
+            flush_ms=settings.DB_WRITE_FLUSH_MS,
+            max_pending=settings.DB_WRITE_MAX_PENDING,
+        )
+    return _queue
+
+
+metrics.gauge("db_write_behind_pending", "写入队列中等待提交的条数").set_function(
+    lambda: _queue.pending if _queue is not None else 0
+)
@@ -0,0 +1,50 @@
+"""
+文本压缩：安装了 zstandard 时使用 zstd，否则回退到标准库 gzip
+压缩结果带编码标识（codec）一并保存，读取时按标识解压，两种编码的数据可以共存。
+"""
+
+import gzip
+import importlib.util
+from typing import Tuple
+
+from src.config import settings
+
+CODEC_ZSTD = "zstd"
+CODEC_GZIP = "gzip"
+CODEC_NONE = "none"
+
+_HAS_ZSTD = importlib.util.find_spec("zstandard") is not None
+
+
+def default_codec() -> str:
+    configured = settings.FILE_COMPRESSION
+    if configured == CODEC_ZSTD and not _HAS_ZSTD:
+        return CODEC_GZIP
+    if configured in (CODEC_ZSTD, CODEC_GZIP, CODEC_NONE):
+        return configured
+    return CODEC_ZSTD if _HAS_ZSTD else CODEC_GZIP
+
+
+def compress(data: bytes, codec: str = "") -> Tuple[str, bytes]:
+    """压缩字节串，返回 (codec, 压缩后数据)。"""
+    codec = codec or default_codec()
+    if codec == CODEC_ZSTD:
+        import zstandard
+
+        return codec, zstandard.ZstdCompressor(level=settings.FILE_COMPRESSION_LEVEL).compress(data)
+    if codec == CODEC_GZIP:
+        # mtime=0：相同输入得到相同输出
+        return codec, gzip.compress(data, compresslevel=min(settings.FILE_COMPRESSION_LEVEL, 9), mtime=0)
+    return CODEC_NONE, data
+
+
+def decompress(codec: str, data: bytes) -> bytes:
+    if codec == CODEC_ZSTD:
+        import zstandard
+
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == CODEC_GZIP:
+        return gzip.decompress(data)
+    if codec == CODEC_NONE:
+        return data
+    raise ValueError(f"unknown codec: {codec}")
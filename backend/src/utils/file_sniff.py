@@ -0,0 +1,206 @@
+"""
+根据文件头（magic bytes）识别文件类型
+扩展名只作为无法判定时的提示：改了扩展名的 .doc、实为 xlsx 的 .xls 等都按真实内容分派。
+"""
+
+import codecs
+import io
+import struct
+import zipfile
+from typing import Dict, List, Set, Tuple
+
+PDF = "application/pdf"
+DOC = "application/msword"
+XLS = "application/vnd.ms-excel"
+PPT = "application/vnd.ms-powerpoint"
+DOCX = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+PPTX = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+CSV = "text/csv"
+TEXT = "text/plain"
+PNG = "image/png"
+JPEG = "image/jpeg"
+GIF = "image/gif"
+BMP = "image/bmp"
+TIFF = "image/tiff"
+WEBP = "image/webp"
+ZIP = "application/zip"
+OLE = "application/x-ole-storage"
+OCTET_STREAM = "application/octet-stream"
+
+IMAGE_TYPES = (PNG, JPEG, GIF, BMP, TIFF, WEBP)
+
+# MIME -> 规范扩展名（用于指标标签与提示文案，基数固定）
+EXTENSIONS: Dict[str, str] = {
+    PDF: "pdf", DOC: "doc", XLS: "xls", PPT: "ppt",
+    DOCX: "docx", XLSX: "xlsx", PPTX: "pptx",
+    CSV: "csv", TEXT: "txt",
+    PNG: "png", JPEG: "jpg", GIF: "gif", BMP: "bmp", TIFF: "tiff", WEBP: "webp",
+    ZIP: "zip", OLE: "ole", OCTET_STREAM: "unknown",
+}
+
+_EXT_HINTS: Dict[str, str] = {ext: mime for mime, ext in EXTENSIONS.items()}
+_EXT_HINTS.update({"jpeg": JPEG, "tif": TIFF, "text": TEXT, "md": TEXT})
+
+_OLE_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+# 根存储下的流名 -> 类型，据此区分 Word / Excel / PowerPoint
+_OLE_STREAMS = (
+    ("WordDocument", DOC),
+    ("Workbook", XLS),
+    ("Book", XLS),
+    ("PowerPoint Document", PPT),
+)
+_OLE_DIR_ENTRY = 128
+_OLE_HEADER_DIFAT = 109
+# 扇区号 >= MAXREGSECT 表示链结束或特殊扇区；目录项引用 NOSTREAM 表示无子节点
+_OLE_MAXREGSECT = 0xFFFFFFFA
+_OLE_NOSTREAM = 0xFFFFFFFF
+# 目录最多读取的扇区数，防止损坏文件的环形链或超长链
+_OLE_MAX_DIR_SECTORS = 256
+# BITMAPCOREHEADER / BITMAPINFOHEADER 及其各版本扩展的长度
+_BMP_DIB_SIZES = (12, 40, 52, 56, 64, 108, 124)
+_OOXML_PARTS = (("word/document.xml", DOCX), ("xl/workbook.xml", XLSX), ("ppt/presentation.xml", PPTX))
+
+
+def _sniff_zip(data: bytes) -> str:
+    try:
+        with zipfile.ZipFile(io.BytesIO(data)) as zf:
+            names = set(zf.namelist())
+    except zipfile.BadZipFile:
+        return OCTET_STREAM
+    for part, mime in _OOXML_PARTS:
+        if part in names:
+            return mime
+    return ZIP
+
+
+def _ole_root_streams(data: bytes) -> Set[str]:
+    """读取复合文档目录，返回根存储下的流名。
+
+    不能在整个文件里搜索 UTF-16 流名：PowerPoint 把含中文的幻灯片文本存为 UTF-16，
+    正文里的 “MacBook” 就会命中 “Book”。
+    """
+    if len(data) < 512:
+        return set()
+    shift, = struct.unpack_from("<H", data, 30)
+    if shift not in (9, 12):
+        return set()
+    size = 1 << shift
+    per_sector = size // 4
+    first_dir, = struct.unpack_from("<I", data, 48)
+    first_difat, = struct.unpack_from("<I", data, 68)
+    difat = struct.unpack_from(f"<{_OLE_HEADER_DIFAT}I", data, 76)
+
+    def sector(sid: int) -> bytes:
+        # 扇区 0 紧跟在文件头之后，文件头占一个扇区
+        return data[(sid + 1) * size:(sid + 2) * size]
+
+    def fat_sector(index: int) -> int:
+        if index < _OLE_HEADER_DIFAT:
+            return difat[index]
+        # 其余 FAT 扇区号在 DIFAT 扇区链中，每个扇区最后 4 字节指向下一个
+        index -= _OLE_HEADER_DIFAT
+        sid = first_difat
+        while index >= per_sector - 1:
+            sid, = struct.unpack_from("<I", sector(sid), size - 4)
+            index -= per_sector - 1
+        return struct.unpack_from("<I", sector(sid), index * 4)[0]
+
+    entries: List[Tuple[str, int, int, int, int]] = []
+    sid, visited = first_dir, 0
+    try:
+        while sid < _OLE_MAXREGSECT and visited < _OLE_MAX_DIR_SECTORS:
+            block = sector(sid)
+            if len(block) < size:
+                break
+            for off in range(0, size, _OLE_DIR_ENTRY):
+                name_len, kind = struct.unpack_from("<HB", block, off + 64)
+                left, right, child = struct.unpack_from("<III", block, off + 68)
+                # 名称长度按字节计，含结尾的 UTF-16 空字符
+                name = block[off:off + max(min(name_len, 64) - 2, 0)].decode("utf-16-le", errors="replace")
+                entries.append((name, kind, left, right, child))
+            sid = struct.unpack_from("<I", sector(fat_sector(sid // per_sector)), (sid % per_sector) * 4)[0]
+            visited += 1
+    except struct.error:
+        # 文件被截断：按已读到的目录项判断
+        pass
+    if not entries:
+        return set()
+
+    # 根存储（0 号目录项）的子节点组织为红黑树，遍历兄弟节点，不进入子存储
+    names: Set[str] = set()
+    pending, seen = [entries[0][4]], set()
+    while pending:
+        index = pending.pop()
+        if index == _OLE_NOSTREAM or index >= len(entries) or index in seen:
+            continue
+        seen.add(index)
+        name, kind, left, right, _ = entries[index]
+        if kind == 2:
+            names.add(name)
+        pending += (left, right)
+    return names
+
+
+def _sniff_ole(data: bytes) -> str:
+    streams = _ole_root_streams(data)
+    for name, mime in _OLE_STREAMS:
+        if name in streams:
+            return mime
+    return OLE
+
+
+def _is_bmp(data: bytes) -> bool:
+    """“BM” 开头的文本很常见，需校验文件头：文件大小、像素数据偏移与 DIB 头长度须自洽。"""
+    if len(data) < 26 or not data.startswith(b"BM"):
+        return False
+    size, offset, dib_size = struct.unpack_from("<I4xII", data, 2)
+    return (
+        dib_size in _BMP_DIB_SIZES
+        and 14 + dib_size <= offset <= len(data)
+        and (size == 0 or offset <= size <= len(data))
+    )
+
+
+def _looks_like_text(head: bytes) -> bool:
+    if b"\x00" in head:
+        return False
+    for encoding in ("utf-8", "gb18030"):
+        try:
+            # 截断处可能切在多字节字符中间：增量解码容忍末尾不完整的字符
+            codecs.getincrementaldecoder(encoding)().decode(head, final=False)
+            return True
+        except UnicodeDecodeError:
+            continue
+    return False
+
+
+def sniff_mime(data: bytes, ext: str = "") -> str:
+    """识别文件 MIME 类型；ext 为不带点的小写扩展名，仅在内容无法判定时参考。"""
+    head = data[:16]
+    if head.startswith(b"%PDF-"):
+        return PDF
+    if head.startswith(b"PK\x03\x04"):
+        return _sniff_zip(data)
+    if head.startswith(_OLE_MAGIC):
+        mime = _sniff_ole(data)
+        return _EXT_HINTS.get(ext, mime) if mime == OLE else mime
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return PNG
+    if head.startswith(b"\xff\xd8\xff"):
+        return JPEG
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return GIF
+    if _is_bmp(data):
+        return BMP
+    if head[:4] in (b"II*\x00", b"MM\x00*"):
+        return TIFF
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return WEBP
+    if _looks_like_text(data[:8192]):
+        return CSV if ext == "csv" else TEXT
+    return OCTET_STREAM
+
+
+def extension_for(mime: str) -> str:
+    return EXTENSIONS.get(mime, "unknown")
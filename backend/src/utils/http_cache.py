@@ -0,0 +1,41 @@
+"""
+条件请求（ETag / If-None-Match）
+ETag 由轻量的聚合查询结果（更新时间、最大 id、行数）计算，资源未变化时直接返回 304，不加载数据行。
+"""
+
+import hashlib
+from typing import Any
+
+from fastapi import Request, Response
+
+# 浏览器每次使用前都向服务端校验，校验通过时复用本地缓存
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts: Any) -> str:
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def _opaque(tag: str) -> str:
+    # 弱比较：忽略 W/ 前缀（压缩中间件可能改变响应体，但语义不变）
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return _opaque(etag) in {_opaque(t) for t in header.split(",")}
+
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def set_etag(response: Response, etag: str) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
@@ -1,33 +1,176 @@
+import atexit
+import copy
+import json
 import logging
-import sys
-from logging.handlers import RotatingFileHandler
 import os
+import queue
+import random
+import re
+import sys
+import traceback
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, List, Optional, Tuple
+
+from src.config import settings
+from src.utils import metrics
 
 # 确保 logs 目录存在
 LOG_DIR = "logs"
 if not os.path.exists(LOG_DIR):
     os.makedirs(LOG_DIR)
 
+TEXT_FORMAT = "[%(asctime)s] %(levelname)s in %(module)s.%(funcName)s:%(lineno)d: %(message)s"
+
+LOG_RECORDS_DROPPED = metrics.counter(
+    "log_records_dropped_total", "日志队列已满时被丢弃的记录数"
+)
+LOG_RECORDS_SAMPLED_OUT = metrics.counter(
+    "log_records_sampled_out_total", "被采样过滤掉的日志记录数", ("logger",)
+)
+
+# 脱敏规则：密钥/令牌，以及 SQL 或日志中内联的长向量字面量
+_REDACTIONS: List[Tuple[re.Pattern, str]] = [
+    (re.compile(r"\b(sk-)[A-Za-z0-9_\-]{8,}"), r"\1***"),
+    (re.compile(r"(?i)(api[_-]?key[\"']?\s*[:=]\s*[\"']?)[^\s\"',}]+"), r"\1***"),
+    (re.compile(r"(?i)(bearer\s+)[A-Za-z0-9._\-]+"), r"\1***"),
+    (re.compile(r"\[(-?\d+(?:\.\d+)?(?:e-?\d+)?,\s*){16,}-?\d+(?:\.\d+)?(?:e-?\d+)?\]"), "[vector]"),
+]
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional["NonBlockingQueueHandler"] = None
+
+
+def redact(text: str) -> str:
+    """脱敏并折叠长向量字面量，供调用方在截断前预处理大段文本（如 SQL）。"""
+    for pattern, repl in _REDACTIONS:
+        text = pattern.sub(repl, text)
+    return text
+
+
+def _parse_sampling(spec: str) -> Dict[str, float]:
+    """解析 'src.routers.moi=0.1,src.services.matrixone_client=0.2' 形式的采样配置。"""
+    rates: Dict[str, float] = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        name, _, rate = item.partition("=")
+        try:
+            rates[name.strip()] = min(max(float(rate), 0.0), 1.0)
+        except ValueError:
+            continue
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """按 logger 名称前缀对 WARNING 以下级别的记录采样，错误日志始终保留。"""
+
+    def __init__(self, rates: Dict[str, float]) -> None:
+        super().__init__()
+        # 前缀越长越优先匹配
+        self.rates = sorted(rates.items(), key=lambda kv: len(kv[0]), reverse=True)
+        self._cache: Dict[str, float] = {}
+
+    def _rate(self, name: str) -> float:
+        rate = self._cache.get(name)
+        if rate is None:
+            rate = 1.0
+            for prefix, value in self.rates:
+                if name == prefix or name.startswith(prefix + "."):
+                    rate = value
+                    break
+            self._cache[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        LOG_RECORDS_SAMPLED_OUT.inc(logger=record.name)
+        return False
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """在调用线程只做消息合并、截断与脱敏，格式化与磁盘 I/O 交给监听线程。
+
+    队列满时直接丢弃并计数，绝不阻塞事件循环。监听线程停止后改为在调用线程直接写出，退出阶段的日志不会丢失。
+    """
+
+    def __init__(self, log_queue: queue.Queue, max_chars: int) -> None:
+        super().__init__(log_queue)
+        self.max_chars = max_chars
+        self.direct: Optional[Tuple[logging.Handler, ...]] = None
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 与标准库一致先复制：同一条记录之后的处理器仍拿到原始消息与异常信息
+        record = copy.copy(record)
+        msg = redact(record.getMessage())
+        if self.max_chars and len(msg) > self.max_chars:
+            msg = f"{msg[: self.max_chars]}...[truncated {len(msg) - self.max_chars} chars]"
+        if record.exc_info and not record.exc_text:
+            record.exc_text = "".join(traceback.format_exception(*record.exc_info))
+        record.msg = msg
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self.direct is not None:
+            for handler in self.direct:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+class JsonFormatter(logging.Formatter):
+    """每条记录输出一行 JSON，便于日志平台解析。"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "func": f"{record.module}.{record.funcName}:{record.lineno}",
+            "msg": record.getMessage(),
+        }
+        if record.exc_text:
+            payload["exc"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False)
+
+
+def _build_formatter() -> logging.Formatter:
+    if settings.LOG_FORMAT == "json":
+        return JsonFormatter()
+    return logging.Formatter(TEXT_FORMAT)
+
+
 def setup_logging():
-    """配置根 Logger，使其对所有模块生效"""
+    """配置根 Logger，使其对所有模块生效
+
+    根 Logger 只挂一个非阻塞的 QueueHandler，控制台与文件输出由后台 QueueListener 线程完成。
+    """
+    global _listener, _queue_handler
     logger = logging.getLogger()
-    
+
     # 避免重复配置
     if logger.handlers:
         return
-        
-    logger.setLevel(logging.INFO)
-    
-    formatter = logging.Formatter(
-        "[%(asctime)s] %(levelname)s in %(module)s.%(funcName)s:%(lineno)d: %(message)s"
-    )
-    
+
+    logger.setLevel(settings.LOG_LEVEL)
+
+    formatter = _build_formatter()
+
     # 控制台输出
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-    
-    # 文件输出 (每天轮转，保留 7 天)
+
+    # 文件输出 (单文件 10MB 轮转，保留 7 个)
     file_handler = RotatingFileHandler(
         os.path.join(LOG_DIR, "backend.log"),
         maxBytes=10*1024*1024,  # 10MB
@@ -35,4 +178,27 @@ def setup_logging():
         encoding="utf-8"
     )
     file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+
+    log_queue: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    queue_handler = NonBlockingQueueHandler(log_queue, settings.LOG_MAX_MESSAGE_CHARS)
+    rates = _parse_sampling(settings.LOG_SAMPLING)
+    if rates:
+        queue_handler.addFilter(SamplingFilter(rates))
+    logger.addHandler(queue_handler)
+    _queue_handler = queue_handler
+
+    _listener = QueueListener(
+        log_queue, console_handler, file_handler, respect_handler_level=True
+    )
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """停止监听线程并刷出队列中剩余的日志，之后的日志由 QueueHandler 直接写出。"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        if _queue_handler is not None:
+            _queue_handler.direct = _listener.handlers
+        _listener = None
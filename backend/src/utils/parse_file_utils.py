@@ -1,56 +1,148 @@
+"""
+文件解析：按文件头识别出的 MIME 类型分派到各格式的解析函数，扩展名只作为无法判定时的提示。
+
+- pandas / pypdf / python-docx / python-pptx 的导入耗时合计约 0.7s，各依赖在解析函数内部导入；
+- 解析默认在独立子进程池中执行（见 parser_sandbox），受超时与内存上限约束；
+- 旧版 .doc/.xls/.ppt 通过本机 LibreOffice（soffice）转换为 OOXML 后复用对应解析函数；
+- 图片与扫描版 PDF 在安装了 tesseract 与 pytesseract 时做本地 OCR。
+"""
+
+import asyncio
+import hashlib
+import importlib
+import importlib.util
 import io
 import logging
-import pandas as pd
-from typing import Dict, Any, List
+import os
+import shutil
+import signal
+import subprocess
+import tempfile
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Tuple
 from fastapi import UploadFile
-import pypdf
-import docx
-import pptx
-import zipfile
-import re
+import time
+
+from src.config import settings
+from src.utils import file_sniff, metrics, table_extract
+from src.utils.parser_sandbox import get_parser_sandbox
+from src.utils.tracing import span
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 logger = logging.getLogger(__name__)
 
+PARSE_SECONDS = metrics.histogram(
+    "file_parse_duration_seconds", "文件解析耗时", ("ext",)
+)
+PARSE_BYTES_TOTAL = metrics.counter("file_parse_bytes_total", "解析的文件字节数", ("ext",))
+PARSE_ERRORS_TOTAL = metrics.counter("file_parse_errors_total", "文件解析失败次数", ("ext",))
+
+ParserFunc = Callable[[io.BytesIO, str], str]
+
+# MIME 类型 -> 解析函数；MIME 类型 -> 该解析函数依赖的第三方模块（供预热使用）
+_PARSERS: Dict[str, ParserFunc] = {}
+_PARSER_MODULES: Dict[str, Tuple[str, ...]] = {}
+
+
+def register_parser(mimes: Tuple[str, ...], modules: Tuple[str, ...] = ()) -> Callable[[ParserFunc], ParserFunc]:
+    """注册格式解析函数（签名为 (file_obj, ext) -> str，ext 为该 MIME 的规范扩展名）。
+
+    解析函数可能在子进程中执行，须为模块级函数；依赖模块应在函数内部导入。
+    """
+
+    def decorator(fn: ParserFunc) -> ParserFunc:
+        for mime in mimes:
+            _PARSERS[mime] = fn
+            _PARSER_MODULES[mime] = modules
+        return fn
+
+    return decorator
+
+
+def supported_extensions() -> List[str]:
+    return sorted({file_sniff.extension_for(mime) for mime in _PARSERS})
+
+
+def _parser_modules() -> Tuple[str, ...]:
+    return tuple(sorted({m for mods in _PARSER_MODULES.values() for m in mods}))
+
+
+def prewarm_parsers() -> None:
+    """预先导入全部解析依赖（沙箱模式下拉起解析子进程），阻塞调用，应放在线程中执行。"""
+    start = time.perf_counter()
+    modules = _parser_modules()
+    if settings.PARSER_SANDBOX:
+        get_parser_sandbox(modules).warm()
+    else:
+        for name in modules:
+            try:
+                importlib.import_module(name)
+            except ImportError as exc:
+                logger.warning(f"Prewarm import of {name} failed: {exc}")
+    logger.info(f"Parser modules prewarmed in {time.perf_counter() - start:.2f}s: {list(modules)}")
+
+
+def shutdown_parsers() -> None:
+    if settings.PARSER_SANDBOX:
+        get_parser_sandbox().shutdown()
+
+
+def _parse_bytes(mime: str, data: bytes) -> Tuple[str, List[table_extract.Table]]:
+    """解析入口（在沙箱子进程或线程中执行），返回正文与抽取出的表格。"""
+    content = _PARSERS[mime](io.BytesIO(data), file_sniff.extension_for(mime))
+    return content, table_extract.extract_tables(mime, data)
+
+
+async def _run_parser(mime: str, data: bytes) -> Tuple[str, List[table_extract.Table]]:
+    if not settings.PARSER_SANDBOX:
+        return await asyncio.to_thread(_parse_bytes, mime, data)
+    sandbox = get_parser_sandbox(_parser_modules())
+    try:
+        return await sandbox.run(_parse_bytes, mime, data, timeout=settings.PARSER_TIMEOUT_SECONDS)
+    except MemoryError:
+        raise Exception(f"解析所需内存超出上限（{settings.PARSER_MEMORY_MB}MB），文件可能过大") from None
+
+
 async def parse_file_content(file: UploadFile) -> Dict[str, Any]:
     """
     解析上传文件内容，返回标准化格式
     """
     filename = file.filename or "unknown"
     ext = filename.split('.')[-1].lower() if '.' in filename else ""
+    kind = "unknown"
+    file_id = ""
     content = ""
+    tables: List[table_extract.Table] = []
     error = None
+    start = time.perf_counter()
 
     try:
         # 读取文件内容
         file_bytes = await file.read()
-        file_obj = io.BytesIO(file_bytes)
-        logger.info(f"Parsing file {filename} with extension {ext}")
-        match ext:
-            case 'xlsx' | 'xls' | 'csv':
-                content = _parse_excel(file_obj, ext)
-            case 'pdf':
-                content = _parse_pdf(file_obj)
-            case 'docx':
-                content = _parse_word(file_obj)
-            case 'doc':
-                content = "[注意: .doc 是旧版 Word 格式，建议转换为 .docx 后重新上传以获得更好的解析效果]"
-                content += _parse_word(file_obj)
-            case 'txt':
-                content = file_bytes.decode('utf-8', errors='ignore')
-            case 'pptx':
-                content = _parse_pptx(file_obj)
-            case 'ppt':
-                content = "[注意: .ppt 是旧版 PowerPoint 格式，建议转换为 .pptx 后重新上传以获得更好的解析效果]"
-            case _:
-                logger.warning(f"Unsupported file format: {ext} for file {filename}")
-                content = f"[不支持的文件格式: {ext}]"
+        # 按内容哈希标识文件，同一文件重复上传复用已抽取的表格
+        file_id = hashlib.sha256(file_bytes).hexdigest()[:32]
+        mime = file_sniff.sniff_mime(file_bytes, ext)
+        # 指标标签使用识别出的规范扩展名，避免任意文件名扩展名造成标签膨胀
+        kind = file_sniff.extension_for(mime)
+        PARSE_BYTES_TOTAL.inc(len(file_bytes), ext=kind)
+        logger.info(f"Parsing file {filename} with extension {ext}, detected {mime}")
+        with span(f"parse.{kind}", bytes=len(file_bytes), mime=mime):
+            if mime not in _PARSERS:
+                logger.warning(f"Unsupported file format: {mime} for file {filename}")
+                content = f"[不支持的文件格式: {ext or kind}]"
                 error = "不支持的文件格式"
+            else:
+                content, tables = await _run_parser(mime, file_bytes)
 
     except Exception as e:
         logger.error(f"Error parsing file {filename}: {e}", exc_info=True)
         content = f"[解析失败: {str(e)}]"
         error = str(e)
     finally:
+        PARSE_SECONDS.observe(time.perf_counter() - start, ext=kind)
+        if error:
+            PARSE_ERRORS_TOTAL.inc(ext=kind)
         # 关闭文件
         try:
             await file.close()
@@ -60,18 +152,23 @@ async def parse_file_content(file: UploadFile) -> Dict[str, Any]:
     return {
         "name": filename,
         "type": ext,
+        "file_id": file_id,
         "content": content,
+        "tables": tables,
         "error": error
     }
 
+@register_parser((file_sniff.XLSX, file_sniff.CSV), modules=("pandas", "openpyxl"))
 def _parse_excel(file_obj: io.BytesIO, ext: str) -> str:
+    import pandas as pd
+
     result = []
     try:
         if ext == 'csv':
             df = pd.read_csv(file_obj)
             result.append(_dataframe_to_markdown(df, "Sheet1"))
         else:
-            # xlsx or xls
+            # xlsx；旧版 xls 由 _parse_xls 读取或转换
             excel_file = pd.ExcelFile(file_obj)
             for sheet_name in excel_file.sheet_names:
                 df = pd.read_excel(excel_file, sheet_name=sheet_name)
@@ -82,7 +179,7 @@ def _parse_excel(file_obj: io.BytesIO, ext: str) -> str:
     except Exception as e:
         raise Exception(f"Excel解析错误: {str(e)}")
 
-def _dataframe_to_markdown(df: pd.DataFrame, title: str) -> str:
+def _dataframe_to_markdown(df: "pd.DataFrame", title: str) -> str:
     if df.empty:
         return ""
     
@@ -96,7 +193,10 @@ def _dataframe_to_markdown(df: pd.DataFrame, title: str) -> str:
     
     return markdown
 
-def _parse_pdf(file_obj: io.BytesIO) -> str:
+@register_parser((file_sniff.PDF,), modules=("pypdf",))
+def _parse_pdf(file_obj: io.BytesIO, ext: str = "pdf") -> str:
+    import pypdf
+
     try:
         reader = pypdf.PdfReader(file_obj)
         text_parts = []
@@ -112,11 +212,16 @@ def _parse_pdf(file_obj: io.BytesIO) -> str:
             text_parts.append(f"\n... 共 {len(reader.pages)} 页，仅解析前 {max_pages} 页")
             
         content = "\n\n".join(text_parts)
+        if not content.strip() and _ocr_available():
+            content = _ocr_pdf(reader)
         return content if content.strip() else "[PDF 文件为空或为扫描件（无可提取文本）]"
     except Exception as e:
         raise Exception(f"PDF解析错误: {str(e)}")
 
-def _parse_word(file_obj: io.BytesIO) -> str:
+@register_parser((file_sniff.DOCX,), modules=("docx",))
+def _parse_word(file_obj: io.BytesIO, ext: str = "docx") -> str:
+    import docx
+
     try:
         doc = docx.Document(file_obj)
         full_text = []
@@ -135,7 +240,10 @@ def _parse_word(file_obj: io.BytesIO) -> str:
     except Exception as e:
         raise Exception(f"Word解析错误: {str(e)}")
 
-def _parse_pptx(file_obj: io.BytesIO) -> str:
+@register_parser((file_sniff.PPTX,), modules=("pptx",))
+def _parse_pptx(file_obj: io.BytesIO, ext: str = "pptx") -> str:
+    import pptx
+
     try:
         prs = pptx.Presentation(file_obj)
         text_parts = []
@@ -154,3 +262,123 @@ def _parse_pptx(file_obj: io.BytesIO) -> str:
         return content if content.strip() else "[PPTX 文件未能提取到文本内容。该文件可能主要包含图片或图表。]"
     except Exception as e:
         raise Exception(f"PPTX解析错误: {str(e)}")
+
+
+
+def _lift_memory_limit() -> None:
+    # 转换进程不受解析子进程的软内存上限约束（soffice 启动即保留大量虚拟地址空间），由超时兜底
+    import resource
+
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    resource.setrlimit(resource.RLIMIT_AS, (hard, hard))
+
+
+def _convert_office(data: bytes, src_ext: str, target_ext: str) -> bytes:
+    """用本机 LibreOffice 把旧版 Office 文件转换为 OOXML 格式。"""
+    binary = shutil.which(settings.SOFFICE_PATH)
+    if binary is None:
+        raise Exception(
+            f"未安装 LibreOffice，无法转换旧版 .{src_ext} 文件，请另存为 .{target_ext} 后重新上传"
+        )
+    with tempfile.TemporaryDirectory(prefix="parse-") as tmp:
+        src = os.path.join(tmp, f"input.{src_ext}")
+        with open(src, "wb") as fh:
+            fh.write(data)
+        cmd = [
+            binary, "--headless", "--norestore",
+            # 独立的用户配置目录：并发转换共用默认配置目录会因锁冲突失败
+            f"-env:UserInstallation=file://{tmp}/profile",
+            "--convert-to", target_ext, "--outdir", tmp, src,
+        ]
+        proc = subprocess.Popen(
+            cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+            start_new_session=True, preexec_fn=_lift_memory_limit,
+        )
+        try:
+            _, stderr = proc.communicate(timeout=settings.PARSER_TIMEOUT_SECONDS)
+        except subprocess.TimeoutExpired:
+            # soffice 会再拉起 soffice.bin，按进程组整体终止
+            os.killpg(proc.pid, signal.SIGKILL)
+            proc.wait()
+            raise Exception(f".{src_ext} 转换超时")
+        output = os.path.join(tmp, f"input.{target_ext}")
+        if proc.returncode != 0 or not os.path.exists(output):
+            detail = stderr.decode("utf-8", errors="ignore").strip()[:200]
+            raise Exception(f".{src_ext} 转换失败: {detail or proc.returncode}")
+        with open(output, "rb") as fh:
+            return fh.read()
+
+
+@register_parser((file_sniff.DOC,), modules=("docx",))
+def _parse_doc(file_obj: io.BytesIO, ext: str = "doc") -> str:
+    return _parse_word(io.BytesIO(_convert_office(file_obj.getvalue(), "doc", "docx")))
+
+
+@register_parser((file_sniff.XLS,), modules=("pandas", "openpyxl"))
+def _parse_xls(file_obj: io.BytesIO, ext: str = "xls") -> str:
+    if importlib.util.find_spec("xlrd") is None:
+        return _parse_excel(io.BytesIO(_convert_office(file_obj.getvalue(), "xls", "xlsx")), "xlsx")
+    import pandas as pd
+
+    try:
+        sheets = pd.read_excel(file_obj, sheet_name=None, engine="xlrd")
+        content = "\n\n".join(_dataframe_to_markdown(df, name) for name, df in sheets.items())
+        return content if content.strip() else "[Excel 文件为空或无法读取内容]"
+    except Exception as e:
+        raise Exception(f"Excel解析错误: {str(e)}")
+
+
+@register_parser((file_sniff.PPT,), modules=("pptx",))
+def _parse_ppt(file_obj: io.BytesIO, ext: str = "ppt") -> str:
+    return _parse_pptx(io.BytesIO(_convert_office(file_obj.getvalue(), "ppt", "pptx")))
+
+
+def _ocr_available() -> bool:
+    if settings.PARSER_OCR == "off":
+        return False
+    return importlib.util.find_spec("pytesseract") is not None and shutil.which("tesseract") is not None
+
+
+def _ocr_image(data: bytes) -> str:
+    import pytesseract
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        return pytesseract.image_to_string(
+            image, lang=settings.PARSER_OCR_LANG, timeout=settings.PARSER_TIMEOUT_SECONDS
+        )
+
+
+def _ocr_pdf(reader: Any) -> str:
+    """识别扫描版 PDF 每页内嵌的图片（扫描件通常每页一张整页图片）。"""
+    text_parts = []
+    max_pages = min(len(reader.pages), settings.PARSER_OCR_MAX_PAGES)
+    for i in range(max_pages):
+        texts = [_ocr_image(image.data) for image in reader.pages[i].images]
+        text = "\n".join(t.strip() for t in texts if t.strip())
+        if text:
+            text_parts.append(f"【第 {i+1} 页（OCR）】\n{text}")
+    if text_parts and len(reader.pages) > max_pages:
+        text_parts.append(f"\n... 共 {len(reader.pages)} 页，仅识别前 {max_pages} 页")
+    return "\n\n".join(text_parts)
+
+
+@register_parser(file_sniff.IMAGE_TYPES, modules=("PIL",))
+def _parse_image(file_obj: io.BytesIO, ext: str) -> str:
+    if not _ocr_available():
+        return "[图片文件：未启用 OCR（需安装 tesseract 与 pytesseract），无法提取文字]"
+    try:
+        text = _ocr_image(file_obj.getvalue())
+    except Exception as e:
+        raise Exception(f"OCR识别错误: {str(e)}")
+    return text if text.strip() else "[图片中未识别到文字]"
+
+
+@register_parser((file_sniff.TEXT,))
+def _parse_txt(file_obj: io.BytesIO, ext: str) -> str:
+    data = file_obj.getvalue()
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        # 国内 Windows 环境导出的文本常见 GBK 编码
+        return data.decode('gb18030', errors='ignore')
@@ -0,0 +1,146 @@
+"""
+文件解析沙箱：在独立子进程池中执行解析函数，畸形或超大文件不会拖垮 API worker
+- 子进程以 spawn 方式启动，不继承 API worker 的事件循环、连接池与日志线程；
+- 子进程设置 RLIMIT_AS 内存上限，超限时解析函数内抛出 MemoryError；
+- 单次解析超时或子进程崩溃（段错误、被 OOM killer 杀死）时整体回收进程池并重建；
+- 子进程处理 max_tasks 个文件后退出重建，回收解析大文件留下的内存碎片。
+"""
+
+import asyncio
+import importlib
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional, Tuple
+
+from src.config import settings
+from src.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+SANDBOX_EVENTS_TOTAL = metrics.counter(
+    "file_parse_sandbox_events_total", "解析子进程事件（timeout/crash/restart）", ("event",)
+)
+
+
+class ParserTimeout(Exception):
+    """解析超过时限，子进程已被终止。"""
+
+
+class ParserCrashed(Exception):
+    """解析子进程异常退出（崩溃或被系统杀死）。"""
+
+
+def _init_worker(memory_mb: int, modules: Tuple[str, ...]) -> None:
+    if memory_mb > 0:
+        import resource
+
+        # 只收紧软限制：解析函数拉起的转换进程（soffice）可在 preexec 中恢复到硬限制
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        limit = memory_mb * 1024 * 1024
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    # 启动时导入解析依赖，首个文件不再承担导入耗时
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+
+
+def _ping() -> bool:
+    return True
+
+
+class ParserSandbox:
+    def __init__(self, workers: int, memory_mb: int, max_tasks: int, modules: Tuple[str, ...] = ()):
+        self.workers = max(workers, 1)
+        self.memory_mb = memory_mb
+        self.max_tasks = max_tasks
+        self.modules = modules
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._generation = 0
+        # 同时提交的任务不超过子进程数，排队发生在事件循环侧，超时只计算实际解析时间
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def _get_pool(self) -> Tuple[ProcessPoolExecutor, int]:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.memory_mb, self.modules),
+                    max_tasks_per_child=self.max_tasks or None,
+                )
+                self._generation += 1
+            return self._pool, self._generation
+
+    def _recycle(self, generation: int) -> None:
+        """终止并丢弃指定代的进程池；已被其他调用回收时不重复处理。"""
+        with self._lock:
+            if self._pool is None or generation != self._generation:
+                return
+            pool, self._pool = self._pool, None
+        for proc in list((pool._processes or {}).values()):
+            proc.kill()
+        pool.shutdown(wait=False, cancel_futures=True)
+        SANDBOX_EVENTS_TOTAL.inc(event="restart")
+        logger.warning("Parser process pool recycled")
+
+    async def run(self, fn: Callable[..., Any], *args: Any, timeout: float) -> Any:
+        """在子进程中执行 fn(*args)；fn 与参数须可 pickle。
+
+        回收进程池会连带中断同池中其他进行中的解析，这些调用会在新进程池中重试一次。
+        """
+        loop = asyncio.get_running_loop()
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        async with self._slots:
+            for attempt in range(2):
+                pool, generation = self._get_pool()
+                try:
+                    return await asyncio.wait_for(loop.run_in_executor(pool, fn, *args), timeout)
+                except asyncio.TimeoutError:
+                    SANDBOX_EVENTS_TOTAL.inc(event="timeout")
+                    self._recycle(generation)
+                    raise ParserTimeout(f"解析超时（超过 {timeout:g}s）") from None
+                except BrokenProcessPool:
+                    self._recycle(generation)
+                    if attempt:
+                        SANDBOX_EVENTS_TOTAL.inc(event="crash")
+                        raise ParserCrashed("解析进程异常退出，文件可能已损坏或过大") from None
+        raise AssertionError("unreachable")
+
+    def warm(self) -> None:
+        """拉起全部子进程并完成依赖导入（阻塞调用，应放在线程中执行）。"""
+        pool, _ = self._get_pool()
+        for future in [pool.submit(_ping) for _ in range(self.workers)]:
+            future.result()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+# 全局沙箱实例
+_sandbox: Optional[ParserSandbox] = None
+
+
+def get_parser_sandbox(modules: Tuple[str, ...] = ()) -> ParserSandbox:
+    """获取解析沙箱实例（单例模式），modules 为子进程启动时预先导入的依赖。"""
+    global _sandbox
+    if _sandbox is None:
+        _sandbox = ParserSandbox(
+            workers=settings.PARSER_WORKERS,
+            memory_mb=settings.PARSER_MEMORY_MB,
+            max_tasks=settings.PARSER_MAX_TASKS_PER_WORKER,
+            modules=modules,
+        )
+    return _sandbox
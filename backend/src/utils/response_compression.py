@@ -0,0 +1,190 @@
+"""
+响应压缩中间件（纯 ASGI）
+- 按 Accept-Encoding 协商：安装了 brotli 且客户端接受时用 br，否则 gzip；
+- 只压缩 JSON / 文本类响应，小于 RESPONSE_COMPRESSION_MIN_BYTES 的单块响应原样发送；
+- text/event-stream（对话 SSE）与已带 Content-Encoding 的响应直接透传，不做任何缓冲。
+"""
+
+import gzip
+import importlib.util
+import zlib
+from typing import List, Optional, Tuple
+
+from src.config import settings
+from src.utils import metrics
+
+RESPONSE_BYTES_TOTAL = metrics.counter(
+    "http_response_compression_bytes_total",
+    "压缩中间件处理的响应字节数（stage=raw/encoded）",
+    ("encoding", "stage"),
+)
+
+_HAS_BROTLI = importlib.util.find_spec("brotli") is not None
+
+_COMPRESSIBLE = (
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "text/",
+)
+
+
+def _accepted(header: str) -> dict:
+    """解析 Accept-Encoding，返回 {编码: q 值}。"""
+    accepted = {}
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    return accepted
+
+
+def choose_encoding(header: str) -> Optional[str]:
+    accepted = _accepted(header)
+    wildcard = accepted.get("*", 0.0)
+    if _HAS_BROTLI and accepted.get("br", wildcard) > 0:
+        return "br"
+    if accepted.get("gzip", wildcard) > 0:
+        return "gzip"
+    return None
+
+
+class _Encoder:
+    """流式编码器：gzip 使用 zlib（wbits=31 输出 gzip 格式），br 使用 brotli.Compressor。"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            import brotli
+
+            self._br = brotli.Compressor(quality=settings.RESPONSE_BROTLI_QUALITY)
+        else:
+            self._gz = zlib.compressobj(settings.RESPONSE_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._br.process(data) + self._br.flush()
+        return self._gz.compress(data) + self._gz.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._br.finish()
+        return self._gz.flush(zlib.Z_FINISH)
+
+
+def compress_body(encoding: str, body: bytes) -> bytes:
+    if encoding == "br":
+        import brotli
+
+        return brotli.compress(body, quality=settings.RESPONSE_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=settings.RESPONSE_GZIP_LEVEL, mtime=0)
+
+
+def _should_compress(headers: List[Tuple[bytes, bytes]], status: int) -> bool:
+    if status < 200 or status in (204, 304):
+        return False
+    content_type = b""
+    for name, value in headers:
+        lname = name.lower()
+        if lname == b"content-encoding":
+            return False
+        if lname == b"content-type":
+            content_type = value.lower()
+    ctype = content_type.decode("latin-1")
+    if ctype.startswith("text/event-stream"):
+        return False
+    return ctype.startswith(_COMPRESSIBLE)
+
+
+def _with_vary(headers: List[Tuple[bytes, bytes]]) -> List[Tuple[bytes, bytes]]:
+    for i, (name, value) in enumerate(headers):
+        if name.lower() == b"vary":
+            if b"accept-encoding" not in value.lower():
+                headers[i] = (name, value + b", Accept-Encoding")
+            return headers
+    headers.append((b"vary", b"Accept-Encoding"))
+    return headers
+
+
+class CompressionMiddleware:
+    """按 Accept-Encoding 压缩响应体的 ASGI 中间件。"""
+
+    def __init__(self, app, minimum_size: int = 1024) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = choose_encoding(accept) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        encoder: Optional[_Encoder] = None
+        passthrough = False
+
+        async def send_wrapper(message) -> None:
+            nonlocal start_message, encoder, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                if _should_compress(headers, message["status"]):
+                    # 等首个响应体到达后再决定是否压缩
+                    start_message = {**message, "headers": _with_vary(headers)}
+                else:
+                    passthrough = True
+                    await send(message)
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if encoder is None:
+                headers = [(k, v) for k, v in start_message["headers"] if k.lower() != b"content-length"]
+                if not more_body:
+                    # 单块响应：一次性压缩并给出准确的 Content-Length
+                    if len(body) < self.minimum_size:
+                        passthrough = True
+                        await send(start_message)
+                        await send(message)
+                        return
+                    encoded = compress_body(encoding, body)
+                    RESPONSE_BYTES_TOTAL.inc(len(body), encoding=encoding, stage="raw")
+                    RESPONSE_BYTES_TOTAL.inc(len(encoded), encoding=encoding, stage="encoded")
+                    headers += [(b"content-encoding", encoding.encode()), (b"content-length", str(len(encoded)).encode())]
+                    await send({**start_message, "headers": headers})
+                    await send({"type": "http.response.body", "body": encoded})
+                    return
+                # 分块响应：流式压缩，每块 flush 以免下游等待
+                encoder = _Encoder(encoding)
+                headers.append((b"content-encoding", encoding.encode()))
+                await send({**start_message, "headers": headers})
+            chunk = encoder.compress(body) if body else b""
+            if not more_body:
+                chunk += encoder.finish()
+            RESPONSE_BYTES_TOTAL.inc(len(body), encoding=encoding, stage="raw")
+            RESPONSE_BYTES_TOTAL.inc(len(chunk), encoding=encoding, stage="encoded")
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,78 @@
+"""
+生产启动参数推导
+- 按 cgroup CPU 配额（v2 cpu.max / v1 cfs_quota）与 CPU 亲和性计算可用核数，推导 worker 数；
+- 优先选用 uvloop/httptools，未安装时回退到 asyncio/h11；
+- 数据库连接池按 worker 数均分总预算，避免 pool_size 被 worker 数放大。
+"""
+
+import importlib.util
+import math
+import os
+from typing import Optional
+
+# 自动推导时的 worker 上限：每个 worker 独立持有连接池、回放缓冲与解析内存
+MAX_AUTO_WORKERS = 8
+
+_CGROUP_V2_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+_CGROUP_V1_DIRS = ("/sys/fs/cgroup/cpu", "/sys/fs/cgroup/cpu,cpuacct")
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path, encoding="utf-8") as fh:
+            return fh.read().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_limit() -> Optional[float]:
+    """容器 CPU 配额（核数，可为小数）；未设置配额时返回 None。"""
+    raw = _read(_CGROUP_V2_CPU_MAX)
+    if raw:
+        quota, _, period = raw.partition(" ")
+        if quota != "max" and period:
+            return int(quota) / int(period)
+        return None
+    for directory in _CGROUP_V1_DIRS:
+        quota = _read(os.path.join(directory, "cpu.cfs_quota_us"))
+        period = _read(os.path.join(directory, "cpu.cfs_period_us"))
+        if quota and period and int(quota) > 0:
+            return int(quota) / int(period)
+    return None
+
+
+def available_cpus() -> float:
+    """可用 CPU：亲和性允许的核数与 cgroup 配额取较小值。"""
+    try:
+        cpus: float = len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover - 非 Linux
+        cpus = os.cpu_count() or 1
+    limit = cgroup_cpu_limit()
+    if limit is not None:
+        cpus = min(cpus, limit)
+    return cpus
+
+
+def resolve_workers(configured: int) -> int:
+    """显式配置（WEB_CONCURRENCY>0）优先，WEB_CONCURRENCY=0 时按可用 CPU 向上取整。
+
+    自动推导时即使只有 1 核配额也至少起 2 个 worker：大模型 SDK、JSON 编解码等仍在事件循环内占用 CPU，
+    单个 worker 阻塞时另一个仍能响应 I/O 型请求。文件解析在独立子进程中执行（PARSER_WORKERS）。
+    流的取消与续传、文件检索索引和查询缓存都按进程保存，多 worker 须配合按会话粘滞的路由。
+    """
+    if configured > 0:
+        return configured
+    return min(max(math.ceil(available_cpus()), 2), MAX_AUTO_WORKERS)
+
+
+def pick_loop() -> str:
+    return "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+
+
+def pick_http() -> str:
+    return "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+
+def per_worker(total: int, workers: int, minimum: int = 1) -> int:
+    """把全局预算（如连接池总连接数）均分到每个 worker。"""
+    return max(math.ceil(total / max(workers, 1)), minimum)
@@ -0,0 +1,254 @@
+"""
+SSE 编码工具
+为流式聊天提供增量帧的快速序列化、按时间窗/字节数合帧以及空闲心跳
+"""
+
+import asyncio
+import json
+from collections import deque
+from typing import (
+    Any,
+    AsyncGenerator,
+    AsyncIterator,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+DONE_FRAME = "data: [DONE]\n\n"
+# 以冒号开头的行是 SSE 注释，浏览器与前端解码器都会忽略，仅用于保活
+HEARTBEAT_FRAME = ": ping\n\n"
+
+_FRAME_PREFIX = 'data: {"choices":[{"delta":{'
+_FRAME_SUFFIX = '},"finish_reason":null}]}\n\n'
+
+
+def _dumps_str(value: str) -> str:
+    return json.dumps(value, ensure_ascii=False)
+
+
+def encode_delta(content: Optional[str], reasoning: Optional[str] = None) -> str:
+    """将一次增量编码为 SSE 帧，输出与 OpenAI 兼容的 choices[0].delta 结构。
+
+    只对字符串本身做 JSON 转义，外层结构直接拼接，避免为每个 token 构造嵌套 dict。
+    """
+    if content and not reasoning:
+        return f'{_FRAME_PREFIX}"content":{_dumps_str(content)}{_FRAME_SUFFIX}'
+    if reasoning and not content:
+        return f'{_FRAME_PREFIX}"reasoning_content":{_dumps_str(reasoning)}{_FRAME_SUFFIX}'
+    if content and reasoning:
+        return (
+            f'{_FRAME_PREFIX}"content":{_dumps_str(content)},'
+            f'"reasoning_content":{_dumps_str(reasoning)}{_FRAME_SUFFIX}'
+        )
+    return f"{_FRAME_PREFIX}{_FRAME_SUFFIX}"
+
+
+def encode_json(payload: Any) -> str:
+    """把任意 JSON 可序列化对象编码为一个 data 帧。"""
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def encode_error(message: str) -> str:
+    return encode_json({"error": message})
+
+
+def extract_delta(chunk: Any) -> Tuple[Optional[str], Optional[str]]:
+    """从上游 ChatCompletionChunk 中取出 (content, reasoning_content)。"""
+    choices = chunk.choices
+    if not choices:
+        return None, None
+    delta = choices[0].delta
+    return (
+        getattr(delta, "content", None),
+        getattr(delta, "reasoning_content", None),
+    )
+
+
+class StreamStats:
+    """编码过程中的统计：首个有效增量到达时间与增量个数（近似 token 数）。"""
+
+    __slots__ = ("first_delta_at", "last_delta_at", "deltas")
+
+    def __init__(self) -> None:
+        self.first_delta_at: Optional[float] = None
+        self.last_delta_at: Optional[float] = None
+        self.deltas = 0
+
+    def record(self, now: float) -> None:
+        if self.first_delta_at is None:
+            self.first_delta_at = now
+        self.last_delta_at = now
+        self.deltas += 1
+
+
+class DeltaCoalescer:
+    """按时间窗或累计字节数合并增量，减少帧数与序列化次数。
+
+    window_ms 与 max_bytes 均为 0 时不做合并，每个增量立即成帧。
+    """
+
+    __slots__ = ("window", "max_bytes", "_content", "_reasoning", "_size", "_started")
+
+    def __init__(self, window_ms: int = 0, max_bytes: int = 0) -> None:
+        self.window = window_ms / 1000.0
+        self.max_bytes = max_bytes
+        self._content: List[str] = []
+        self._reasoning: List[str] = []
+        self._size = 0
+        self._started: Optional[float] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0 or self.max_bytes > 0
+
+    @property
+    def deadline(self) -> Optional[float]:
+        """当前缓冲需要被刷出的时间点（loop.time() 口径），无缓冲时为 None。"""
+        if self._started is None or self.window <= 0:
+            return None
+        return self._started + self.window
+
+    def add(
+        self, content: Optional[str], reasoning: Optional[str], now: float
+    ) -> Optional[str]:
+        if not self.enabled:
+            return encode_delta(content, reasoning)
+        if content:
+            self._content.append(content)
+            self._size += len(content.encode("utf-8"))
+        if reasoning:
+            self._reasoning.append(reasoning)
+            self._size += len(reasoning.encode("utf-8"))
+        if self._started is None:
+            self._started = now
+        if self.max_bytes and self._size >= self.max_bytes:
+            return self.flush()
+        if self.window and now - self._started >= self.window:
+            return self.flush()
+        return None
+
+    def flush(self) -> Optional[str]:
+        if self._started is None:
+            return None
+        frame = encode_delta("".join(self._content), "".join(self._reasoning))
+        self._content.clear()
+        self._reasoning.clear()
+        self._size = 0
+        self._started = None
+        return frame
+
+
+async def encode_chat_stream(
+    chunks: AsyncIterator[Any],
+    *,
+    coalesce_ms: int = 0,
+    coalesce_bytes: int = 0,
+    heartbeat_seconds: float = 0,
+    cancel: Optional[asyncio.Event] = None,
+    stats: Optional[StreamStats] = None,
+) -> AsyncGenerator[str, None]:
+    """把上游 chunk 流编码为 SSE 帧流，结尾追加 [DONE]。
+
+    - 只含 content 的增量走字符串拼接快速路径；
+    - coalesce_ms / coalesce_bytes 控制合帧；
+    - heartbeat_seconds 内没有任何输出（例如模型长时间思考）时发送注释心跳；
+    - cancel 被置位后立即停止拉取上游并结束（不发送 [DONE]）；
+    - stats 不为空时记录增量计数与时间（loop.time() 口径）。
+    """
+    coalescer = DeltaCoalescer(coalesce_ms, coalesce_bytes)
+
+    loop = asyncio.get_running_loop()
+    if not coalescer.enabled and heartbeat_seconds <= 0 and cancel is None:
+        # 无需定时器时直接迭代，省去后台拉取任务与超时句柄
+        async for chunk in chunks:
+            content, reasoning = extract_delta(chunk)
+            if content or reasoning:
+                if stats is not None:
+                    stats.record(loop.time())
+                yield encode_delta(content, reasoning)
+        yield DONE_FRAME
+        return
+
+    # 由独立任务拉取上游并放入缓冲，消费侧一次唤醒可处理一批 chunk；
+    # 只有缓冲为空时才挂定时器，避免为每个 chunk 创建 Task/超时句柄
+    buffer: Deque[Any] = deque()
+    wakeup = asyncio.Event()
+    state: Dict[str, Any] = {"finished": False, "error": None}
+
+    async def pump() -> None:
+        try:
+            async for item in chunks:
+                buffer.append(item)
+                wakeup.set()
+        except Exception as exc:  # noqa: BLE001
+            state["error"] = exc
+        finally:
+            state["finished"] = True
+            wakeup.set()
+
+    async def watch_cancel() -> None:
+        await cancel.wait()
+        wakeup.set()
+
+    pump_task = asyncio.create_task(pump())
+    cancel_task = asyncio.create_task(watch_cancel()) if cancel is not None else None
+    last_emit = loop.time()
+    try:
+        while True:
+            now = loop.time()
+            while buffer:
+                content, reasoning = extract_delta(buffer.popleft())
+                if not (content or reasoning):
+                    continue
+                if stats is not None:
+                    stats.record(now)
+                frame = coalescer.add(content, reasoning, now)
+                if frame:
+                    last_emit = now
+                    yield frame
+            if cancel is not None and cancel.is_set():
+                return
+            if state["finished"]:
+                break
+
+            wakeup.clear()
+            wake_at = coalescer.deadline
+            if heartbeat_seconds > 0:
+                beat_at = last_emit + heartbeat_seconds
+                wake_at = beat_at if wake_at is None else min(wake_at, beat_at)
+            if wake_at is None:
+                await wakeup.wait()
+                continue
+            try:
+                async with asyncio.timeout(max(wake_at - loop.time(), 0)):
+                    await wakeup.wait()
+                continue
+            except TimeoutError:
+                pass
+
+            now = loop.time()
+            deadline = coalescer.deadline
+            if deadline is not None and now >= deadline:
+                frame = coalescer.flush()
+                if frame:
+                    last_emit = now
+                    yield frame
+                    continue
+            if heartbeat_seconds > 0 and now - last_emit >= heartbeat_seconds:
+                # 只按字节合帧时缓冲可能滞留，借心跳时机一并刷出
+                last_emit = now
+                yield coalescer.flush() or HEARTBEAT_FRAME
+
+        if state["error"] is not None:
+            raise state["error"]
+        tail = coalescer.flush()
+        if tail:
+            yield tail
+        yield DONE_FRAME
+    finally:
+        for task in (pump_task, cancel_task):
+            if task is not None and not task.done():
+                task.cancel()
@@ -0,0 +1,433 @@
+"""
+表格抽取：把 docx/pdf/xlsx/csv/pptx 中的表格转为带类型的表格
+- 表头识别：首行多数单元格为非数值时视为表头，否则生成「列1..n」；
+- 数值/金额归一：去除千分位与货币符号，识别单元格或表头中的「元/万元/亿元」单位，金额统一为元；
+- 输出紧凑 CSV/markdown 与价格汇总，供提示词组装直接使用，避免大模型逐轮从文本中重新推算价格。
+"""
+
+import csv
+import io
+import logging
+import re
+import statistics
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from src.config import settings
+from src.utils import file_sniff
+
+logger = logging.getLogger(__name__)
+
+TYPE_TEXT = "text"
+TYPE_NUMBER = "number"
+TYPE_CURRENCY = "currency"
+TYPE_PERCENT = "percent"
+
+_UNITS = (("亿元", 1e8), ("万元", 1e4), ("亿", 1e8), ("万", 1e4), ("元", 1.0))
+_HEADER_UNIT = re.compile(r"[（(]\s*(?:单位[:：]?\s*)?(亿元|万元|元)\s*[)）]")
+_CAPTION_UNIT = re.compile(r"单位[:：]\s*(亿元|万元|元)")
+_PRICE_HEADER = re.compile(r"价|金额|报价|费用|总额|合计|预算|成本|造价|price|amount|cost", re.IGNORECASE)
+_NUMBER = re.compile(r"^[-+]?\d+(?:\.\d+)?$")
+# 合计 / 小计行的标签（去掉空白后匹配单元格开头），这些行不计入价格汇总
+_TOTAL_LABEL = re.compile(r"^(?:本页|本表)?(?:价税)?(?:合计|小计|总计|共计)|^(?:sub|grand)?total\b", re.IGNORECASE)
+_TOTAL_LABEL_MAX_CHARS = 16
+_STRIP_CHARS = " 　,，¥￥$"
+# 数值列判定：非空单元格中可解析为数值的比例
+_NUMERIC_RATIO = 0.6
+
+
+class Column:
+    __slots__ = ("name", "type", "unit")
+
+    def __init__(self, name: str, type: str = TYPE_TEXT, unit: str = ""):
+        self.name = name
+        self.type = type
+        self.unit = unit
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"name": self.name, "type": self.type, "unit": self.unit}
+
+
+class Table:
+    """带类型的表格；数值列为 float（金额单位为元），缺失值为 None。"""
+
+    __slots__ = ("name", "columns", "rows", "total_rows", "subtotal_rows")
+
+    def __init__(
+        self,
+        name: str,
+        columns: List[Column],
+        rows: List[List[Any]],
+        total_rows: int,
+        subtotal_rows: Optional[List[int]] = None,
+    ):
+        self.name = name
+        self.columns = columns
+        self.rows = rows
+        # 源表格行数（rows 可能按 TABLE_MAX_ROWS 截断）
+        self.total_rows = total_rows
+        # 合计 / 小计行在 rows 中的下标
+        self.subtotal_rows = subtotal_rows or []
+
+    def item_rows(self) -> List[List[Any]]:
+        """去掉合计 / 小计行后的明细行。"""
+        if not self.subtotal_rows:
+            return self.rows
+        skip = set(self.subtotal_rows)
+        return [row for i, row in enumerate(self.rows) if i not in skip]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "columns": [c.to_dict() for c in self.columns],
+            "rows": self.rows,
+            "total_rows": self.total_rows,
+            "subtotal_rows": self.subtotal_rows,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Table":
+        columns = [Column(c["name"], c.get("type", TYPE_TEXT), c.get("unit", "")) for c in data["columns"]]
+        return cls(
+            data["name"],
+            columns,
+            data["rows"],
+            data.get("total_rows", len(data["rows"])),
+            data.get("subtotal_rows"),
+        )
+
+    def _header(self) -> List[str]:
+        return [f"{c.name}({c.unit})" if c.unit else c.name for c in self.columns]
+
+    def _rows(self, max_rows: Optional[int]) -> Tuple[List[List[str]], bool]:
+        rows = self.rows if max_rows is None else self.rows[:max_rows]
+        return [[format_value(v) for v in row] for row in rows], len(rows) < self.total_rows
+
+    def to_csv(self, max_rows: Optional[int] = None) -> str:
+        rows, truncated = self._rows(max_rows)
+        buf = io.StringIO()
+        writer = csv.writer(buf, lineterminator="\n")
+        writer.writerow(self._header())
+        writer.writerows(rows)
+        if truncated:
+            buf.write(f"# 共 {self.total_rows} 行，仅列出前 {len(rows)} 行\n")
+        return buf.getvalue()
+
+    def to_markdown(self, max_rows: Optional[int] = None) -> str:
+        rows, truncated = self._rows(max_rows)
+        header = self._header()
+        lines = [
+            "| " + " | ".join(header) + " |",
+            "|" + "|".join("---:" if c.type != TYPE_TEXT else "---" for c in self.columns) + "|",
+        ]
+        lines.extend("| " + " | ".join(cell.replace("|", "\\|") for cell in row) + " |" for row in rows)
+        if truncated:
+            lines.append(f"... 共 {self.total_rows} 行，仅列出前 {len(rows)} 行")
+        return "\n".join(lines)
+
+
+def format_value(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return str(int(value)) if value.is_integer() else f"{value:.4f}".rstrip("0").rstrip(".")
+    return str(value)
+
+
+def _format_yuan(value: float) -> str:
+    return f"{value:,.2f}元"
+
+
+def parse_number(value: Any) -> Tuple[Optional[float], Optional[float], bool, bool]:
+    """解析单元格数值，返回 (数值, 单元格自带的金额倍数, 是否带货币标记, 是否百分数)。"""
+    if value is None or isinstance(value, bool):
+        return None, None, False, False
+    if isinstance(value, (int, float)):
+        return float(value), None, False, False
+    text = str(value).strip()
+    if not text:
+        return None, None, False, False
+    upper = text.upper()
+    currency = text[0] in "¥￥$" or upper.startswith(("RMB", "CNY")) or upper.endswith(("RMB", "CNY"))
+    if currency and text[0] not in "¥￥$":
+        text = text[3:] if upper.startswith(("RMB", "CNY")) else text[:-3]
+    text = text.strip(_STRIP_CHARS).replace(",", "").replace("，", "")
+    if text.endswith("%"):
+        number = text[:-1].strip()
+        return (float(number), None, False, True) if _NUMBER.match(number) else (None, None, False, False)
+    multiplier = None
+    if text.endswith("整"):
+        text = text[:-1]
+    for unit, factor in _UNITS:
+        if text.endswith(unit):
+            text = text[: -len(unit)].strip()
+            multiplier = factor
+            currency = True
+            break
+    if not _NUMBER.match(text):
+        return None, None, False, False
+    return float(text), multiplier, currency, False
+
+
+def _unit_factor(unit: str) -> float:
+    return dict(_UNITS).get(unit, 1.0)
+
+
+def _is_header(row: Sequence[Any]) -> bool:
+    """首行多数非空单元格不是数值时视为表头（全文本表格无法区分，按惯例同样视首行为表头）。"""
+    cells = [c for c in row if c not in (None, "")]
+    if not cells:
+        return False
+    textual = sum(1 for c in cells if parse_number(c)[0] is None)
+    return textual * 2 >= len(cells)
+
+
+def _is_subtotal(row: Sequence[Any]) -> bool:
+    for cell in row:
+        if isinstance(cell, str):
+            label = re.sub(r"\s+", "", cell)
+            if len(label) <= _TOTAL_LABEL_MAX_CHARS and _TOTAL_LABEL.match(label):
+                return True
+    return False
+
+
+def build_table(
+    name: str, raw_rows: Iterable[Sequence[Any]], unit_hint: str = "", total_rows: Optional[int] = None
+) -> Optional[Table]:
+    """由原始单元格构造带类型的表格；不足 2 行或 2 列时返回 None。
+
+    total_rows 为调用方已知的源表格行数（含表头），给出时读满 TABLE_MAX_ROWS 行即停止消费 raw_rows。
+    """
+    max_rows = settings.TABLE_MAX_ROWS
+    rows: List[List[Any]] = []
+    total = 0
+    for raw in raw_rows:
+        cells = [c.strip() if isinstance(c, str) else c for c in raw]
+        if not any(c not in (None, "") for c in cells):
+            continue
+        total += 1
+        if len(rows) <= max_rows:
+            rows.append(cells)
+        elif total_rows is not None:
+            break
+    if total_rows is not None and total_rows > total:
+        total = total_rows
+    if len(rows) < 2:
+        return None
+    width = max(len(r) for r in rows)
+    rows = [r + [None] * (width - len(r)) for r in rows]
+    keep = [i for i in range(width) if any(r[i] not in (None, "") for r in rows)]
+    if len(keep) < 2:
+        return None
+    rows = [[r[i] for i in keep] for r in rows]
+
+    if _is_header(rows[0]):
+        headers = [str(c) if c not in (None, "") else f"列{i + 1}" for i, c in enumerate(rows[0])]
+        body = rows[1:]
+        total -= 1
+    else:
+        headers = [f"列{i + 1}" for i in range(len(keep))]
+        body = rows
+    body = body[:max_rows]
+    subtotals = [i for i, r in enumerate(body) if _is_subtotal(r)]
+
+    columns: List[Column] = []
+    typed_cols: List[List[Any]] = []
+    for idx, header in enumerate(headers):
+        values = [r[idx] for r in body]
+        parsed = [parse_number(v) for v in values]
+        non_empty = [v for v in values if v not in (None, "")]
+        numeric = [p for p in parsed if p[0] is not None]
+        if not non_empty or len(numeric) < len(non_empty) * _NUMERIC_RATIO:
+            columns.append(Column(header.strip()))
+            typed_cols.append([None if v in (None, "") else str(v) for v in values])
+            continue
+
+        header_unit = _HEADER_UNIT.search(header)
+        is_price = bool(header_unit) or bool(_PRICE_HEADER.search(header)) or any(p[2] for p in numeric)
+        if all(p[3] for p in numeric):
+            columns.append(Column(header.strip(), TYPE_PERCENT, "%"))
+            typed_cols.append([p[0] for p in parsed])
+            continue
+        if not is_price:
+            columns.append(Column(header.strip(), TYPE_NUMBER))
+            typed_cols.append([p[0] for p in parsed])
+            continue
+        default = _unit_factor(header_unit.group(1)) if header_unit else _unit_factor(unit_hint)
+        clean = _HEADER_UNIT.sub("", header).strip() or header.strip()
+        columns.append(Column(clean, TYPE_CURRENCY, "元"))
+        typed_cols.append(
+            [None if p[0] is None else round(p[0] * (p[1] if p[1] is not None else default), 2) for p in parsed]
+        )
+
+    typed_rows = [list(r) for r in zip(*typed_cols)]
+    return Table(name, columns, typed_rows, total, subtotals)
+
+
+# ---------------------------------------------------------------------------
+# 各格式的原始表格读取（在解析子进程中执行，依赖在函数内部导入）
+# ---------------------------------------------------------------------------
+
+# (表格名, 原始行, 单位说明, 已知行数)；原始行可为惰性迭代器，build_table 只保留前 TABLE_MAX_ROWS 行
+RawTable = Tuple[str, Iterable[Sequence[Any]], str, Optional[int]]
+_EXTRACTORS: Dict[str, Callable[[bytes], List[RawTable]]] = {}
+
+
+def register_table_extractor(mimes: Tuple[str, ...]) -> Callable:
+    def decorator(fn: Callable[[bytes], List[RawTable]]) -> Callable[[bytes], List[RawTable]]:
+        for mime in mimes:
+            _EXTRACTORS[mime] = fn
+        return fn
+
+    return decorator
+
+
+def extract_tables(mime: str, data: bytes) -> List[Table]:
+    """抽取文件中的表格；格式不支持或抽取失败时返回空列表（不影响正文解析）。"""
+    extractor = _EXTRACTORS.get(mime)
+    if extractor is None:
+        return []
+    try:
+        raw_tables = extractor(data)
+    except Exception as exc:  # noqa: BLE001
+        logger.warning(f"Table extraction failed for {mime}: {exc}")
+        return []
+    tables = []
+    for name, rows, unit_hint, total_rows in raw_tables:
+        table = build_table(name, rows, unit_hint, total_rows)
+        if table is not None:
+            tables.append(table)
+    return tables
+
+
+def _caption_unit(text: str) -> str:
+    match = _CAPTION_UNIT.search(text or "")
+    return match.group(1) if match else ""
+
+
+@register_table_extractor((file_sniff.DOCX,))
+def _docx_tables(data: bytes) -> List[RawTable]:
+    import docx
+    from docx.table import Table as DocxTable
+
+    doc = docx.Document(io.BytesIO(data))
+    body = doc.element.body
+    tables: List[RawTable] = []
+    last_text = ""
+    # 按文档顺序遍历，表格前最近的段落作为单位说明（如「单位：万元」）
+    for child in body.iterchildren():
+        tag = child.tag.rsplit("}", 1)[-1]
+        if tag == "p":
+            text = "".join(t.text or "" for t in child.iter() if t.tag.endswith("}t"))
+            if text.strip():
+                last_text = text
+        elif tag == "tbl":
+            table = DocxTable(child, doc)
+            rows = [[cell.text for cell in row.cells] for row in table.rows]
+            tables.append((f"表格{len(tables) + 1}", rows, _caption_unit(last_text), None))
+    return tables
+
+
+@register_table_extractor((file_sniff.PPTX,))
+def _pptx_tables(data: bytes) -> List[RawTable]:
+    import pptx
+
+    prs = pptx.Presentation(io.BytesIO(data))
+    tables: List[RawTable] = []
+    for i, slide in enumerate(prs.slides):
+        for shape in slide.shapes:
+            if getattr(shape, "has_table", False) and shape.has_table:
+                rows = [[cell.text for cell in row.cells] for row in shape.table.rows]
+                tables.append((f"幻灯片{i + 1}-表格{len(tables) + 1}", rows, "", None))
+    return tables
+
+
+@register_table_extractor((file_sniff.XLSX,))
+def _xlsx_tables(data: bytes) -> List[RawTable]:
+    import openpyxl
+
+    # 只读模式按行流式读取；行数取自工作表 dimension，读满 TABLE_MAX_ROWS 行即停止，大表不必整表解析
+    wb = openpyxl.load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    return [(ws.title, ws.iter_rows(values_only=True), "", ws.max_row) for ws in wb.worksheets]
+
+
+@register_table_extractor((file_sniff.CSV,))
+def _csv_tables(data: bytes) -> List[RawTable]:
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        text = data.decode("gb18030", errors="ignore")
+    return [("Sheet1", csv.reader(io.StringIO(text)), "", None)]
+
+
+_LAYOUT_SPLIT = re.compile(r"\s{2,}")
+
+
+@register_table_extractor((file_sniff.PDF,))
+def _pdf_tables(data: bytes) -> List[RawTable]:
+    """按版面模式提取文本，连续 3 行以上、列数一致（≥2 列）的行视为一张表格。"""
+    import pypdf
+
+    reader = pypdf.PdfReader(io.BytesIO(data))
+    tables: List[RawTable] = []
+    max_pages = min(len(reader.pages), 50)
+    for page_no in range(max_pages):
+        text = reader.pages[page_no].extract_text(extraction_mode="layout")
+        block: List[List[str]] = []
+        caption = ""
+        last_text = ""
+
+        def flush() -> None:
+            if len(block) >= 3:
+                tables.append((f"第{page_no + 1}页-表格{len(tables) + 1}", list(block), _caption_unit(caption), None))
+            block.clear()
+
+        for line in text.splitlines():
+            cells = [c for c in _LAYOUT_SPLIT.split(line.strip()) if c]
+            if len(cells) >= 2 and (not block or len(cells) == len(block[0])):
+                if not block:
+                    caption = last_text
+                block.append(cells)
+                continue
+            flush()
+            if len(cells) >= 2:
+                caption = last_text
+                block.append(cells)
+            elif line.strip():
+                last_text = line
+        flush()
+    return tables
+
+
+# ---------------------------------------------------------------------------
+# 价格汇总
+# ---------------------------------------------------------------------------
+
+
+def summarize_prices(tables: Sequence[Table], max_tables: int = 10) -> str:
+    """按表格的金额列汇总条数、最低/最高（附对应行的首个文本列）、均值与中位数；合计 / 小计行不参与统计。"""
+    lines: List[str] = []
+    for table in tables[:max_tables]:
+        price_cols = [i for i, c in enumerate(table.columns) if c.type == TYPE_CURRENCY]
+        if not price_cols:
+            continue
+        key_col = next((i for i, c in enumerate(table.columns) if c.type == TYPE_TEXT), None)
+        scope = f"{table.name}（{table.total_rows} 行"
+        scope += f"，统计前 {len(table.rows)} 行）" if len(table.rows) < table.total_rows else "）"
+        lines.append(scope)
+        rows = table.item_rows()
+        for idx in price_cols:
+            pairs = [(row[idx], row[key_col] if key_col is not None else None) for row in rows if row[idx] is not None]
+            if not pairs:
+                continue
+            values = [v for v, _ in pairs]
+            low = min(pairs, key=lambda p: p[0])
+            high = max(pairs, key=lambda p: p[0])
+
+            def label(pair: Tuple[float, Any]) -> str:
+                return f"{_format_yuan(pair[0])}（{pair[1]}）" if pair[1] else _format_yuan(pair[0])
+
+            lines.append(
+                f"- {table.columns[idx].name}：{len(values)} 项，最低 {label(low)}，最高 {label(high)}，"
+                f"均值 {_format_yuan(statistics.fmean(values))}，中位数 {_format_yuan(statistics.median(values))}"
+            )
+    return "\n".join(lines)
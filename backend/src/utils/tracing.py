@@ -0,0 +1,436 @@
+"""
+轻量请求级链路追踪
+- TracingMiddleware 为每个 HTTP 请求建立 trace（兼容 W3C traceparent），以 contextvars 传递当前 span；
+- span()/traced() 在 CRUD、MOI 查询、大模型调用、文件解析等位置打点，未处于请求上下文时为空操作；
+- 结束的 span 经后台线程批量导出到本地 JSON 行文件或 OTLP/HTTP(JSON) 接收端；
+- 非流式响应附带 Server-Timing 头，按 span 名称汇总耗时，便于在浏览器开发者工具中查看。
+"""
+
+import asyncio
+import contextvars
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from src.config import settings
+from src.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+SPANS_DROPPED = metrics.counter("trace_spans_dropped_total", "导出队列已满时被丢弃的 span 数")
+SPANS_EXPORTED = metrics.counter(
+    "trace_spans_exported_total", "已导出的 span 数", ("exporter", "status")
+)
+
+STATUS_UNSET = "unset"
+STATUS_OK = "ok"
+STATUS_ERROR = "error"
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+class Trace:
+    """一次请求的追踪上下文：trace id、是否导出，以及已结束 span 的耗时汇总（供 Server-Timing）。"""
+
+    __slots__ = ("trace_id", "sampled", "timings")
+
+    def __init__(self, trace_id: str, sampled: bool) -> None:
+        self.trace_id = trace_id
+        self.sampled = sampled
+        # span 名称 -> [累计毫秒, 次数]
+        self.timings: Dict[str, List[float]] = {}
+
+    def server_timing(self, total_ms: float) -> str:
+        parts = [f"total;dur={total_ms:.1f}"]
+        for name, (dur, count) in self.timings.items():
+            part = f"{name};dur={dur:.1f}"
+            if count > 1:
+                part += f';desc="x{count}"'
+            parts.append(part)
+        return ", ".join(parts)
+
+
+class Span:
+    __slots__ = (
+        "trace", "span_id", "parent_id", "name", "kind",
+        "start_ns", "end_ns", "attributes", "status", "status_message",
+    )
+
+    def __init__(
+        self,
+        trace: Trace,
+        name: str,
+        parent_id: Optional[str],
+        kind: str = "internal",
+        start_ns: Optional[int] = None,
+    ) -> None:
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = start_ns if start_ns is not None else time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = {}
+        self.status = STATUS_UNSET
+        self.status_message = ""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_error(self, exc: BaseException) -> None:
+        self.status = STATUS_ERROR
+        self.status_message = f"{type(exc).__name__}: {exc}"[:500]
+
+    def end(self, end_ns: Optional[int] = None) -> None:
+        if self.end_ns is not None:
+            return
+        self.end_ns = end_ns if end_ns is not None else time.time_ns()
+        if self.kind != "server":
+            timing = self.trace.timings.get(self.name)
+            dur_ms = (self.end_ns - self.start_ns) / 1e6
+            if timing is None:
+                self.trace.timings[self.name] = [dur_ms, 1]
+            else:
+                timing[0] += dur_ms
+                timing[1] += 1
+        if self.trace.sampled and _exporter is not None:
+            _exporter.submit(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(((self.end_ns or self.start_ns) - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "status": self.status,
+            "status_message": self.status_message or None,
+        }
+
+
+class _SpanScope:
+    """span() 的返回值：进入时创建子 span 并设为当前 span，退出时结束并恢复。"""
+
+    __slots__ = ("name", "attributes", "span", "token")
+
+    def __init__(self, name: str, attributes: Dict[str, Any]) -> None:
+        self.name = name
+        self.attributes = attributes
+        self.span: Optional[Span] = None
+        self.token = None
+
+    def __enter__(self) -> Optional[Span]:
+        parent = _current_span.get()
+        if parent is None:
+            return None
+        self.span = Span(parent.trace, self.name, parent.span_id)
+        if self.attributes:
+            self.span.attributes.update(self.attributes)
+        self.token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self.span is None:
+            return
+        _current_span.reset(self.token)
+        if exc is not None and not isinstance(exc, asyncio.CancelledError):
+            self.span.set_error(exc)
+        self.span.end()
+
+
+def span(name: str, **attributes: Any) -> _SpanScope:
+    """在当前 trace 下创建子 span：`with span("moi.run_sql", query_type="vector") as s:`。
+
+    不在请求上下文（或未启用追踪）时 `s` 为 None，调用方需判空后再设置属性。
+    """
+    return _SpanScope(name, attributes)
+
+
+def traced(name: str) -> Callable:
+    """为同步或异步函数整体包一层 span 的装饰器。"""
+
+    def decorator(fn: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with _SpanScope(name, {}):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _SpanScope(name, {}):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def record_span(name: str, start_ns: int, end_ns: int, **attributes: Any) -> None:
+    """补记一个已发生的区间（如流式调用的首 token 等待），挂在当前 span 下。"""
+    parent = _current_span.get()
+    if parent is None:
+        return
+    child = Span(parent.trace, name, parent.span_id, start_ns=start_ns)
+    child.attributes.update(attributes)
+    child.end(end_ns)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+# ---------------------------------------------------------------------------
+# 导出
+# ---------------------------------------------------------------------------
+
+
+class JsonFileExporter:
+    """每个 span 一行 JSON，追加写入本地文件。"""
+
+    name = "json"
+
+    def __init__(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._fh = open(path, "a", encoding="utf-8")
+
+    def export(self, spans: List[Span]) -> None:
+        self._fh.write("".join(json.dumps(s.to_dict(), ensure_ascii=False, default=str) + "\n" for s in spans))
+        self._fh.flush()
+
+    def close(self) -> None:
+        self._fh.close()
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OtlpHttpExporter:
+    """OTLP/HTTP JSON 编码导出（POST {endpoint}，如 http://otel-collector:4318/v1/traces）。"""
+
+    name = "otlp"
+    _KINDS = {"internal": 1, "server": 2, "client": 3}
+    _STATUS = {STATUS_UNSET: 0, STATUS_OK: 1, STATUS_ERROR: 2}
+
+    def __init__(self, endpoint: str, headers: Dict[str, str], service_name: str) -> None:
+        import httpx
+
+        self.endpoint = endpoint
+        self._client = httpx.Client(timeout=5.0, headers={"Content-Type": "application/json", **headers})
+        self._resource = {
+            "attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]
+        }
+
+    def _encode(self, s: Span) -> Dict[str, Any]:
+        encoded = {
+            "traceId": s.trace.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": self._KINDS.get(s.kind, 1),
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+            "status": {"code": self._STATUS[s.status], "message": s.status_message},
+        }
+        if s.parent_id:
+            encoded["parentSpanId"] = s.parent_id
+        return encoded
+
+    def export(self, spans: List[Span]) -> None:
+        body = {
+            "resourceSpans": [
+                {
+                    "resource": self._resource,
+                    "scopeSpans": [
+                        {"scope": {"name": __name__}, "spans": [self._encode(s) for s in spans]}
+                    ],
+                }
+            ]
+        }
+        resp = self._client.post(self.endpoint, content=json.dumps(body, default=str))
+        resp.raise_for_status()
+
+    def close(self) -> None:
+        self._client.close()
+
+
+class _BatchExporter:
+    """后台线程按批导出，调用方只做一次非阻塞入队；队列满时丢弃并计数。"""
+
+    def __init__(self, exporter, max_queue: int = 10000, batch_size: int = 512, interval: float = 2.0) -> None:
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def submit(self, s: Span) -> None:
+        try:
+            self._queue.put_nowait(s)
+        except queue.Full:
+            SPANS_DROPPED.inc()
+
+    def _drain(self, block: bool) -> List[Span]:
+        batch: List[Span] = []
+        try:
+            if block:
+                batch.append(self._queue.get(timeout=self.interval))
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _export(self, batch: List[Span]) -> None:
+        try:
+            self.exporter.export(batch)
+            SPANS_EXPORTED.inc(len(batch), exporter=self.exporter.name, status="ok")
+        except Exception as exc:  # noqa: BLE001
+            SPANS_EXPORTED.inc(len(batch), exporter=self.exporter.name, status="error")
+            logger.warning(f"Trace export failed ({self.exporter.name}): {exc}")
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            batch = self._drain(block=True)
+            if batch:
+                self._export(batch)
+
+    def shutdown(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=self.interval + 1)
+        while batch := self._drain(block=False):
+            self._export(batch)
+        self.exporter.close()
+
+
+_exporter: Optional[_BatchExporter] = None
+
+
+def _parse_headers(spec: str) -> Dict[str, str]:
+    headers = {}
+    for item in spec.split(","):
+        key, sep, value = item.partition("=")
+        if sep and key.strip():
+            headers[key.strip()] = value.strip()
+    return headers
+
+
+def setup_tracing() -> None:
+    """按配置创建导出器；TRACING_EXPORTER=none 时仅生成 Server-Timing，不落盘。"""
+    global _exporter
+    if _exporter is not None or not settings.TRACING_ENABLED:
+        return
+    kind = settings.TRACING_EXPORTER
+    if kind == "json":
+        exporter = JsonFileExporter(settings.TRACING_JSON_PATH)
+    elif kind == "otlp":
+        if not settings.TRACING_OTLP_ENDPOINT:
+            logger.warning("TRACING_EXPORTER=otlp 但未配置 TRACING_OTLP_ENDPOINT，已跳过导出")
+            return
+        exporter = OtlpHttpExporter(
+            settings.TRACING_OTLP_ENDPOINT,
+            _parse_headers(settings.TRACING_OTLP_HEADERS),
+            settings.TRACING_SERVICE_NAME,
+        )
+    else:
+        return
+    _exporter = _BatchExporter(exporter)
+    logger.info(f"Tracing exporter started: {kind}")
+
+
+def shutdown_tracing() -> None:
+    """停止导出线程并刷出剩余 span。"""
+    global _exporter
+    if _exporter is not None:
+        _exporter.shutdown()
+        _exporter = None
+
+
+# ---------------------------------------------------------------------------
+# 中间件
+# ---------------------------------------------------------------------------
+
+
+class TracingMiddleware:
+    """为每个 HTTP 请求创建根 span，回写 X-Trace-Id，并为非流式响应附加 Server-Timing。"""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace_id = None
+        parent_id = None
+        for key, value in scope["headers"]:
+            if key == b"traceparent":
+                match = _TRACEPARENT.match(value.decode("latin-1").strip())
+                if match:
+                    trace_id, parent_id = match.group(1), match.group(2)
+                break
+        sampled = _exporter is not None and random.random() < settings.TRACING_SAMPLE_RATE
+        trace = Trace(trace_id or os.urandom(16).hex(), sampled)
+        root = Span(trace, scope["method"], parent_id, kind="server")
+        root.set_attribute("http.method", scope["method"])
+        root.set_attribute("http.target", scope["path"])
+        start = time.perf_counter()
+        token = _current_span.set(root)
+
+        async def send_wrapper(message) -> None:
+            if message["type"] == "http.response.start":
+                root.set_attribute("http.status_code", message["status"])
+                headers = list(message.get("headers", []))
+                headers.append((b"x-trace-id", trace.trace_id.encode()))
+                streaming = any(
+                    k == b"content-type" and v.startswith(b"text/event-stream") for k, v in headers
+                )
+                if settings.TRACING_SERVER_TIMING and not streaming:
+                    total_ms = (time.perf_counter() - start) * 1000
+                    headers.append((b"server-timing", trace.server_timing(total_ms).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as exc:
+            root.set_error(exc)
+            raise
+        finally:
+            _current_span.reset(token)
+            route = getattr(scope.get("route"), "path", None)
+            root.name = f"{scope['method']} {route or scope['path']}"
+            if route:
+                root.set_attribute("http.route", route)
+            root.end()
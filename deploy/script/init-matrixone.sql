@@ -34,10 +34,31 @@ CREATE TABLE IF NOT EXISTS messages (
     content TEXT NOT NULL,
     deep_thinking TEXT,
     model VARCHAR(100),
+    -- 已有库由 python -m src.db.migrate_schema（应用启动时自动执行）补加该列
+    attachment_ids VARCHAR(255) COMMENT '引用的会话文件 id，逗号分隔',
     CONSTRAINT fk_messages_conversation FOREIGN KEY (conversation_id) REFERENCES conversations(id),
     INDEX idx_messages_conversation (conversation_id)
 );
 
+-- 创建会话文件表（解析后的正文压缩保存，同一会话内按正文哈希去重）
+CREATE TABLE IF NOT EXISTS conversation_files (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    conversation_id INT NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    file_type VARCHAR(20) DEFAULT '',
+    content_hash CHAR(64) NOT NULL,
+    codec VARCHAR(10) NOT NULL,
+    content MEDIUMBLOB NOT NULL,
+    content_chars INT DEFAULT 0,
+    stored_bytes INT DEFAULT 0,
+    price_summary TEXT,
+    CONSTRAINT fk_conversation_files_conversation FOREIGN KEY (conversation_id) REFERENCES conversations(id),
+    UNIQUE KEY uk_conversation_files_hash (conversation_id, content_hash),
+    INDEX idx_conversation_files_conversation (conversation_id)
+);
+
 -- 创建 MOI 业务数据库 (如果不存在)
 CREATE DATABASE IF NOT EXISTS xunyuan_agent;
 
@@ -63,6 +84,9 @@ CREATE TABLE IF NOT EXISTS bidding_records_1 (
   `project_name_embedding` vecf64 (1024) DEFAULT NULL,
   `product_embedding` vecf64 (1024) DEFAULT NULL,
   PRIMARY KEY (`id`),
+  -- 数据导入（python -m src.db.ingest_moi）按项目名称查询已存在的自然键；
+  -- 已有库执行 CREATE INDEX idx_bidding_records_project ON bidding_records_1 (`项目名称`);
+  INDEX idx_bidding_records_project (`项目名称`),
 );
 
 -- 产品价格表
@@ -77,6 +101,39 @@ CREATE TABLE IF NOT EXISTS product_price (
   `最低价（元）` varchar(255) DEFAULT NULL,
   `project_name_embedding` vecf64 (1024) DEFAULT NULL,
   `product_embedding` vecf64 (1024) DEFAULT NULL,
+  -- 已有库执行 CREATE INDEX idx_product_price_project ON product_price (`项目名称`);
+  INDEX idx_product_price_project (`项目名称`),
+);
+
+-- 供应商历史表现聚合表（由 python -m src.db.refresh_supplier_stats 按 bidding_records_1 主键水位增量刷新）
+-- 供应商 × 细化产品
+CREATE TABLE IF NOT EXISTS supplier_product_stats (
+  `供应商名称` varchar(255) NOT NULL,
+  `细化产品` varchar(255) NOT NULL,
+  `投标次数` int NOT NULL DEFAULT 0,
+  `中标次数` int NOT NULL DEFAULT 0,
+  `合计中标金额_万元` decimal(18, 2) NOT NULL DEFAULT 0 COMMENT '中标记录的金额合计',
+  PRIMARY KEY (`供应商名称`, `细化产品`),
+  INDEX idx_supplier_product_stats_product (`细化产品`)
+);
+
+-- 供应商 × 项目分组（项目名称去掉年份与批次/标段后缀）
+CREATE TABLE IF NOT EXISTS supplier_project_stats (
+  `供应商名称` varchar(255) NOT NULL,
+  `项目分组` varchar(255) NOT NULL,
+  `投标次数` int NOT NULL DEFAULT 0,
+  `中标次数` int NOT NULL DEFAULT 0,
+  `合计中标金额_万元` decimal(18, 2) NOT NULL DEFAULT 0 COMMENT '中标记录的金额合计',
+  PRIMARY KEY (`供应商名称`, `项目分组`),
+  INDEX idx_supplier_project_stats_bucket (`项目分组`)
+);
+
+-- 聚合表刷新水位
+CREATE TABLE IF NOT EXISTS supplier_stats_state (
+  `name` varchar(64) NOT NULL,
+  `last_record_id` bigint NOT NULL DEFAULT 0,
+  `refreshed_at` datetime DEFAULT NULL,
+  PRIMARY KEY (`name`)
 );
 
 -- 输出初始化完成信息
@@ -28,6 +28,26 @@ CREATE TABLE IF NOT EXISTS messages (
     content TEXT NOT NULL,
     deep_thinking TEXT NULL,
     model VARCHAR(100) NULL,
+    attachment_ids VARCHAR(255) NULL COMMENT '引用的会话文件 id，逗号分隔',
     CONSTRAINT fk_messages_conversation FOREIGN KEY (conversation_id) REFERENCES conversations(id),
     INDEX idx_messages_conversation (conversation_id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS conversation_files (
+    -- 会话文件表：解析后的文件正文压缩保存一次，同一会话内按正文哈希去重
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    conversation_id INT NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    file_type VARCHAR(20) NOT NULL DEFAULT '',
+    content_hash CHAR(64) NOT NULL COMMENT '解析后正文的 sha256',
+    codec VARCHAR(10) NOT NULL COMMENT '压缩方式：zstd / gzip / none',
+    content MEDIUMBLOB NOT NULL COMMENT '压缩后的正文',
+    content_chars INT NOT NULL DEFAULT 0 COMMENT '正文字符数',
+    stored_bytes INT NOT NULL DEFAULT 0 COMMENT '压缩后字节数',
+    price_summary TEXT NULL COMMENT '表格价格汇总',
+    CONSTRAINT fk_conversation_files_conversation FOREIGN KEY (conversation_id) REFERENCES conversations(id),
+    UNIQUE KEY uk_conversation_files_hash (conversation_id, content_hash),
+    INDEX idx_conversation_files_conversation (conversation_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;